@@ -0,0 +1,59 @@
+# Memory and Dijkstra latency of the dict Graph versus the CSR CompactGraph.
+# Run with: python -m city_trader.bench.compact_graph [n_cities] [degree]
+import sys
+import time
+import tracemalloc
+
+from city_trader.graph import Graph
+from city_trader.bench.synthetic import random_world
+
+
+def _measure(build):
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, size
+
+
+def _copy(graph):
+    g = Graph()
+    for name, adj in graph.cities.items():
+        g.add_city(name)
+        g.cities[name].update(adj)
+    return g
+
+
+def main(n_cities=100000, degree=6):
+    source, _ = random_world(n_cities, 1, degree=degree)
+    roads = sum(len(adj) for adj in source.cities.values()) // 2
+    g, dict_bytes = _measure(lambda: _copy(source))
+    cg, csr_bytes = _measure(g.freeze)
+    t0 = time.perf_counter()
+    g.freeze()
+    t_freeze = time.perf_counter() - t0
+
+    sources = list(g.cities)[:5]
+    t0 = time.perf_counter()
+    for s in sources:
+        g.dijkstra(s)
+    t_dict = (time.perf_counter() - t0) / len(sources)
+    t0 = time.perf_counter()
+    for s in sources:
+        cg.dijkstra(s)
+    t_csr = (time.perf_counter() - t0) / len(sources)
+    t0 = time.perf_counter()
+    for s in sources:
+        cg.dijkstra_ids(cg.index[s])
+    t_ids = (time.perf_counter() - t0) / len(sources)
+
+    print(f"{n_cities} cities, {roads} roads")
+    print(f"  dict Graph memory:    {dict_bytes / 2**20:8.1f} MiB")
+    print(f"  CompactGraph memory:  {csr_bytes / 2**20:8.1f} MiB  freeze {t_freeze:.2f} s")
+    print(f"  dijkstra dict:        {t_dict * 1000:8.1f} ms")
+    print(f"  dijkstra CSR (names): {t_csr * 1000:8.1f} ms")
+    print(f"  dijkstra CSR (ids):   {t_ids * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,52 @@
+# Cost of repairing cached shortest-path rows after a road change versus
+# recomputing them from scratch.
+# Run with: python -m city_trader.bench.dynamic_sssp [n_cities] [rows] [changes]
+import random
+import sys
+import time
+
+from city_trader.bench.synthetic import random_world
+
+
+def main(n_cities=100000, rows=4, changes=200, seed=1):
+    g, _ = random_world(n_cities, 1, degree=3)
+    rng = random.Random(seed)
+    names = list(g.cities)
+    sources = names[:rows]
+    for s in sources:
+        g.shortest_paths(s)
+
+    t_repair = {"decrease": 0.0, "increase": 0.0, "close": 0.0}
+    counts = dict.fromkeys(t_repair, 0)
+    for _ in range(changes):
+        a = rng.choice(names)
+        if not g.cities[a]:
+            continue
+        b = rng.choice(list(g.cities[a]))
+        cost = g.cities[a][b]
+        kind = rng.choice(list(t_repair))
+        t0 = time.perf_counter()
+        if kind == "decrease":
+            g.update_road(a, b, max(1, cost // 2))
+        elif kind == "increase":
+            g.update_road(a, b, cost * 3)
+        else:
+            g.remove_road(a, b)
+        t_repair[kind] += time.perf_counter() - t0
+        counts[kind] += 1
+
+    t0 = time.perf_counter()
+    for s in sources:
+        fresh = g.dijkstra(s)[0]
+    t_full = time.perf_counter() - t0
+    assert fresh == g.shortest_paths(sources[-1])[0]
+
+    print(f"{n_cities} cities, {rows} cached rows, {changes} road changes")
+    for kind, total in t_repair.items():
+        if counts[kind]:
+            print(f"  repair ({kind:8}): {total / counts[kind] * 1000:9.3f} ms per change")
+    print(f"  full recompute:     {t_full * 1000:9.3f} ms per change")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:4]))
@@ -0,0 +1,42 @@
+class HeadlessBoard:
+    # In-memory stand-in for game2dboard.Board so TraderApp can render without a
+    # display: cells are plain lists and output text is kept in self.text.
+    def __init__(self, rows, cols):
+        self.nrows = rows
+        self.ncols = cols
+        self.cells = [[""] * cols for _ in range(rows)]
+        self.text = ""
+        self.writes = 0
+        self.title = ""
+        self._rows = [_Row(self, r) for r in range(rows)]
+
+    def __getitem__(self, r):
+        return self._rows[r]
+
+    def create_output(self, **kwargs):
+        pass
+
+    def print(self, *objects, sep=' ', end=''):
+        self.text = sep.join(str(o) for o in objects) + end
+
+    def show(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _Row:
+    # board[r] of a HeadlessBoard; board[r][c] = label counts one write
+    __slots__ = ("_board", "_cells")
+
+    def __init__(self, board, r):
+        self._board = board
+        self._cells = board.cells[r]
+
+    def __getitem__(self, c):
+        return self._cells[c]
+
+    def __setitem__(self, c, value):
+        self._board.writes += 1
+        self._cells[c] = value
@@ -0,0 +1,74 @@
+# Contraction hierarchy: preprocessing time, index size and query latency,
+# with every answer checked against plain Dijkstra.
+# Run with: python -m city_trader.bench.hierarchy [n_cities] [queries] [topology]
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+from city_trader.generator import generate_world
+from city_trader.hierarchy import hierarchy_path, load_or_build
+
+
+def check(graph, ch, pairs):
+    # Distances equal Dijkstra's and unpacked paths are real roads adding up to them.
+    # Average and worst case time complexity: O(Q · (V + E) log V)
+    for source, target in pairs:
+        expected = graph.dijkstra(source)[0].get(target, math.inf)
+        cost, path = ch.route(source, target)
+        assert cost == expected or math.isclose(cost, expected), (source, target, cost, expected)
+        if cost == math.inf:
+            assert path == [], (source, target)
+            continue
+        assert path[0] == source and path[-1] == target, (source, target, path)
+        walked = sum(graph.cities[a][b] for a, b in zip(path, path[1:]))
+        assert math.isclose(walked, cost) or walked == cost, (source, target, walked, cost)
+
+
+def main(n_cities=20000, queries=200, topology="geometric", seed=1):
+    g, _ = generate_world(n_cities, topology, seed=seed)
+    rng = random.Random(seed)
+    names = list(g.cities)
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        world = os.path.join(tmp, "world.json")
+        t0 = time.perf_counter()
+        ch = load_or_build(g, world)
+        t_build = time.perf_counter() - t0
+        size = hierarchy_path(world).stat().st_size
+        t0 = time.perf_counter()
+        cached = load_or_build(g, world)
+        t_load = time.perf_counter() - t0
+        assert cached.targets == ch.targets and cached is not ch
+
+    check(g, ch, pairs[:50])
+
+    t0 = time.perf_counter()
+    for s, t in pairs:
+        ch.distance(s, t)
+    t_dist = (time.perf_counter() - t0) / queries
+    t0 = time.perf_counter()
+    for s, t in pairs:
+        g.route(s, t, "ch")
+    t_route = (time.perf_counter() - t0) / queries
+    t0 = time.perf_counter()
+    for s, t in pairs:
+        g.route(s, t)
+    t_bidir = (time.perf_counter() - t0) / queries
+
+    roads = sum(len(row) for row in g.cities.values()) // 2
+    print(f"{n_cities} cities ({topology}), {roads} roads, {queries} random pairs")
+    print(f"  preprocessing:        {t_build:9.2f} s, {ch.shortcuts} shortcuts")
+    print(f"  index:                {size / 2 ** 20:9.2f} MiB on disk, loaded in {t_load:.2f} s")
+    print(f"  distance query:       {t_dist * 1e6:9.0f} us")
+    print(f"  route + unpacking:    {t_route * 1e6:9.0f} us")
+    print(f"  bidirectional:        {t_bidir * 1e6:9.0f} us")
+    print("  50 routes match Dijkstra")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:4]
+    main(*(int(a) for a in args[:2]), *args[2:])
@@ -0,0 +1,31 @@
+# Cost of market ticks and trades.
+# Run with: python -m city_trader.bench.market [n_cities] [n_goods]
+import sys
+import time
+
+from city_trader.market import Market
+from city_trader.bench.synthetic import random_world
+
+
+def main(n_cities=10000, n_goods=200, ticks=200, trades=100000):
+    _, cities = random_world(n_cities, n_goods, degree=2)
+    market = Market(cities)
+    names, goods = market.names, market.goods
+
+    t0 = time.perf_counter()
+    for k in range(trades):
+        market.apply_trade(names[k % n_cities], goods[k % n_goods], 1 if k % 2 else -1)
+    t_trade = (time.perf_counter() - t0) / trades
+
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        market.tick()
+    t_tick = (time.perf_counter() - t0) / ticks
+
+    print(f"{n_cities} cities x {n_goods} goods")
+    print(f"  apply_trade: {t_trade * 1e6:8.2f} us")
+    print(f"  tick:        {t_tick * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,45 @@
+# Single-pair and fuel-budgeted routing queries versus a full Dijkstra.
+# Run with: python -m city_trader.bench.routing [n_cities] [queries] [budget]
+import random
+import sys
+import time
+
+from city_trader.generator import generate_world
+
+
+def main(n_cities=100000, queries=20, budget=60, seed=1):
+    g, _ = generate_world(n_cities, "geometric", seed=seed)
+    rng = random.Random(seed)
+    names = list(g.cities)
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(queries)]
+
+    t0 = time.perf_counter()
+    expected = [g.dijkstra(s)[0][t] for s, t in pairs]
+    t_full = (time.perf_counter() - t0) / queries
+
+    t0 = time.perf_counter()
+    g.landmarks()
+    t_alt = time.perf_counter() - t0
+
+    timings = {}
+    for method in ("bidirectional", "astar"):
+        t0 = time.perf_counter()
+        costs = [g.route(s, t, method)[0] for s, t in pairs]
+        timings[method] = (time.perf_counter() - t0) / queries
+        assert costs == expected, method
+
+    t0 = time.perf_counter()
+    for s, _ in pairs:
+        g.within(s, budget)
+    t_within = (time.perf_counter() - t0) / queries
+
+    print(f"{n_cities} cities, {queries} random pairs")
+    print(f"  full dijkstra:        {t_full * 1000:9.2f} ms per query")
+    print(f"  bidirectional:        {timings['bidirectional'] * 1000:9.2f} ms per query")
+    print(f"  A* (ALT, 8 landmarks): {timings['astar'] * 1000:8.2f} ms per query "
+          f"(+{t_alt:.2f} s landmark setup, once per road network)")
+    print(f"  within fuel {budget:<8}   {t_within * 1000:9.2f} ms per query")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:4]))
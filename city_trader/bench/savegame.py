@@ -0,0 +1,62 @@
+# Save latency, load latency and log size of event-sourced save games.
+# Run with: python -m city_trader.bench.savegame [actions]
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from city_trader.player import Player
+from city_trader.game import Game
+from city_trader.savegame import save_game, load_game
+from city_trader.world import load_world
+
+_ROUND = (("buy", "wine", 1), ("travel", "Berlin"), ("sell", "wine", 1), ("travel", "Paris"))
+
+
+def main(actions=1000000, snapshot_every=50000):
+    graph, cities, _ = load_world()
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp) / "bench"
+        game = Game(graph, cities, Player("Paris", fuel=10 ** 12, money=10 ** 6))
+        journal = save_game(game, base)
+        journal.snapshot_every = snapshot_every
+
+        t0 = time.perf_counter()
+        for i in range(actions):
+            op, *args = _ROUND[i % 4]
+            getattr(game, op)(*args)
+        journal.flush()
+        t_play = time.perf_counter() - t0
+        size = base.with_suffix(".events").stat().st_size
+
+        t0 = time.perf_counter()
+        journal.snapshot()
+        t_snapshot = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        loaded = load_game(base, graph, cities, resume=False)
+        t_load = time.perf_counter() - t0
+        assert (loaded.player.money, loaded.player.location) == (game.player.money, game.player.location)
+
+        # worst case: the snapshot is one interval behind the log tail
+        journal.snapshot_every = 0
+        for i in range(snapshot_every - 1):
+            op, *args = _ROUND[i % 4]
+            getattr(game, op)(*args)
+        journal.flush()
+        t0 = time.perf_counter()
+        loaded = load_game(base, graph, cities, resume=False)
+        t_load_tail = time.perf_counter() - t0
+        assert loaded.player.money == game.player.money
+        journal.close()
+
+        print(f"{actions} actions, snapshot every {snapshot_every}")
+        print(f"  play + journal: {t_play:8.2f} s  ({t_play / actions * 1e6:.2f} us/action)")
+        print(f"  log size:       {size / 2**20:8.2f} MiB ({size / actions:.1f} B/action)")
+        print(f"  save snapshot:  {t_snapshot * 1000:8.2f} ms")
+        print(f"  load (no tail): {t_load * 1000:8.2f} ms")
+        print(f"  load (no new snapshot, tail {snapshot_every - 1}): {t_load_tail * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,37 @@
+# Compare the vectorized scanner with the dict-based suggest_best_move.
+# Run with: python -m city_trader.bench.scanner [n_cities] [n_goods]
+import sys
+import time
+
+from city_trader.optimizer import suggest_best_move
+from city_trader.scanner import PriceMatrix, top_moves
+from city_trader.bench.synthetic import random_world
+
+
+def main(n_cities=10000, n_goods=500, fuel=100):
+    g, cities = random_world(n_cities, n_goods)
+    start = next(iter(cities))
+    g.shortest_paths(start)  # both sides share the cached Dijkstra row
+
+    t0 = time.perf_counter()
+    expected = suggest_best_move(g, cities, start, fuel)
+    t_dict = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    matrix = PriceMatrix(cities)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    moves = top_moves(g, cities, start, fuel, k=10, matrix=matrix)
+    t_vec = time.perf_counter() - t0
+
+    best = moves[0] if moves else (None, None, 0)
+    assert best == expected, (best, expected)
+    print(f"{n_cities} cities x {n_goods} goods")
+    print(f"  suggest_best_move: {t_dict * 1000:9.2f} ms")
+    print(f"  PriceMatrix build: {t_build * 1000:9.2f} ms (once per price change)")
+    print(f"  top_moves (k=10):  {t_vec * 1000:9.2f} ms  speedup x{t_dict / t_vec:.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,48 @@
+# Import and first-frame latency of the board UI.
+# Run with: python -m city_trader.bench.startup
+import os
+import subprocess
+import sys
+import time
+
+from city_trader.bench.headless import HeadlessBoard
+
+_IMPORT = ("import time; t = time.perf_counter(); import city_trader.ui; "
+           "print(time.perf_counter() - t)")
+
+
+def import_time(repeat=5):
+    # Best of several fresh interpreters, so nothing is cached in sys.modules.
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _IMPORT], capture_output=True,
+                             text=True, check=True)
+        times.append(float(out.stdout))
+    return min(times)
+
+
+def first_frame(board_factory, world_path=None):
+    from city_trader.ui import TraderApp
+    t0 = time.perf_counter()
+    kwargs = {"board_factory": board_factory}
+    if world_path:
+        kwargs["world_path"] = world_path
+    app = TraderApp(**kwargs)
+    app.draw_world("Welcome!")
+    return time.perf_counter() - t0
+
+
+def main():
+    print(f"import city_trader.ui:        {import_time() * 1000:8.2f} ms")
+    print(f"first frame (headless board): {first_frame(HeadlessBoard) * 1000:8.2f} ms")
+    if os.environ.get("DISPLAY"):
+        try:
+            import game2dboard  # noqa: F401
+        except ImportError:
+            return
+        from city_trader.ui import _tk_board
+        print(f"first frame (game2dboard):    {first_frame(_tk_board) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
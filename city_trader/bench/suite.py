@@ -0,0 +1,299 @@
+# Benchmark suite for the hot paths, with empirical scaling exponents.
+#
+#   python -m city_trader.bench.suite                      quick sizes
+#   python -m city_trader.bench.suite --preset full        10 .. 100k cities, 5 .. 1k goods
+#   python -m city_trader.bench.suite --output now.json --baseline before.json
+#
+# Every benchmark is timed on synthetic worlds of growing size. A least-squares
+# fit of log(time) against log(n) gives the empirical exponent, which is checked
+# against the complexity claimed in the source comments (n is the size that the
+# claim is about, e.g. V for Dijkstra or C·G for the price table). With
+# --baseline, any benchmark more than --threshold slower than the stored run is
+# reported as a regression and the exit status is 1.
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import sys
+import time
+
+from city_trader.player import Player
+from city_trader.game import Game
+from city_trader.history import History
+from city_trader.optimizer import suggest_best_move
+from city_trader.bench.headless import HeadlessBoard
+from city_trader.bench.synthetic import random_world
+
+PRESETS = {
+    "quick": {"cities": [10, 100, 1000, 10000], "goods": [5, 50]},
+    "full": {"cities": [10, 100, 1000, 10000, 100000], "goods": [5, 50, 1000]},
+}
+
+# the C·G-sized benchmarks are skipped past this many price entries
+MAX_ENTRIES = 5_000_000
+
+
+def measure(fn, min_time=0.05, repeat=3):
+    # Seconds per call: best of `repeat` batches, each running at least min_time.
+    best = math.inf
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def fit_exponent(points):
+    # Slope of log(seconds) over log(n) by ordinary least squares.
+    pts = [(math.log(n), math.log(t)) for n, t in points if n > 0 and t > 0]
+    if len(pts) < 2:
+        return None
+    mx = sum(x for x, _ in pts) / len(pts)
+    my = sum(y for _, y in pts) / len(pts)
+    sxx = sum((x - mx) ** 2 for x, _ in pts)
+    if sxx == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in pts) / sxx
+
+
+#  Benchmarks: each takes (graph, cities, n_cities, n_goods) and returns
+#  (n, seconds per call); `claim` is the exponent of n in the documented complexity.
+
+def bench_dijkstra(g, cities, nc, ng):
+    source = next(iter(g.cities))
+    return nc, measure(lambda: g.dijkstra(source))
+
+
+def bench_suggest_best_move(g, cities, nc, ng):
+    source = next(iter(cities))
+
+    def cold():
+        g._rows.clear()
+        suggest_best_move(g, cities, source, 100)
+    return nc * ng, measure(cold)
+
+
+def bench_game_ops(g, cities, nc, ng):
+    start = next(iter(cities))
+    dest, _ = next(iter(g.neighbors(start)))
+    good = next(iter(cities[start].goods))
+    game = Game(g, cities, Player(start, fuel=10 ** 12, money=10 ** 12))
+
+    def round_trip():
+        game.buy(good, 1)
+        game.sell(good, 1)
+        game.travel(dest)
+        game.travel(start)
+    return nc, measure(round_trip) / 4
+
+
+def bench_history_add(g, cities, nc, ng):
+    h = History()
+    return nc, measure(lambda: h.record("Buy", "a", good="b", qty=1, amount=2))
+
+
+def bench_history_show(g, cities, nc, ng):
+    h = History()
+    for i in range(nc):
+        h.record("Travel", "a", "b")
+    return nc, measure(h.show)
+
+
+def bench_price_table_main(g, cities, nc, ng):
+    # first page after every price change, i.e. with a cold cache
+    from city_trader.main import show_price_table
+    from city_trader.prices import PriceView
+    view = PriceView(cities)
+
+    def render():
+        view.invalidate()
+        with contextlib.redirect_stdout(io.StringIO()):
+            show_price_table(cities, view)
+    return nc, measure(render)
+
+
+def bench_price_table_ui(g, cities, nc, ng):
+    app = _app(g, cities)
+
+    def render():
+        app.prices.invalidate()
+        app.show_prices(0)
+    return nc, measure(render)
+
+
+def bench_draw_world(g, cities, nc, ng):
+    # player hops between two neighboring cities that are on screen together, so
+    # every call redraws only the cells that changed (the O(d) path)
+    app = _app(g, cities)
+    start, dest = _on_screen_road(app, g)
+    app.player.location = start
+    app.draw_world()
+
+    def hop():
+        player = app.player
+        player.location = dest if player.location == start else start
+        app.draw_world()
+    return nc, measure(hop)
+
+
+def bench_draw_world_scroll(g, cities, nc, ng):
+    # the window scrolls one column per call, so every visible cell is re-read:
+    # O(R·C), bounded by the board size rather than the number of cities.
+    # Skipped while the whole map fits on the board.
+    app = _app(g, cities)
+    app.draw_world()
+    view = app.view
+    if view is None:
+        return None
+    view.scroll(0, 1)
+    if view.left == 0:
+        return None
+    step = [1]
+
+    def scroll():
+        left = view.left
+        view.scroll(0, step[0])
+        if view.left == left:
+            step[0] = -step[0]
+            view.scroll(0, step[0])
+        app.draw_world()
+    return nc, measure(scroll)
+
+
+def _on_screen_road(app, g, tries=1000):
+    # (city, neighbor) both visible once the window is centered on the city;
+    # falls back to the first road when no such pair is found
+    view = app.view
+    first = None
+    for n, city in enumerate(g.cities):
+        if n == tries:
+            break
+        for nbr, _ in g.neighbors(city):
+            if first is None:
+                first = (city, nbr)
+            if view is None:
+                return city, nbr
+            view.center_on(city)
+            if view.board_cell(nbr) is not None:
+                return city, nbr
+    return first
+
+
+def _app(g, cities):
+    from city_trader.ui import TraderApp
+    app = TraderApp(world=(g, cities), start_city=next(iter(cities)),
+                    board_factory=HeadlessBoard)
+    app.board  # build it outside the timed region
+    return app
+
+
+# name -> (function, claimed exponent, whether it scales with C·G)
+BENCHMARKS = {
+    "graph.dijkstra": (bench_dijkstra, 1.0, False),
+    "optimizer.suggest_best_move": (bench_suggest_best_move, 1.0, True),
+    "game.travel_buy_sell": (bench_game_ops, 0.0, False),
+    "history.add": (bench_history_add, 0.0, False),
+    "history.show": (bench_history_show, 1.0, False),
+    "main.show_price_table": (bench_price_table_main, 0.0, False),
+    "ui.show_prices": (bench_price_table_ui, 0.0, False),
+    "ui.draw_world": (bench_draw_world, 0.0, False),
+    "ui.draw_world.scroll": (bench_draw_world_scroll, 0.0, False),
+}
+
+
+def run(cities_sizes, goods_sizes, only=None, log=print):
+    # Returns {"results": [...], "scaling": {...}}
+    results = []
+    for ng in goods_sizes:
+        for nc in cities_sizes:
+            world = None
+            for name, (fn, _, per_entry) in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                if per_entry and nc * ng > MAX_ENTRIES:
+                    continue
+                if not per_entry and ng != goods_sizes[0]:
+                    continue    # does not depend on the number of goods
+                if world is None:
+                    world = random_world(nc, ng)
+                measured = fn(*world, nc, ng)
+                if measured is None:
+                    continue    # not applicable at this size
+                n, seconds = measured
+                results.append({"name": name, "cities": nc, "goods": ng, "n": n,
+                                "seconds": seconds})
+                log(f"{name:30} cities={nc:<7} goods={ng:<5} {seconds * 1e6:12.2f} us")
+
+    scaling = {}
+    for name, (_, claim, _) in BENCHMARKS.items():
+        points = [(r["n"], r["seconds"]) for r in results if r["name"] == name]
+        exponent = fit_exponent(points)
+        if exponent is None:
+            continue
+        # log factors and constant overheads blur small sizes, so allow some slack
+        scaling[name] = {"exponent": round(exponent, 3), "claimed": claim,
+                         "ok": abs(exponent - claim) <= 0.35}
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "results": results, "scaling": scaling}
+
+
+def compare(current, baseline, threshold=0.25):
+    # Benchmarks at least `threshold` slower than the baseline at the same size.
+    old = {(r["name"], r["cities"], r["goods"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        before = old.get((r["name"], r["cities"], r["goods"]))
+        if before and r["seconds"] > before * (1 + threshold):
+            regressions.append({**r, "baseline": before, "ratio": r["seconds"] / before})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="City Trader benchmark suite.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--cities", help="comma-separated city counts (overrides preset)")
+    parser.add_argument("--goods", help="comma-separated goods counts (overrides preset)")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    sizes = dict(PRESETS[args.preset])
+    if args.cities:
+        sizes["cities"] = [int(x) for x in args.cities.split(",")]
+    if args.goods:
+        sizes["goods"] = [int(x) for x in args.goods.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+
+    report = run(sizes["cities"], sizes["goods"], only)
+    print()
+    for name, fit in report["scaling"].items():
+        flag = "ok" if fit["ok"] else "MISMATCH"
+        print(f"{name:30} exponent {fit['exponent']:6.2f} (claimed {fit['claimed']:.0f})  {flag}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['name']} cities={r['cities']} goods={r['goods']}: "
+                  f"{r['ratio']:.2f}x slower than baseline")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
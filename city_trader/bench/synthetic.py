@@ -0,0 +1,28 @@
+import random
+
+from city_trader.graph import Graph
+from city_trader.city import City
+
+
+def random_world(n_cities, n_goods, degree=3, seed=0):
+    # Connected random road network (a spanning chain plus random extra roads)
+    # with every city selling a random subset of the goods.
+    # Average and worst case time complexity: O(V·degree + V·G)
+    rng = random.Random(seed)
+    names = [f"city{i}" for i in range(n_cities)]
+    goods = [f"good{j}" for j in range(n_goods)]
+
+    g = Graph()
+    for name in names:
+        g.add_city(name)
+    for i in range(1, n_cities):
+        g.add_road(names[i], names[rng.randrange(i)], rng.randint(1, 30))
+    for _ in range(max(0, n_cities * (degree - 2) // 2)):
+        a, b = rng.sample(names, 2)
+        g.add_road(a, b, rng.randint(1, 30))
+
+    cities = {}
+    for name in names:
+        sold = rng.sample(goods, max(1, int(n_goods * 0.8)))
+        cities[name] = City(name, {good: rng.randint(10, 120) for good in sold})
+    return g, cities
@@ -0,0 +1,56 @@
+# Random-policy stepping throughput: VecEnv versus one Game object per episode.
+# Run with: python -m city_trader.bench.vecenv [n_cities] [n_envs] [steps]
+import random
+import sys
+import time
+
+import numpy as np
+
+from city_trader.game import Game
+from city_trader.generator import generate_world
+from city_trader.player import Player
+from city_trader.vecenv import VecEnv, TRAVEL
+
+
+def main(n_cities=10000, n_envs=100000, steps=200, seed=1):
+    g, cities = generate_world(n_cities, "geometric", seed=seed)
+    env = VecEnv(g, cities, n_envs, horizon=100, seed=seed)
+    rng = np.random.default_rng(seed)
+    ids, _ = env.neighbor_slots()
+    width = ids.shape[1]
+
+    t0 = time.perf_counter()
+    for _ in range(steps):
+        kind = rng.integers(4, size=n_envs)
+        dest = ids[env.location, rng.integers(width, size=n_envs)]
+        arg = np.where(kind == TRAVEL, dest, rng.integers(len(env.goods), size=n_envs))
+        env.step(kind, arg, rng.integers(1, 5, size=n_envs))
+    t_vec = time.perf_counter() - t0
+    vec_rate = steps * n_envs / t_vec
+
+    # the same random policy through Game, one action at a time
+    pyrng = random.Random(seed)
+    names = list(cities)
+    goods = env.goods
+    game = Game(g, cities, Player(pyrng.choice(names)))
+    scalar_steps = 100000
+    t0 = time.perf_counter()
+    for step in range(scalar_steps):
+        if step % 100 == 0:
+            game = Game(g, cities, Player(pyrng.choice(names)))
+        kind = pyrng.randrange(4)
+        if kind == TRAVEL:
+            game.travel(pyrng.choice(list(g.cities[game.player.location])))
+        elif kind > TRAVEL:
+            op = game.buy if kind == 2 else game.sell
+            op(pyrng.choice(goods), pyrng.randint(1, 4))
+    scalar_rate = scalar_steps / (time.perf_counter() - t0)
+
+    print(f"{n_cities} cities, {n_envs} environments x {steps} steps")
+    print(f"  VecEnv:          {vec_rate / 1e6:8.2f} M steps/s ({env.episodes} episodes)")
+    print(f"  Game per action: {scalar_rate / 1e6:8.2f} M steps/s")
+    print(f"  speedup:         {vec_rate / scalar_rate:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:4]))
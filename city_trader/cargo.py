@@ -0,0 +1,278 @@
+import math
+
+from city_trader import metrics
+
+
+class Cargo:
+    # How many units of each good to buy in `here` and sell in `dest`.
+    # margin = revenue - cost; profit also charges the trip's fuel at fuel_value.
+    # exact is True when the quantities are optimal, otherwise `gap` bounds how
+    # much margin an optimal mix could add (LP relaxation minus this mix).
+    def __init__(self, here, dest, items=(), cost=0, revenue=0, fuel_cost=0, fuel_value=0.5,
+                 exact=True, bound=None):
+        # average and worst case time complexity: O(1)
+        self.here = here
+        self.dest = dest
+        self.items = list(items)      # (good, qty, total cost, total revenue)
+        self.cost = cost
+        self.revenue = revenue
+        self.fuel_cost = fuel_cost
+        self.fuel_value = fuel_value
+        self.exact = exact
+        self.bound = self.margin if bound is None else bound
+
+    @property
+    def margin(self):
+        return self.revenue - self.cost
+
+    @property
+    def profit(self):
+        return self.margin - self.fuel_cost * self.fuel_value
+
+    @property
+    def gap(self):
+        return max(0, self.bound - self.margin)
+
+    @property
+    def units(self):
+        return sum(qty for _, qty, _, _ in self.items)
+
+    def lines(self):
+        # Let G = number of goods in the mix
+        # Average and worst case time complexity: O(G)
+        out = [f"Buy {qty} {good} in {self.here} for ${cost} (sells for ${revenue})"
+               for good, qty, cost, revenue in self.items]
+        out.append(f"Travel to {self.dest} (fuel {self.fuel_cost:g}) and sell everything")
+        quality = "optimal" if self.exact else f"within ${self.gap:.0f} of optimal"
+        out.append(f"Spend ${self.cost}, earn ${self.revenue}: "
+                   f"profit ≈ ${self.profit:g} after fuel ({quality})")
+        return out
+
+    def __repr__(self):
+        return f"Cargo({self.here}->{self.dest}, units={self.units}, profit={self.profit})"
+
+
+def _candidates(cities, here, dest):
+    # Goods worth carrying from here to dest, with dominated goods removed: a good
+    # is dropped if another one costs no more and earns at least as much per unit.
+    # Let G = number of goods in `here`
+    # Average and worst case time complexity: O(G log G)
+    sells = cities[dest].goods
+    goods = []
+    for good, buy in cities[here].goods.items():
+        sell = sells.get(good)
+        if sell is not None and buy > 0 and sell > buy:
+            goods.append((buy, -(sell - buy), good, sell))
+    goods.sort()
+    kept = []
+    best_margin = 0
+    for buy, neg_margin, good, sell in goods:
+        if -neg_margin > best_margin:
+            best_margin = -neg_margin
+            kept.append((good, buy, sell))
+    return kept
+
+
+def _lp_bound(goods, money, capacity):
+    # Optimal value of the LP relaxation (fractional quantities).
+    # Cash only: spend everything on the best margin per dollar. With a capacity,
+    # the Lagrangian dual min over l >= 0 of l·money + capacity·max(0, max_i(m_i - l·p_i))
+    # is convex in l; every l gives a valid upper bound, and a ternary search gets
+    # within rounding of the minimum.
+    # Average and worst case time complexity: O(G) without capacity, O(G·60) with it
+    if not goods:
+        return 0
+    best_ratio = max((sell - buy) / buy for _, buy, sell in goods)
+    if capacity is None:
+        return money * best_ratio
+
+    def dual(l):
+        return l * money + capacity * max(0, max(sell - buy - l * buy for _, buy, sell in goods))
+
+    lo, hi = 0.0, best_ratio
+    for _ in range(60):
+        a = lo + (hi - lo) / 3
+        b = hi - (hi - lo) / 3
+        if dual(a) <= dual(b):
+            hi = b
+        else:
+            lo = a
+    return min(dual(lo), dual(hi), money * best_ratio, capacity * max(s - b for _, b, s in goods))
+
+
+def _fill(goods, order, money, capacity):
+    # Buy as many of each good as cash and space allow, in the given order.
+    qty = [0] * len(goods)
+    left = capacity
+    for i in order:
+        _, buy, _ = goods[i]
+        n = int(money // buy)
+        if left is not None:
+            n = min(n, left)
+            left -= n
+        qty[i] = n
+        money -= n * buy
+    return qty
+
+
+def _greedy(goods, money, capacity):
+    # Best of a few greedy fills: by margin per dollar, by margin per unit of
+    # space, and (with a capacity) by margin net of the dual price of cash.
+    # Cash only, the first order alone is within one unit's margin of the optimum.
+    # Average and worst case time complexity: O(G log G)
+    idx = range(len(goods))
+    orders = [sorted(idx, key=lambda i: (goods[i][1] - goods[i][2]) / goods[i][1])]
+    if capacity is not None:
+        orders.append(sorted(idx, key=lambda i: goods[i][1] - goods[i][2]))
+        # cash and space are both binding: prefer margin per unit of the tighter one
+        per_unit_cash = money / capacity if capacity else math.inf
+        orders.append(sorted(idx, key=lambda i: (goods[i][1] - goods[i][2])
+                             / max(goods[i][1], per_unit_cash)))
+    best = None
+    for order in orders:
+        qty = _fill(goods, order, money, capacity)
+        margin = sum(q * (sell - buy) for q, (_, buy, sell) in zip(qty, goods))
+        if best is None or margin > best[0]:
+            best = (margin, qty)
+    return best[1]
+
+
+def _exact(goods, money, capacity):
+    # Unbounded knapsack by dynamic programming over whole dollars (and cargo
+    # units when a capacity is set). Needs integral prices.
+    # Let M = money, K = capacity, G = candidate goods
+    # Average and worst case time complexity: O(M·G), or O(K·M·G) with a capacity
+    money = int(money)
+    qty = [0] * len(goods)
+    if capacity is None:
+        best = [0] * (money + 1)
+        choice = [-1] * (money + 1)
+        for b in range(1, money + 1):
+            value, pick = best[b - 1], -1
+            for i, (_, buy, sell) in enumerate(goods):
+                if buy <= b and best[b - buy] + sell - buy > value:
+                    value, pick = best[b - buy] + sell - buy, i
+            best[b], choice[b] = value, pick
+        b = money
+        while b > 0:
+            i = choice[b]
+            if i < 0:
+                b -= 1
+            else:
+                qty[i] += 1
+                b -= goods[i][1]
+        return qty
+
+    # best[c][b]: top margin with at most c units and b dollars
+    prev = [0] * (money + 1)
+    choices = []
+    for _ in range(capacity):
+        cur = prev[:]
+        choice = [-1] * (money + 1)
+        for i, (_, buy, sell) in enumerate(goods):
+            m = sell - buy
+            for b in range(buy, money + 1):
+                if prev[b - buy] + m > cur[b]:
+                    cur[b] = prev[b - buy] + m
+                    choice[b] = i
+        choices.append(choice)
+        prev = cur
+    b = money
+    for choice in reversed(choices):
+        i = choice[b]
+        if i >= 0:
+            qty[i] += 1
+            b -= goods[i][1]
+    return qty
+
+
+def _market_fill(market, goods, here, dest, money, capacity):
+    # With a Market every extra unit costs more and sells for less, so each
+    # good is bought (best margin per dollar first) up to the quantity where
+    # the next unit stops paying, quoted the way Game.buy and Game.sell charge.
+    # Let Q = units bought
+    # Average and worst case time complexity: O(G log G + G log Q)
+    items = []
+    left = capacity
+    for good, buy, sell in sorted(goods, key=lambda g: (g[1] - g[2]) / g[1]):
+        if left == 0:
+            break
+        qty, cost, revenue = market.best_trade(here, dest, good, money, left)
+        if qty:
+            items.append((good, qty, cost, revenue))
+            money -= cost
+            if left is not None:
+                left -= qty
+    return items
+
+
+def plan_cargo(cities, here, dest, money, capacity=None, fuel_cost=0, fuel_value=0.5,
+               exact_limit=300_000, market=None):
+    # Maximize the margin of one trip here -> dest: choose integer quantities q_i
+    # with sum(q_i·buy_i) <= money and sum(q_i) <= capacity (if given).
+    # Solved exactly by DP when prices are integers and the table is at most
+    # exact_limit cells, otherwise greedily with the LP relaxation as error bound.
+    # With a market, prices move with every unit (see _market_fill) and the mix
+    # is greedy; the fixed-price LP bound still bounds it from above.
+    # Let G = goods in `here`
+    # Average-case time complexity: O(G log G) greedy, O(min(exact_limit, M·K·G)) exact
+    # Worst-case time complexity: same
+    goods = _candidates(cities, here, dest)
+    if capacity is not None:
+        capacity = max(0, int(capacity))
+        if goods and capacity >= money // min(buy for _, buy, _ in goods):
+            capacity = None   # never binding: cash runs out first
+    bound = _lp_bound(goods, money, capacity)
+    if market is not None:
+        items = _market_fill(market, goods, here, dest, money, capacity)
+        items.sort(key=lambda item: item[2] - item[3])
+        cost = sum(item[2] for item in items)
+        revenue = sum(item[3] for item in items)
+        return Cargo(here, dest, items, cost, revenue, fuel_cost, fuel_value, False, bound)
+    integral = all(isinstance(buy, int) for _, buy, _ in goods) and money == int(money)
+    cells = (int(money) + 1) * (1 if capacity is None else capacity) * len(goods)
+    exact = integral and cells <= exact_limit
+    qty = _exact(goods, money, capacity) if exact else _greedy(goods, money, capacity)
+
+    items = [(good, q, q * buy, q * sell) for q, (good, buy, sell) in zip(qty, goods) if q]
+    items.sort(key=lambda item: item[2] - item[3])
+    cost = sum(item[2] for item in items)
+    revenue = sum(item[3] for item in items)
+    return Cargo(here, dest, items, cost, revenue, fuel_cost, fuel_value, exact,
+                 revenue - cost if exact else bound)
+
+
+@metrics.timed("cargo.best_cargo")
+def best_cargo(graph, cities, here, fuel, money, capacity=None, fuel_value=0.5,
+               exact_limit=300_000, market=None):
+    # Best single-trip cargo over every destination reachable with `fuel`,
+    # priced along the market's curves when a market is given.
+    # Destinations are tried in order of their LP bound minus fuel, and the
+    # search stops once no remaining bound can beat the best mix found.
+    # Let V = number of cities, G = goods per city
+    # Average-case time complexity: O(V·G log G) plus a few plan_cargo calls
+    # Worst-case time complexity: O(V · plan_cargo)
+    # Returns None when no trip is profitable.
+    if here not in cities:
+        return None
+    bounds = []
+    for dest, fuel_cost in graph.within(here, fuel).items():
+        if dest == here or dest not in cities:
+            continue
+        goods = _candidates(cities, here, dest)
+        if goods:
+            cap = capacity
+            if cap is not None and cap >= money // min(buy for _, buy, _ in goods):
+                cap = None
+            bounds.append((_lp_bound(goods, money, cap) - fuel_cost * fuel_value, dest, fuel_cost))
+    bounds.sort(key=lambda b: -b[0])
+
+    best = None
+    for bound, dest, fuel_cost in bounds:
+        if best is not None and bound <= best.profit:
+            break
+        cargo = plan_cargo(cities, here, dest, money, capacity, fuel_cost, fuel_value, exact_limit,
+                           market)
+        if cargo.items and (best is None or cargo.profit > best.profit):
+            best = cargo
+    return best if best is not None and best.profit > 0 else None
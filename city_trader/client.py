@@ -0,0 +1,195 @@
+# Client and load tester for city_trader.server.
+#
+#   python -m city_trader.client --port 8765 --sessions 10000 --connections 200
+#   python -m city_trader.client --unix /tmp/trader.sock --sessions 1000
+#   python -m city_trader.client --spawn --sessions 10000    (starts an in-process server)
+#
+# The load test opens `connections` sockets, creates `sessions` game sessions
+# spread over them and drives every session concurrently through a random mix
+# of travel / buy / sell / state / advise requests. Latency is measured per
+# request from write to matching response; p50, p99 and throughput are printed.
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Client:
+    # One connection; requests are pipelined and matched to responses by id.
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._next_id = 0
+        self._waiting = {}
+        self._listener = asyncio.create_task(self._listen())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._waiting.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("server closed the connection"))
+            self._waiting.clear()
+
+    async def request(self, op, **fields):
+        self._next_id += 1
+        rid = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[rid] = future
+        self.writer.write(json.dumps({"id": rid, "op": op, **fields}).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self._listener.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list.
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+async def _drive(client, start, steps, rng, latencies, errors, advise_rate):
+    timed = time.perf_counter
+    t = timed()
+    reply = await client.request("new", start=start)
+    latencies.append(timed() - t)
+    if not reply["ok"]:
+        errors.append(reply["error"])
+        return
+    sid = reply["session"]
+    state = reply["state"]
+    neighbors = {}
+    for _ in range(steps):
+        roll = rng.random()
+        if roll < advise_rate:
+            fields = {"op": "advise"}
+        elif roll < 0.4:
+            here = state["location"]
+            if here not in neighbors:
+                neighbors[here] = [c for c in client.roads.get(here, ())]
+            fields = {"op": "travel", "city": rng.choice(neighbors[here] or [here])}
+        elif roll < 0.7:
+            fields = {"op": "buy", "good": rng.choice(client.goods), "qty": 1}
+        elif roll < 0.9:
+            held = [g for g, q in state["inventory"].items() if q]
+            fields = {"op": "sell", "good": rng.choice(held or client.goods), "qty": 1}
+        else:
+            fields = {"op": "state"}
+        t = timed()
+        reply = await client.request(session=sid, **fields)
+        latencies.append(timed() - t)
+        if not reply["ok"]:
+            errors.append(reply["error"])
+        elif "state" in reply:
+            state = reply["state"]
+    await client.request("close", session=sid)
+
+
+async def load_test(host="127.0.0.1", port=8765, unix_path=None, sessions=10000,
+                    connections=200, steps=10, advise_rate=0.05, seed=0, world=None):
+    # world: (graph, cities) used to pick sensible moves; requests are sent blind otherwise
+    rng = random.Random(seed)
+    clients = [await Client.connect(host, port, unix_path) for _ in range(connections)]
+    if world is not None:
+        graph, cities = world
+        roads = {c: list(graph.cities[c]) for c in cities}
+        goods = sorted({g for city in cities.values() for g in city.goods})
+        starts = list(cities)
+    else:
+        roads, goods, starts = {}, ["wine"], [None]
+    for client in clients:
+        client.roads, client.goods = roads, goods
+
+    latencies, errors = [], []
+    began = time.perf_counter()
+    await asyncio.gather(*(
+        _drive(clients[i % connections], rng.choice(starts), steps,
+               random.Random(rng.random()), latencies, errors, advise_rate)
+        for i in range(sessions)))
+    elapsed = time.perf_counter() - began
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    return {"sessions": sessions, "connections": connections, "requests": len(latencies),
+            "errors": len(errors), "seconds": elapsed,
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000}
+
+
+async def _spawned(args):
+    from city_trader.server import TraderServer
+    from city_trader.world import load_world
+    graph, cities, _ = load_world(args.world)
+    server = TraderServer(graph, cities, max_sessions=max(args.sessions, 1))
+    listener = await server.start(args.host, 0, args.unix)
+    port = args.port if args.unix else listener.sockets[0].getsockname()[1]
+    try:
+        return await load_test(args.host, port, args.unix, args.sessions, args.connections,
+                               args.steps, args.advise_rate, args.seed, world=(graph, cities))
+    finally:
+        await server.close()
+
+
+async def _remote(args):
+    world = None
+    if args.world:
+        from city_trader.world import load_world
+        graph, cities, _ = load_world(args.world)
+        world = (graph, cities)
+    return await load_test(args.host, args.port, args.unix, args.sessions, args.connections,
+                           args.steps, args.advise_rate, args.seed, world=world)
+
+
+def main(argv=None):
+    from city_trader.world import WORLD_PATH
+    parser = argparse.ArgumentParser(description="Load-test a City Trader server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=10, help="requests per session")
+    parser.add_argument("--advise-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--world", default=str(WORLD_PATH),
+                        help="world the server runs, used to pick valid moves")
+    parser.add_argument("--spawn", action="store_true", help="run the server in this process")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_spawned(args) if args.spawn else _remote(args))
+    print(f"{report['sessions']} sessions over {report['connections']} connections: "
+          f"{report['requests']} requests in {report['seconds']:.2f} s "
+          f"({report['throughput']:.0f} req/s), {report['errors']} errors")
+    print(f"latency p50 {report['p50_ms']:.2f} ms  p99 {report['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+from array import array
+from collections.abc import Mapping
+from bisect import bisect_left
+
+from city_trader.graph import Graph
+from city_trader import metrics
+
+_REMOVED = object()   # pending edit marker for a closed road
+
+
+class CompactGraph(Graph):
+    # Read-mostly road network stored as compressed sparse rows.
+    # City names are interned to integer ids 0..V-1; the roads leaving city i are
+    # targets[offsets[i]:offsets[i + 1]] with fuel costs at the same positions,
+    # sorted by target id. Exposes the same API as Graph (cities, neighbors,
+    # dijkstra, shortest_paths, add_road, ...), so Game, optimizer and ui work
+    # with either backend.
+    def __init__(self, names, offsets, targets, costs, max_cached_rows=None):
+        # Average and worst case time complexity: O(V)
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+        self._pending = {}   # road edits waiting for the next rebuild
+        self._view = _Adjacency(self)
+        self._init_caches(max_cached_rows)
+
+    @classmethod
+    def from_graph(cls, graph):
+        # Let V = number of cities, E = number of roads
+        # Average-case time complexity: O(V + E log d), d = max degree
+        # Worst-case time complexity: O(V + E log d)
+        names = list(graph.cities)
+        index = {name: i for i, name in enumerate(names)}
+        entries = []
+        for name in names:
+            row = []
+            for nbr, cost in graph.cities[name].items():
+                row.append((index[nbr], _check_cost(name, nbr, cost)))
+            row.sort()
+            entries.append(row)
+
+        integral = all(float(c).is_integer() for row in entries for _, c in row)
+        offsets = array('q', [0])
+        targets = array('i')
+        costs = array('q' if integral else 'd')
+        for row in entries:
+            for j, cost in row:
+                targets.append(j)
+                costs.append(int(cost) if integral else float(cost))
+            offsets.append(len(targets))
+        return cls(names, offsets, targets, costs, graph.max_cached_rows)
+
+    def thaw(self):
+        # Back to a mutable dict-of-dicts Graph.
+        # Average and worst case time complexity: O(V + E)
+        self._flush()
+        g = Graph(self.max_cached_rows)
+        for name in self.names:
+            g.add_city(name)
+        for i, name in enumerate(self.names):
+            for k in range(self.offsets[i], self.offsets[i + 1]):
+                g.cities[name][self.names[self.targets[k]]] = self.costs[k]
+        return g
+
+    #  Mutation: edits are buffered and applied with one O(V + E) rebuild
+    def add_city(self, name):
+        # Average and worst case time complexity: O(1)
+        if name not in self.index and name not in self._pending:
+            self._pending[name] = None
+            self._invalidate()
+
+    def add_road(self, city1, city2, fuel_cost):
+        # Average time complexity: O(1) (plus one rebuild before the next read)
+        _check_cost(city1, city2, fuel_cost)
+        if self._road_cost(city1, city2) == fuel_cost:
+            return
+        self._pending.pop((city2, city1), None)
+        self._pending[(city1, city2)] = fuel_cost
+        self._invalidate()
+
+    def update_road(self, city1, city2, fuel_cost):
+        # Average time complexity: O(1) (plus one rebuild before the next read)
+        self.add_road(city1, city2, fuel_cost)
+
+    def remove_road(self, city1, city2):
+        # Average time complexity: O(1) (plus one rebuild before the next read)
+        if self._road_cost(city1, city2) is None:
+            raise KeyError(f"No road between {city1} and {city2}")
+        self._pending.pop((city2, city1), None)
+        self._pending[(city1, city2)] = _REMOVED
+        self._invalidate()
+
+    def _road_cost(self, city1, city2):
+        # Average time complexity: O(log d), without forcing a rebuild
+        for key in ((city1, city2), (city2, city1)):
+            if key in self._pending:
+                cost = self._pending[key]
+                return None if cost is _REMOVED else cost
+        i = self.index.get(city1)
+        j = self.index.get(city2)
+        if i is None or j is None:
+            return None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        k = bisect_left(self.targets, j, lo, hi)
+        return self.costs[k] if k < hi and self.targets[k] == j else None
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        g = self.thaw()
+        for key, cost in pending.items():
+            if cost is None:
+                g.add_city(key)
+            elif cost is _REMOVED:
+                if key[1] in g.cities.get(key[0], {}):
+                    g.remove_road(key[0], key[1])
+            else:
+                g.add_road(key[0], key[1], cost)
+        rebuilt = CompactGraph.from_graph(g)
+        self.names, self.index = rebuilt.names, rebuilt.index
+        self.offsets, self.targets, self.costs = rebuilt.offsets, rebuilt.targets, rebuilt.costs
+
+    #  Read API shared with Graph
+    @property
+    def cities(self):
+        # Mapping view: cities[name][neighbor] -> fuel cost. The view is shared
+        # and stays current: pending edits are applied on its first read.
+        return self._view
+
+    def neighbors(self, city):
+        # Average and worst case time complexity: O(1)
+        return self.cities.get(city, {}).items()
+
+    @metrics.timed("graph.dijkstra")
+    def dijkstra(self, source):
+        # Let V = number of cities, E = number of roads
+        # Average-case time complexity: O((V + E) log V)
+        # Worst-case time complexity: O((V + E) log V)
+        self._flush()
+        s = self.index.get(source)
+        if s is None:
+            return {}, {}
+        dist, prev = self.dijkstra_ids(s)
+        names = self.names
+        return (dict(zip(names, dist)),
+                {name: (names[p] if p >= 0 else None) for name, p in zip(names, prev)})
+
+    def dijkstra_ids(self, s):
+        # Same as dijkstra but on integer ids, returning plain lists.
+        # Average and worst case time complexity: O((V + E) log V)
+        import heapq
+        self._flush()
+        offsets, targets, costs = self.offsets, self.targets, self.costs
+        dist = [float('inf')] * len(self.names)
+        prev = [-1] * len(self.names)
+        dist[s] = 0.0
+        pq = [(0.0, s)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d != dist[u]:
+                continue
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                nd = d + costs[k]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(pq, (nd, v))
+        if metrics.ENABLED:
+            settled = [u for u, d in enumerate(dist) if d != float('inf')]
+            metrics.incr("graph.dijkstra.settled", len(settled))
+            metrics.incr("graph.dijkstra.edges_scanned",
+                         sum(offsets[u + 1] - offsets[u] for u in settled))
+        return dist, prev
+
+
+class _Adjacency(Mapping):
+    # cities view of a CompactGraph: name -> _Row
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, name):
+        g = self._graph
+        if g._pending:
+            g._flush()
+        return _Row(g, g.index[name])
+
+    def __contains__(self, name):
+        g = self._graph
+        if g._pending:
+            g._flush()
+        return name in g.index
+
+    def __iter__(self):
+        g = self._graph
+        if g._pending:
+            g._flush()
+        return iter(g.names)
+
+    def __len__(self):
+        g = self._graph
+        if g._pending:
+            g._flush()
+        return len(g.names)
+
+
+class _Row(Mapping):
+    # One city's roads: neighbor name -> fuel cost, looked up by bisection.
+    # The row's slice is read from the graph on every access, so a view held
+    # across edits follows the rebuilt arrays (city ids never change).
+    def __init__(self, graph, i):
+        self._graph = graph
+        self._i = i
+
+    def _span(self):
+        g = self._graph
+        if g._pending:
+            g._flush()
+        return g.offsets[self._i], g.offsets[self._i + 1]
+
+    def __getitem__(self, name):
+        # Average and worst case time complexity: O(log d)
+        g = self._graph
+        lo, hi = self._span()
+        j = g.index.get(name)
+        if j is not None:
+            k = bisect_left(g.targets, j, lo, hi)
+            if k < hi and g.targets[k] == j:
+                return g.costs[k]
+        raise KeyError(name)
+
+    def __iter__(self):
+        g = self._graph
+        lo, hi = self._span()
+        return (g.names[g.targets[k]] for k in range(lo, hi))
+
+    def __len__(self):
+        lo, hi = self._span()
+        return hi - lo
+
+
+def _check_cost(city1, city2, cost):
+    # Validates a fuel cost once, when the road enters the compact graph.
+    try:
+        value = float(cost)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid fuel cost {cost!r} on road {city1} - {city2}") from None
+    if value < 0 or value != value:
+        raise ValueError(f"Invalid fuel cost {cost!r} on road {city1} - {city2}")
+    return cost
@@ -1,18 +1,39 @@
+from enum import IntEnum
+
 from city_trader.player import Player
 from city_trader.city import City
 from city_trader.graph import Graph
 from city_trader.history import History
+from city_trader import metrics
+
+
+class Result(IntEnum):
+    # Outcome of one command in Game.execute
+    OK = 0
+    SAME_CITY = 1       # "You are already in this city."
+    NO_ROAD = 2         # "Invalid destination — no road from here."
+    NO_FUEL = 3         # "Not enough fuel to travel!"
+    NOT_SOLD = 4        # "This city doesn’t sell that item."
+    NO_MONEY = 5        # "You don’t have enough money."
+    NO_SPACE = 6        # "Not enough cargo space."
+    NOT_OWNED = 7       # "You don’t have enough items to sell."
+    BAD_QUANTITY = 8    # quantity is not a positive integer
+    BAD_COMMAND = 9     # unknown or malformed command
+    SKIPPED = 10        # not checked: an earlier command in the batch failed
 
 
 class Game:
-    def __init__(self, graph: Graph, cities: dict[str, City], player: Player):
+    def __init__(self, graph: Graph, cities: dict[str, City], player: Player, market=None):
         # average and worst case time complexity: O(n)
         self.graph = graph
         self.cities = cities
         self.player = player
+        self.market = market  # optional market.Market: trades move prices, travel ticks
         self.starting_money = player.money
         self.history = History()
+        self.journal = None   # optional savegame.Journal, told about every state change
 
+    @metrics.timed("game.travel")
     def travel(self, destination: str):
         # average and worst case time complexity: O(n)
         location = self.player.location
@@ -31,47 +52,172 @@ class Game:
 
         self.player.fuel -= fuel_cost
         self.player.location = destination
+        if self.market is not None:
+            self.market.tick()
 
         # Record the travel action
-        self.history.add("Travel", f"Traveled from {location} to {destination}")
+        self.history.record("Travel", location, destination)
+        if self.journal is not None:
+            self.journal.append("travel", destination)
 
         return f"  Traveled to {destination}. Fuel left: {self.player.fuel}"
 
+    @metrics.timed("game.buy")
     def buy(self, item: str, quantity: int):
         # average and worst case time complexity: O(n)
         city = self.cities[self.player.location]
         if item not in city.goods:
             return "This city doesn’t sell that item."
 
-        total_cost = city.goods[item] * quantity
+        total_cost = self._trade_value(self.player.location, item, quantity)
         if total_cost > self.player.money:
             return "You don’t have enough money."
 
+        capacity = self.player.capacity
+        if capacity is not None and self.player.cargo() + quantity > capacity:
+            return "Not enough cargo space."
+
         self.player.money -= total_cost
         self.player.inventory[item] = self.player.inventory.get(item, 0) + quantity
+        if self.market is not None:
+            self.market.apply_trade(self.player.location, item, quantity)
 
         # Record the buy action
-        self.history.add("Buy", f"Bought {quantity} {item} in {self.player.location} for ${total_cost}")
+        self.history.record("Buy", self.player.location, good=item, qty=quantity, amount=total_cost)
+        if self.journal is not None:
+            self.journal.append("buy", item, quantity)
 
         return f"Bought {quantity} {item} for ${total_cost}."
 
+    @metrics.timed("game.sell")
     def sell(self, item: str, quantity: int):
         # average and worst case time complexity: O(n)
         if self.player.inventory.get(item, 0) < quantity:
             return "You don’t have enough items to sell."
 
-        city = self.cities[self.player.location]
-        price = city.goods.get(item, 0)
-        total_income = price * quantity
+        total_income = self._trade_value(self.player.location, item, -quantity)
 
         self.player.inventory[item] -= quantity
         self.player.money += total_income
+        if self.market is not None:
+            self.market.apply_trade(self.player.location, item, -quantity)
 
         # Record the sell action
-        self.history.add("Sell", f"Sold {quantity} {item} in {self.player.location} for ${total_income}")
+        self.history.record("Sell", self.player.location, good=item, qty=quantity, amount=total_income)
+        if self.journal is not None:
+            self.journal.append("sell", item, quantity)
 
         return f"Sold {quantity} {item} for ${total_income}."
 
+    def _trade_value(self, location, item, quantity):
+        # Money for trading quantity units (negative to sell): along the market's
+        # price curve when there is one, else the listed price per unit.
+        # average and worst case time complexity: O(1)
+        if self.market is not None:
+            total = self.market.quote(location, item, quantity)
+            if total is not None:
+                return total
+        return self.cities[location].goods.get(item, 0) * abs(quantity)
+
+    @metrics.timed("game.execute")
+    def execute(self, commands):
+        # Apply a batch of commands all-or-nothing:
+        #   ("travel", city)   ("buy", good, qty)   ("sell", good, qty)
+        # Every command is checked against the state projected by the ones
+        # before it, with the same rules as travel/buy/sell. Only if all pass is
+        # the player updated, one history entry written and one journal event
+        # logged; otherwise nothing changes. Returns (applied, [Result per command]).
+        # Let K = number of commands
+        # Average-case time complexity: O(K) (plus one market tick per travel)
+        # Worst-case time complexity: O(K + I), I = distinct goods in the inventory
+        player = self.player
+        roads = self.graph.cities
+        cities = self.cities
+        market = self.market
+        location, fuel, money = player.location, player.fuel, player.money
+        inventory = player.inventory
+        changed = {}            # projected inventory counts of the goods touched
+        cargo = player.cargo() if player.capacity is not None else 0
+        codes = []
+        if market is not None:
+            market.begin()      # trades and ticks below are undone if the batch fails
+        try:
+            for command in commands:
+                code = Result.OK
+                # malformed commands (wrong shape, non-string names) are
+                # reported, not raised
+                op = command[0] if isinstance(command, (list, tuple)) and command else None
+                if op == "travel" and len(command) == 2 and isinstance(command[1], str):
+                    dest = command[1]
+                    if dest == location:
+                        code = Result.SAME_CITY
+                    elif dest not in roads.get(location, {}):
+                        code = Result.NO_ROAD
+                    else:
+                        cost = roads[location][dest]
+                        if fuel < cost:
+                            code = Result.NO_FUEL
+                        else:
+                            fuel -= cost
+                            location = dest
+                            if market is not None:
+                                market.tick()
+                elif op in ("buy", "sell") and len(command) == 3 and isinstance(command[1], str):
+                    _, item, qty = command
+                    if type(qty) is not int or qty <= 0:
+                        code = Result.BAD_QUANTITY
+                    elif op == "buy":
+                        goods = cities[location].goods
+                        if item not in goods:
+                            code = Result.NOT_SOLD
+                        else:
+                            total = self._trade_value(location, item, qty)
+                            if total > money:
+                                code = Result.NO_MONEY
+                            elif player.capacity is not None and cargo + qty > player.capacity:
+                                code = Result.NO_SPACE
+                            else:
+                                money -= total
+                                cargo += qty
+                                changed[item] = changed.get(item, inventory.get(item, 0)) + qty
+                                if market is not None:
+                                    market.apply_trade(location, item, qty)
+                    else:
+                        held = changed.get(item, inventory.get(item, 0))
+                        if held < qty:
+                            code = Result.NOT_OWNED
+                        else:
+                            money += self._trade_value(location, item, -qty)
+                            cargo -= qty
+                            changed[item] = held - qty
+                            if market is not None:
+                                market.apply_trade(location, item, -qty)
+                else:
+                    code = Result.BAD_COMMAND
+                codes.append(code)
+                if code:
+                    codes.extend([Result.SKIPPED] * (len(commands) - len(codes)))
+                    if market is not None:
+                        market.rollback()
+                    return False, codes
+        except BaseException:
+            if market is not None:
+                market.rollback()
+            raise
+
+        if market is not None:
+            market.commit()
+        if not codes:
+            return True, codes
+        start = player.location
+        net = money - player.money
+        player.location, player.fuel, player.money = location, fuel, money
+        inventory.update(changed)
+        self.history.record("Batch", start, location, qty=len(codes), amount=net)
+        if self.journal is not None:
+            self.journal.append("execute", [list(command) for command in commands])
+        return True, codes
+
     def profit(self):
         
         return self.player.money - self.starting_money
@@ -0,0 +1,255 @@
+# Deterministic synthetic worlds for scale and load testing.
+#
+#   python -m city_trader.generator big.jsonl --cities 1000000 --topology geometric
+#
+# Worlds use the world.json schema ({"cities": ..., "roads": ...}) or, for a
+# .jsonl target, the line-delimited format read by world.py. Output is streamed:
+# cities are written in one pass and roads in a second, each drawn from its own
+# seeded random stream, so memory stays bounded however large the world is
+# (scale-free graphs keep one compact int array of edge endpoints).
+#
+# Topologies:
+#   grid        square lattice, roads to the right and below
+#   geometric   random points in the unit square, roads between close points
+#   scale-free  Barabasi-Albert preferential attachment (hubs)
+#   continents  several grid continents joined by a few long bridges
+import argparse
+import math
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from city_trader.graph import Graph
+from city_trader.city import City
+
+TOPOLOGIES = ("grid", "geometric", "scale-free", "continents")
+PRICE_DISTRIBUTIONS = ("uniform", "lognormal")
+
+
+def city_name(i):
+    return f"c{i}"
+
+
+def good_name(j):
+    return f"good{j}"
+
+
+#  Roads: each generator yields (city id, city id, fuel cost)
+
+def _grid_roads(ids, width, rng, max_cost):
+    # ids is a range of consecutive city ids laid out row by row
+    first, n = ids.start, len(ids)
+    rand = rng.random
+    for k in range(n):
+        if (k + 1) % width and k + 1 < n:
+            yield first + k, first + k + 1, 1 + int(rand() * max_cost)
+        if k + width < n:
+            yield first + k, first + k + width, 1 + int(rand() * max_cost)
+
+
+def _geometric_roads(n, rng, max_cost, per_cell=2):
+    # Points are generated cell by cell (row-major) over a square grid of cells
+    # whose side is the connection radius; only the previous row of cells is
+    # kept, so memory is O(sqrt(n)).
+    side = max(1, math.ceil(math.sqrt(n / per_cell)))
+    cells = side * side
+    base, extra = divmod(n, cells)
+    r = 1.0 / side
+    next_id = 0
+    prev_row = [[] for _ in range(side)]
+    for row in range(side):
+        cur_row = [[] for _ in range(side)]
+        for col in range(side):
+            count = base + (1 if row * side + col < extra else 0)
+            for _ in range(count):
+                x = (col + rng.random()) * r
+                y = (row + rng.random()) * r
+                linked = False
+                nearby = [cur_row[col]]
+                if col:
+                    nearby.append(cur_row[col - 1])
+                nearby.extend(prev_row[c] for c in (col - 1, col, col + 1) if 0 <= c < side)
+                for cell in nearby:
+                    for other, ox, oy in cell:
+                        d = math.hypot(x - ox, y - oy)
+                        if d <= r:
+                            linked = linked or other == next_id - 1
+                            yield other, next_id, max(1, round(d / r * max_cost))
+                if next_id and not linked:
+                    # keep the world connected: chain to the previous city
+                    yield next_id - 1, next_id, rng.randint(1, max_cost)
+                cur_row[col].append((next_id, x, y))
+                next_id += 1
+        prev_row = cur_row
+
+
+def _scale_free_roads(n, rng, max_cost, m=2):
+    # Barabasi-Albert: each new city links to m distinct existing cities picked
+    # with probability proportional to their degree.
+    m = max(1, min(m, n - 1))
+    ends = array('i')
+    for a in range(m + 1):
+        for b in range(a + 1, m + 1):
+            ends.extend((a, b))
+            yield a, b, rng.randint(1, max_cost)
+    for v in range(m + 1, n):
+        targets = set()
+        while len(targets) < m:
+            targets.add(ends[rng.randrange(len(ends))])
+        for t in targets:
+            ends.extend((t, v))
+            yield t, v, rng.randint(1, max_cost)
+
+
+def _continent_roads(n, rng, max_cost, continents=4, bridges=2):
+    continents = max(1, min(continents, n))
+    size = n // continents
+    bounds = [(k * size, n if k == continents - 1 else (k + 1) * size) for k in range(continents)]
+    for lo, hi in bounds:
+        width = max(1, math.ceil(math.sqrt(hi - lo)))
+        yield from _grid_roads(range(lo, hi), width, rng, max_cost)
+    # long, expensive bridges between neighbouring continents (and around the ring)
+    if continents > 1:
+        for k in range(continents if continents > 2 else 1):
+            (alo, ahi), (blo, bhi) = bounds[k], bounds[(k + 1) % continents]
+            for _ in range(bridges):
+                yield rng.randrange(alo, ahi), rng.randrange(blo, bhi), rng.randint(max_cost, 3 * max_cost)
+
+
+def iter_roads(n_cities, topology="grid", seed=0, max_cost=30, **options):
+    # Let N = number of cities
+    # Average and worst case time complexity: O(N) roads of O(1) each
+    rng = random.Random(f"{seed}:roads")
+    if topology == "grid":
+        width = max(1, math.ceil(math.sqrt(n_cities)))
+        return _grid_roads(range(n_cities), width, rng, max_cost)
+    if topology == "geometric":
+        return _geometric_roads(n_cities, rng, max_cost, options.get("per_cell", 2))
+    if topology == "scale-free":
+        return _scale_free_roads(n_cities, rng, max_cost, options.get("m", 2))
+    if topology == "continents":
+        return _continent_roads(n_cities, rng, max_cost, options.get("continents", 4),
+                                options.get("bridges", 2))
+    raise ValueError(f"Unknown topology {topology!r}; expected one of {', '.join(TOPOLOGIES)}")
+
+
+#  Prices: yields (city id, {good: price})
+
+def iter_cities(n_cities, n_goods=5, goods_per_city=None, price="uniform", arbitrage=0.1,
+                seed=0):
+    # goods_per_city: how many goods each city sells (all by default);
+    # arbitrage: share of (city, good) prices far from the good's base price,
+    #   i.e. how many profitable trades the world offers.
+    # Let N = number of cities, K = goods per city
+    # Average and worst case time complexity: O(N·K)
+    if price not in PRICE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown price distribution {price!r}")
+    rng = random.Random(f"{seed}:prices")
+    if price == "uniform":
+        base = [rng.uniform(10, 100) for _ in range(n_goods)]
+    else:
+        base = [rng.lognormvariate(3.5, 0.6) for _ in range(n_goods)]
+    goods = [good_name(j) for j in range(n_goods)]
+    k = n_goods if goods_per_city is None else max(1, min(goods_per_city, n_goods))
+    everything = range(n_goods)
+    rand = rng.random
+    for i in range(n_cities):
+        sold = everything if k == n_goods else sorted(rng.sample(everything, k))
+        table = {}
+        for j in sold:
+            p = base[j] * (0.9 + 0.2 * rand())
+            roll = rand()
+            if roll < arbitrage:
+                # half the outliers are bargains, half are premium markets
+                p *= 0.5 if roll < arbitrage / 2 else 1.6
+            table[goods[j]] = max(1, round(p))
+        yield i, table
+
+
+#  Output
+
+def generate(path, n_cities, topology="grid", n_goods=5, seed=0, chunk=10000, **options):
+    # Stream a world to path (.json or .jsonl). Returns (cities, roads) written.
+    # Average and worst case time complexity: O(N·K + E); memory O(chunk)
+    price_opts = {key: options.pop(key) for key in ("goods_per_city", "price", "arbitrage")
+                  if key in options}
+    path = Path(path)
+    lines = path.suffix == ".jsonl"
+    n_roads = 0
+    with path.open("w", encoding="utf-8") as f:
+        buf = []
+
+        def emit(text):
+            buf.append(text)
+            if len(buf) >= chunk:
+                f.write("".join(buf))
+                buf.clear()
+
+        if not lines:
+            emit('{"cities":{')
+        for i, table in iter_cities(n_cities, n_goods, seed=seed, **price_opts):
+            name = city_name(i)
+            # generated names need no escaping, so skip the json module here
+            goods = ",".join(f'"{good}":{price}' for good, price in table.items())
+            if lines:
+                emit(f'{{"city":"{name}","goods":{{{goods}}}}}\n')
+            else:
+                emit(f'{"," if i else ""}"{name}":{{{goods}}}')
+        if not lines:
+            emit('},"roads":[')
+        for a, b, cost in iter_roads(n_cities, topology, seed, **options):
+            if lines:
+                emit(f'{{"road":["{city_name(a)}","{city_name(b)}",{cost}]}}\n')
+            else:
+                emit(f'{"," if n_roads else ""}["{city_name(a)}","{city_name(b)}",{cost}]')
+            n_roads += 1
+        if not lines:
+            emit("]}\n")
+        f.write("".join(buf))
+    return n_cities, n_roads
+
+
+def generate_world(n_cities, topology="grid", n_goods=5, seed=0, **options):
+    # Same world as generate(), built in memory as (graph, cities).
+    # Average and worst case time complexity: O(N·K + E)
+    price_opts = {key: options.pop(key) for key in ("goods_per_city", "price", "arbitrage")
+                  if key in options}
+    cities = {}
+    for i, table in iter_cities(n_cities, n_goods, seed=seed, **price_opts):
+        cities[city_name(i)] = City(city_name(i), table)
+    g = Graph()
+    for name in cities:
+        g.add_city(name)
+    for a, b, cost in iter_roads(n_cities, topology, seed, **options):
+        g.add_road(city_name(a), city_name(b), cost)
+    return g, cities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic City Trader world.")
+    parser.add_argument("output", help="target file, .json or .jsonl")
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--topology", choices=TOPOLOGIES, default="grid")
+    parser.add_argument("--goods", type=int, default=5)
+    parser.add_argument("--goods-per-city", type=int, default=None)
+    parser.add_argument("--price", choices=PRICE_DISTRIBUTIONS, default="uniform")
+    parser.add_argument("--arbitrage", type=float, default=0.1)
+    parser.add_argument("--max-cost", type=int, default=30)
+    parser.add_argument("--continents", type=int, default=4)
+    parser.add_argument("--bridges", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    n_cities, n_roads = generate(
+        args.output, args.cities, args.topology, args.goods, seed=args.seed,
+        goods_per_city=args.goods_per_city, price=args.price, arbitrage=args.arbitrage,
+        max_cost=args.max_cost, continents=args.continents, bridges=args.bridges)
+    print(f"Wrote {n_cities} cities and {n_roads} roads to {args.output} "
+          f"in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
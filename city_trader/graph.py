@@ -1,27 +1,152 @@
+from collections import OrderedDict
+
+from city_trader import metrics
+
+
 class Graph:
-    def __init__(self):
+    def __init__(self, max_cached_rows=None):
         # adjacency list: { city: { neighbor: fuel_cost } }
         # Average and worst case time complexity: O(1)
         self.cities = {}
+        self._init_caches(max_cached_rows)
+
+    def _init_caches(self, max_cached_rows):
+        # Derived state shared by every backend; subclasses call this rather
+        # than Graph.__init__, so a new cache only needs adding here.
+
+        # shortest-path table, one (dist, prev) row per queried source city.
+        # Rows are filled lazily and kept in LRU order; with max_cached_rows set
+        # only that many rows stay in memory (for worlds with many cities).
+        self.max_cached_rows = max_cached_rows
+        self._rows = OrderedDict()
+
+        # bumped on every change to the road network
+        self.version = 0
+        self._landmarks = None   # (version, count, Landmarks) for A* queries
+        self._order = None       # (version, {city: position in self.cities})
+        self._hierarchy = None   # (version, ContractionHierarchy) for "ch" routes
 
     def add_city(self, name):
-        # Average time complexity: O(1)
+        # Average time complexity: O(1) (plus O(R) to extend R cached rows)
         # Worst case time complexity: O(n)
         if name not in self.cities:
             self.cities[name] = {}
+            self.version += 1
+            for dist, prev in self._rows.values():
+                dist[name] = float('inf')
+                prev[name] = None
 
     def add_road(self, city1, city2, fuel_cost):
-        # Average time complexity: O(1)
+        # Average time complexity: O(1) (plus repairing cached rows, see update_road)
         # Worst case time complexity: O(n)
+        self.update_road(city1, city2, fuel_cost)
+
+    def update_road(self, city1, city2, fuel_cost):
+        # Add a road or change its fuel cost; cached shortest-path rows are repaired
+        # in place rather than recomputed.
+        # Let A = cities whose shortest path changes, plus their roads
+        # Average-case time complexity: O(R · A log A), R = cached rows
+        # Worst-case time complexity: O(R · (V + E) log V)
         self.add_city(city1)
         self.add_city(city2)
+        old = self.cities[city1].get(city2)
+        if old == fuel_cost:
+            return
         self.cities[city1][city2] = fuel_cost
         self.cities[city2][city1] = fuel_cost  # undirected
+        self._road_changed(city1, city2, old, fuel_cost)
+
+    def remove_road(self, city1, city2):
+        # Close a road; same repair cost as update_road.
+        old = self.cities.get(city1, {}).pop(city2, None)
+        if old is None:
+            raise KeyError(f"No road between {city1} and {city2}")
+        self.cities[city2].pop(city1, None)
+        self._road_changed(city1, city2, old, None)
 
     def neighbors(self, city):
         # Average and worst case time complexity: O(1)
         return self.cities.get(city, {}).items()
 
+    def freeze(self):
+        # Compact CSR copy of this graph with integer city ids (see compact_graph.py).
+        # Average and worst case time complexity: O(V + E log d)
+        from city_trader.compact_graph import CompactGraph
+        return CompactGraph.from_graph(self)
+
+    def _invalidate(self):
+        # Average and worst case time complexity: O(R), R = cached rows
+        self.version += 1
+        self._rows.clear()
+
+    def _road_changed(self, a, b, old, new):
+        self.version += 1
+        if a == b:
+            return
+        for dist, prev in self._rows.values():
+            self._repair_row(dist, prev, a, b, _cost_value(old), _cost_value(new))
+
+    def _repair_row(self, dist, prev, a, b, old, new):
+        # Dynamic single-source shortest paths (Ramalingam-Reps): only the
+        # cities whose distance actually changes are touched.
+        import heapq
+        inf = float('inf')
+        heap = []
+        if new < old:
+            # cheaper (or new) road: improvements spread outward from its ends
+            for u, v in ((a, b), (b, a)):
+                nd = dist[u] + new
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heap.append((nd, v))
+        elif new > old:
+            # dearer or closed road: only matters if it was in the shortest-path tree
+            if prev.get(b) == a:
+                child = b
+            elif prev.get(a) == b:
+                child = a
+            else:
+                return
+            # every city reached through it must be recomputed
+            affected = {child}
+            stack = [child]
+            while stack:
+                x = stack.pop()
+                for y in self.cities[x]:
+                    if prev[y] == x and y not in affected:
+                        affected.add(y)
+                        stack.append(y)
+            for x in affected:
+                dist[x] = inf
+                prev[x] = None
+            # best entry into the affected region from the untouched rest
+            for x in affected:
+                for y, cost in self.cities[x].items():
+                    w = _cost_value(cost)
+                    if y in affected or w == inf:
+                        continue
+                    if dist[y] + w < dist[x]:
+                        dist[x] = dist[y] + w
+                        prev[x] = y
+                if dist[x] < inf:
+                    heap.append((dist[x], x))
+        else:
+            return
+
+        heapq.heapify(heap)
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d != dist[u]:
+                continue
+            for v, cost in self.cities[u].items():
+                nd = d + _cost_value(cost)
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd, v))
+
+    @metrics.timed("graph.dijkstra")
     def dijkstra(self, source):
         # Let V = number of cities, E = number of roads
         # Average-case time complexity: O((V + E) log V)
@@ -51,4 +176,332 @@ class Graph:
                     dist[v] = nd
                     prev[v] = u
                     heapq.heappush(pq, (nd, v))
+        if metrics.ENABLED:
+            # derived after the search so the loop itself stays untouched: cities
+            # settled and the roads scanned from them (not heap pops or relaxations)
+            settled = [u for u, d in dist.items() if d != float('inf')]
+            metrics.incr("graph.dijkstra.settled", len(settled))
+            metrics.incr("graph.dijkstra.edges_scanned",
+                         sum(len(self.cities.get(u, ())) for u in settled))
         return dist, prev
+
+    def shortest_paths(self, source):
+        # Cached version of dijkstra(source).
+        # Average-case time complexity: O(1) once the row is cached
+        # Worst-case time complexity: O((V + E) log V) on a miss
+        # The returned dicts are shared with the cache and must not be modified.
+        row = self._rows.get(source)
+        if row is not None:
+            self._rows.move_to_end(source)
+            if metrics.ENABLED:
+                metrics.incr("graph.shortest_paths.hits")
+            return row
+        if metrics.ENABLED:
+            metrics.incr("graph.shortest_paths.misses")
+        row = self.dijkstra(source)
+        if source in self.cities:
+            self._store_row(source, row)
+        return row
+
+    def _store_row(self, source, row):
+        # Average and worst case time complexity: O(1)
+        self._rows[source] = row
+        self._rows.move_to_end(source)
+        if self.max_cached_rows is not None:
+            while len(self._rows) > self.max_cached_rows:
+                self._rows.popitem(last=False)
+
+    def distance(self, source, target):
+        # Average-case time complexity: O(1) once the source row is cached
+        dist, _ = self.shortest_paths(source)
+        return dist.get(target, float('inf'))
+
+    def path(self, source, target):
+        # Rebuild the cheapest route source -> target from the predecessor row.
+        # Average and worst case time complexity: O(L), L = path length (row cached)
+        dist, prev = self.shortest_paths(source)
+        if dist.get(target, float('inf')) == float('inf'):
+            return []
+        route = [target]
+        while route[-1] != source:
+            route.append(prev[route[-1]])
+        route.reverse()
+        return route
+
+    def city_order(self):
+        # {city: position} in iteration order of self.cities, so results of
+        # bounded searches can be visited in the same order as a full row.
+        # Average-case time complexity: O(1), O(V) after the city set changes
+        if self._order is None or self._order[0] != self.version:
+            self._order = (self.version, {name: i for i, name in enumerate(self.cities)})
+        return self._order[1]
+
+    #  Routing queries: each returns (cost, path), or (inf, []) when unreachable
+
+    def within(self, source, budget):
+        # {city: cost} for every city reachable from source with at most `budget`
+        # fuel. Uses the cached row if there is one, otherwise a Dijkstra that
+        # stops as soon as the heap minimum exceeds the budget.
+        # Let V', E' = cities and roads inside the budget
+        # Average-case time complexity: O((V' + E') log V'), O(V) with a cached row
+        # Worst-case time complexity: O((V + E) log V)
+        row = self._rows.get(source)
+        if row is not None:
+            return {c: d for c, d in row[0].items() if d <= budget}
+        dist, _ = self.dijkstra_within(source, budget)
+        return dist
+
+    def dijkstra_within(self, source, budget):
+        # (dist, prev) restricted to the cities settled within `budget`.
+        # Average and worst case time complexity: O((V' + E') log V')
+        import heapq
+        if source not in self.cities:
+            return {}, {}
+        dist = {source: 0.0}
+        prev = {source: None}
+        done = {}
+        pq = [(0.0, source)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > budget:
+                break
+            if u in done:
+                continue
+            done[u] = d
+            for v, cost in self.cities.get(u, {}).items():
+                nd = d + _cost_value(cost)
+                if nd <= budget and nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(pq, (nd, v))
+        if metrics.ENABLED:
+            metrics.incr("graph.dijkstra.settled", len(done))
+        return done, {c: prev[c] for c in done}
+
+    def route(self, source, target, method="bidirectional", heuristic=None):
+        # Cheapest route between two cities. method: "bidirectional", "astar"
+        # (ALT landmarks unless a heuristic is given) or "cached" (the full
+        # shortest-path row, reused by later queries from the same source) or
+        # "ch" (contraction hierarchy attached by hierarchy.load_or_build; plain
+        # "bidirectional" while none is attached or the roads changed since).
+        if method == "bidirectional":
+            return self.bidirectional(source, target)
+        if method == "astar":
+            return self.astar(source, target, heuristic)
+        if method == "cached":
+            cost = self.distance(source, target)
+            return cost, self.path(source, target)
+        if method == "ch":
+            ch = self.hierarchy()
+            if ch is None:
+                return self.bidirectional(source, target)
+            return ch.route(source, target)
+        raise ValueError(f"Unknown routing method {method!r}")
+
+    def bidirectional(self, source, target):
+        # Dijkstra from both ends, stopping once the two frontiers' minimum keys
+        # add up to at least the best meeting cost found (roads are undirected).
+        # Average-case time complexity: about two searches of half the radius
+        # Worst-case time complexity: O((V + E) log V)
+        import heapq
+        inf = float('inf')
+        if source not in self.cities or target not in self.cities:
+            return inf, []
+        if source == target:
+            return 0.0, [source]
+        dist = ({source: 0.0}, {target: 0.0})
+        prev = ({source: None}, {target: None})
+        done = (set(), set())
+        pqs = ([(0.0, source)], [(0.0, target)])
+        best, meet = inf, None
+        while pqs[0] and pqs[1] and pqs[0][0][0] + pqs[1][0][0] < best:
+            side = 0 if pqs[0][0][0] <= pqs[1][0][0] else 1
+            d, u = heapq.heappop(pqs[side])
+            if u in done[side]:
+                continue
+            done[side].add(u)
+            mine, other = dist[side], dist[1 - side]
+            for v, cost in self.cities.get(u, {}).items():
+                nd = d + _cost_value(cost)
+                if nd < mine.get(v, inf):
+                    mine[v] = nd
+                    prev[side][v] = u
+                    heapq.heappush(pqs[side], (nd, v))
+                    if v in other and nd + other[v] < best:
+                        best, meet = nd + other[v], v
+        if meet is None:
+            return inf, []
+        forward = [meet]
+        while forward[-1] != source:
+            forward.append(prev[0][forward[-1]])
+        forward.reverse()
+        node = meet
+        while node != target:
+            node = prev[1][node]
+            forward.append(node)
+        return best, forward
+
+    def astar(self, source, target, heuristic=None):
+        # A* with an admissible, consistent heuristic h(city, target); by default
+        # the ALT bound from landmarks() (computed once per road network).
+        # Average-case time complexity: O((V' + E') log V'), V' = cities expanded
+        # Worst-case time complexity: O((V + E) log V)
+        import heapq
+        inf = float('inf')
+        if source not in self.cities or target not in self.cities:
+            return inf, []
+        if heuristic is None:
+            heuristic = self.landmarks().heuristic
+        dist = {source: 0.0}
+        prev = {source: None}
+        done = set()
+        pq = [(heuristic(source, target), 0.0, source)]
+        while pq:
+            _, d, u = heapq.heappop(pq)
+            if u == target:
+                route = [u]
+                while route[-1] != source:
+                    route.append(prev[route[-1]])
+                route.reverse()
+                if metrics.ENABLED:
+                    metrics.incr("graph.astar.settled", len(done) + 1)
+                return d, route
+            if u in done:
+                continue
+            done.add(u)
+            for v, cost in self.cities.get(u, {}).items():
+                nd = d + _cost_value(cost)
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(pq, (nd + heuristic(v, target), nd, v))
+        return inf, []
+
+    def landmarks(self, count=8):
+        # ALT landmarks for the current road network, rebuilt after any change.
+        # Average and worst case time complexity: O(count · (V + E) log V) when rebuilt
+        cached = self._landmarks
+        if cached is None or cached[0] != self.version or cached[1] != count:
+            self._landmarks = (self.version, count, Landmarks(self, count))
+        return self._landmarks[2]
+
+    def hierarchy(self):
+        # Contraction hierarchy attached by hierarchy.load_or_build, or None if
+        # there is none or the road network changed since. Never builds one:
+        # preprocessing takes seconds on large maps, so only load_or_build does.
+        # Average and worst case time complexity: O(1)
+        cached = self._hierarchy
+        if cached is None or cached[0] != self.version:
+            return None
+        return cached[1]
+
+    def precompute(self, sources=None):
+        # Fill the shortest-path table for the given sources (all cities by default).
+        # Let V = number of cities, E = number of roads
+        # Sparse graphs: repeated Dijkstra, O(V (V + E) log V)
+        # Dense graphs (E close to V^2): Floyd-Warshall with NumPy, O(V^3) vectorized
+        if sources is None:
+            sources = list(self.cities)
+        sources = [s for s in sources if s in self.cities and s not in self._rows]
+        if not sources:
+            return
+
+        v = len(self.cities)
+        e = sum(len(adj) for adj in self.cities.values())
+        unbounded = self.max_cached_rows is None or self.max_cached_rows >= v
+        if unbounded and len(sources) == v and v <= 2000 and e * 4 >= v * v:
+            try:
+                self._floyd_warshall()
+                return
+            except ImportError:
+                pass
+        for s in sources:
+            self._store_row(s, self.dijkstra(s))
+
+    def _floyd_warshall(self):
+        # Average and worst case time complexity: O(V^3), V^2 memory
+        import numpy as np
+
+        names = list(self.cities)
+        index = {name: i for i, name in enumerate(names)}
+        v = len(names)
+        d = np.full((v, v), np.inf)
+        pred = np.full((v, v), -1, dtype=np.int64)
+        for u, adj in self.cities.items():
+            i = index[u]
+            for w, cost in adj.items():
+                try:
+                    cost_w = float(cost)
+                except Exception:
+                    continue
+                j = index[w]
+                if cost_w < d[i, j]:
+                    d[i, j] = cost_w
+                    pred[i, j] = i
+        np.fill_diagonal(d, 0.0)
+        np.fill_diagonal(pred, -1)
+
+        for k in range(v):
+            via = d[:, k:k + 1] + d[k:k + 1, :]
+            better = via < d
+            d = np.where(better, via, d)
+            pred = np.where(better, pred[k:k + 1, :], pred)
+
+        for i, source in enumerate(names):
+            dist = {name: float(d[i, j]) for j, name in enumerate(names)}
+            prev = {name: (names[pred[i, j]] if pred[i, j] >= 0 else None)
+                    for j, name in enumerate(names)}
+            self._store_row(source, (dist, prev))
+
+
+class Landmarks:
+    # ALT heuristic: for a landmark L, |d(L, t) - d(L, v)| never overestimates
+    # d(v, t) (triangle inequality on an undirected graph), so the maximum over
+    # several landmarks is an admissible and consistent A* heuristic.
+    # Landmarks are chosen farthest-first so they sit on the map's periphery.
+    def __init__(self, graph, count=8):
+        # Let k = count
+        # Average and worst case time complexity: O(k · (V + E) log V)
+        self.names = []
+        self.rows = []
+        if not graph.cities:
+            return
+        inf = float('inf')
+        # start from the city farthest from an arbitrary one
+        first = next(iter(graph.cities))
+        dist, _ = graph.dijkstra(first)
+        nearest = dict(dist)   # distance to the closest landmark so far
+        for _ in range(min(count, len(graph.cities))):
+            pick = max(nearest, key=lambda c: (nearest[c] if nearest[c] != inf else -1, c))
+            if pick in self.names:
+                break
+            dist, _ = graph.dijkstra(pick)
+            self.names.append(pick)
+            self.rows.append(dist)
+            for c, d in dist.items():
+                if d < nearest.get(c, inf):
+                    nearest[c] = d
+            nearest[pick] = -1.0
+
+    def heuristic(self, city, target):
+        # Average and worst case time complexity: O(k)
+        best = 0.0
+        inf = float('inf')
+        for row in self.rows:
+            a, b = row.get(city, inf), row.get(target, inf)
+            if a != inf and b != inf:
+                gap = a - b if a > b else b - a
+                if gap > best:
+                    best = gap
+        return best
+
+
+def _cost_value(cost):
+    # Fuel cost as a float; missing roads and unusable costs count as infinite,
+    # matching how dijkstra skips them.
+    if cost is None:
+        return float('inf')
+    try:
+        return float(cost)
+    except Exception:
+        return float('inf')
@@ -1,3 +1,9 @@
+import os
+import struct
+import tempfile
+from array import array
+
+
 class ActionNode:
     def __init__(self, action, details):
         # average and worst case time complexity: O(1)
@@ -5,35 +11,219 @@ class ActionNode:
         self.details = details    # e.g. "Traveled to Berlin"
         self.next = None
 
+
+# one spilled entry: action, city, dest, good, details, qty, amount, tick.
+# For a free-form entry, details and qty hold the offset and byte length of its
+# text in the spill's text file.
+_ROW = struct.Struct("<qqqqqqdq")
+
+_FORMATS = {
+    "Travel": lambda city, dest, good, qty, amount: f"Traveled from {city} to {dest}",
+    "Buy": lambda city, dest, good, qty, amount: f"Bought {qty} {good} in {city} for ${amount}",
+    "Sell": lambda city, dest, good, qty, amount: f"Sold {qty} {good} in {city} for ${amount}",
+    "Batch": lambda city, dest, good, qty, amount: f"{qty} commands from {city} to {dest}, net {amount:+}",
+}
+
+
 class History:
-    def __init__(self):
+    # Action log stored as typed columns (one array per field) instead of one
+    # object per action. Names from closed sets (actions, cities, goods) are
+    # interned once and referenced by id; detail text is only formatted when an
+    # entry is displayed. Free-form details from add() are kept per entry and
+    # leave memory with it, so only the closed sets are interned for good.
+    #
+    # With max_in_memory set the columns become a ring buffer of that many
+    # entries. Entries pushed out of it are appended to spill_path (if given) and
+    # can still be read back by index; without spill_path they are dropped.
+    def __init__(self, max_in_memory=None, spill_path=None):
+        # average and worst case time complexity: O(1)
+        self.max_in_memory = max_in_memory
+        self.spill_path = spill_path
+        self._spill = None
+        self._spill_text = None   # free-form details of spilled entries
+        self._texts = {}          # entry index -> free-form details, in memory
+        self._strings = []
+        self._ids = {}
+        self._actions = array('q')
+        self._cities = array('q')
+        self._dests = array('q')
+        self._goods = array('q')
+        self._details = array('q')
+        self._qtys = array('q')
+        self._amounts = array('d')
+        self._ticks = array('q')
+        self._columns = (self._actions, self._cities, self._dests, self._goods,
+                         self._details, self._qtys, self._amounts, self._ticks)
+        self._count = 0
+        self._dropped = 0   # entries lost because there was no spill file
+        self._closed = False
+
+    def _intern(self, value):
         # average and worst case time complexity: O(1)
-        self.head = None
-        self.tail = None
+        if value is None:
+            return -1
+        i = self._ids.get(value)
+        if i is None:
+            i = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+        return i
+
+    def record(self, action, city=None, dest=None, good=None, qty=0, amount=0, tick=None):
+        # Structured entry; details are built from the columns on display.
+        # average and worst case time complexity: O(1)
+        self._append((self._intern(action), self._intern(city), self._intern(dest),
+                      self._intern(good), -1, qty, amount,
+                      self._count if tick is None else tick))
 
     def add(self, action, details):
+        # Free-form entry with ready-made details text.
+        # average and worst case time complexity: O(1)
+        self._texts[self._count] = details
+        self._append((self._intern(action), -1, -1, -1, 0, 0, 0, self._count))
+
+    def _append(self, row):
         # average and worst case time complexity: O(1)
-        node = ActionNode(action, details)
-        if not self.head:
-            self.head = node
-            self.tail = node
+        if self._closed:
+            raise ValueError("history is closed")
+        cap = self.max_in_memory
+        if cap is None or self._count < cap:
+            for column, value in zip(self._columns, row):
+                column.append(value)
         else:
-            self.tail.next = node
-            self.tail = node
+            slot = self._count % cap
+            self._evict(slot, self._count - cap)
+            for column, value in zip(self._columns, row):
+                column[slot] = value
+        self._count += 1
+
+    def _evict(self, slot, i):
+        # Push the oldest in-memory entry (entry i) out to the spill file.
+        # average and worst case time complexity: O(1)
+        text = self._texts.pop(i, None)
+        if self.spill_path is None:
+            self._dropped += 1
+            return
+        if self._spill is None:
+            self._spill = open(self.spill_path, "w+b")
+            self._spill_text = tempfile.TemporaryFile(
+                dir=os.path.dirname(os.path.abspath(self.spill_path)))
+        row = [column[slot] for column in self._columns]
+        if text is not None:
+            data = text.encode("utf-8")
+            self._spill_text.seek(0, 2)
+            row[4], row[5] = self._spill_text.tell(), len(data)
+            self._spill_text.write(data)
+        self._spill.seek(0, 2)
+        self._spill.write(_ROW.pack(*row))
+
+    #  Indexed access
+    def __len__(self):
+        return self._count
 
-    def show(self):
-        # Let n be the number of actions in history
+    @property
+    def first_index(self):
+        # Oldest entry still readable (entries before it were dropped).
+        return self._dropped
+
+    def _row(self, i):
+        # (columns, free-form details or None) of entry i
+        # average and worst case time complexity: O(1) (one seek for spilled entries)
+        if i < 0:
+            i += self._count
+        if not self._dropped <= i < self._count:
+            raise IndexError("history index out of range")
+        cap = self.max_in_memory
+        if cap is None or i >= self._count - cap:
+            slot = i if cap is None else i % cap
+            return tuple(column[slot] for column in self._columns), self._texts.get(i)
+        if self._closed:
+            raise ValueError("history is closed: spilled entries can no longer be read")
+        self._spill.flush()
+        self._spill.seek(i * _ROW.size)
+        row = _ROW.unpack(self._spill.read(_ROW.size))
+        if row[4] < 0:
+            return row, None
+        self._spill_text.seek(row[4])
+        return row, self._spill_text.read(row[5]).decode("utf-8")
+
+    def entry(self, i):
+        # (action, details) for entry i; average and worst case time complexity: O(1)
+        (action, city, dest, good, _, qty, amount, _), text = self._row(i)
+        strings = self._strings
+        action = strings[action]
+        if text is not None:
+            return action, text
+        if amount == int(amount):
+            amount = int(amount)
+        fmt = _FORMATS.get(action)
+        if fmt is None:
+            return action, ""
+        city, dest, good = (strings[k] if k >= 0 else None for k in (city, dest, good))
+        return action, fmt(city, dest, good, qty, amount)
+
+    def __getitem__(self, i):
+        # history[i] -> ActionNode, history[a:b] -> list of ActionNodes
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._count)
+            return [self[j] for j in range(max(start, self._dropped), stop, step)]
+        return ActionNode(*self.entry(i))
+
+    def last(self, n):
+        # The n most recent entries; average and worst case time complexity: O(n)
+        return self[max(0, self._count - n):]
+
+    #  Linked-list style walk (history.head, node.next) kept for callers of the
+    #  original implementation
+    @property
+    def head(self):
+        return _NodeView(self, self._dropped) if self._count > self._dropped else None
+
+    @property
+    def tail(self):
+        return _NodeView(self, self._count - 1) if self._count > self._dropped else None
+
+    def show(self, last=None):
+        # Let n be the number of actions shown
         # Average-case time complexity: O(n)
         # Worst-case time complexity: O(n)
-        
+
         # Return a list of formatted history strings.
-        if not self.head:
+        if self._count <= self._dropped:
             return ["No actions recorded."]
+        start = self._dropped if last is None else max(self._dropped, self._count - last)
         result = []
-        current = self.head
-        i = 1
-        while current:
-            result.append(f"{i}. {current.action}: {current.details}")
-            current = current.next
-            i += 1
+        for i in range(start, self._count):
+            action, details = self.entry(i)
+            result.append(f"{i + 1}. {action}: {details}")
         return result
+
+    def close(self):
+        # Releases the spill files. Entries still in memory stay readable; adding
+        # entries or reading spilled ones afterwards raises ValueError.
+        self._closed = True
+        if self._spill is not None:
+            self._spill.close()
+            self._spill_text.close()
+            self._spill = self._spill_text = None
+
+
+class _NodeView:
+    # ActionNode look-alike pointing at one entry of a History.
+    __slots__ = ("_history", "_index")
+
+    def __init__(self, history, index):
+        self._history = history
+        self._index = index
+
+    @property
+    def action(self):
+        return self._history.entry(self._index)[0]
+
+    @property
+    def details(self):
+        return self._history.entry(self._index)[1]
+
+    @property
+    def next(self):
+        i = self._index + 1
+        return _NodeView(self._history, i) if i < len(self._history) else None
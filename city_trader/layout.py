@@ -0,0 +1,280 @@
+# Road-aware map layout for the board UI.
+#
+# Cities are positioned by a spectral layout (the low eigenvectors of the
+# degree-normalized road graph, found by power iteration in O(E) per step) and,
+# for small worlds, refined with a force-directed pass. Coordinates are cached
+# next to the world file as <world>.layout.npz, keyed by a checksum of the road
+# network. Positions are then snapped to a grid with one city per cell, which
+# gives an exact cell -> city index, and summarized into a zoom pyramid (one
+# representative city per 2^k x 2^k block) so a Viewport can show any part of a
+# large map at any zoom by looking at only the cells on screen.
+import math
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+LAYOUT_VERSION = 1
+FORCE_LIMIT = 1500      # force-directed refinement is O(N²) per step
+
+
+def layout_path(world_path):
+    return Path(world_path).with_suffix(".layout.npz")
+
+
+def _edges(graph, names):
+    # (src, dst) index arrays over every road, both directions.
+    # Average and worst case time complexity: O(V + E)
+    index = {name: i for i, name in enumerate(names)}
+    src, dst = [], []
+    for name in names:
+        i = index[name]
+        for other in graph.cities[name]:
+            j = index.get(other)
+            if j is not None:
+                src.append(i)
+                dst.append(j)
+    return np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64)
+
+
+def graph_key(names, src, dst):
+    # Checksum of the city list and road endpoints; costs are irrelevant to the layout.
+    crc = zlib.crc32("\n".join(names).encode("utf-8"))
+    crc = zlib.crc32(src.tobytes(), crc)
+    return zlib.crc32(dst.tobytes(), crc)
+
+
+def spectral_layout(n, src, dst, iterations=200, seed=0):
+    # Koren's degree-normalized eigenvectors: power iteration on
+    # (I + D^-1 A) / 2, keeping two columns D-orthogonal to the constant vector
+    # and to each other.
+    # Average and worst case time complexity: O(iterations · (V + E))
+    rng = np.random.default_rng(seed)
+    deg = np.bincount(src, minlength=n).astype(np.float64)
+    deg[deg == 0] = 1.0
+    x = rng.random((n, 2)) - 0.5
+    total = deg.sum()
+    for _ in range(iterations):
+        ax = np.empty_like(x)
+        for k in range(2):
+            ax[:, k] = np.bincount(src, weights=x[dst, k], minlength=n)
+        x = 0.5 * (x + ax / deg[:, None])
+        x -= (deg @ x) / total
+        # D-weighted Gram-Schmidt
+        x[:, 0] /= math.sqrt(max(deg @ (x[:, 0] ** 2), 1e-300))
+        x[:, 1] -= (deg @ (x[:, 0] * x[:, 1])) * x[:, 0]
+        x[:, 1] /= math.sqrt(max(deg @ (x[:, 1] ** 2), 1e-300))
+    return x
+
+
+def force_layout(pos, src, dst, iterations=60):
+    # Fruchterman-Reingold refinement of an initial layout.
+    # Average and worst case time complexity: O(iterations · (V² + E))
+    n = len(pos)
+    if n < 3:
+        return pos
+    pos = (pos - pos.mean(axis=0)) / (pos.std(axis=0) + 1e-12)
+    k = 2.0 / math.sqrt(n)
+    temperature = 0.5
+    for _ in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist2 = (delta ** 2).sum(axis=-1) + 1e-9
+        push = (delta * (k * k / dist2)[..., None]).sum(axis=1)
+        d = pos[src] - pos[dst]
+        length = np.sqrt((d ** 2).sum(axis=1)) + 1e-9
+        pull = np.zeros_like(pos)
+        for axis in range(2):
+            pull[:, axis] = np.bincount(src, weights=d[:, axis] * length / k, minlength=n)
+        move = push - pull
+        norm = np.sqrt((move ** 2).sum(axis=1)) + 1e-9
+        pos = pos + move / norm[:, None] * np.minimum(norm, temperature)[:, None]
+        temperature *= 0.95
+    return pos
+
+
+def compute_layout(graph, iterations=200, seed=0):
+    # -> (names, coords) with coords an (N, 2) array spread over [0, 1].
+    # Average-case time complexity: O(iterations · (V + E)), plus O(V²) per
+    # force step for worlds up to FORCE_LIMIT cities
+    names = list(graph.cities)
+    src, dst = _edges(graph, names)
+    return names, _layout(len(names), src, dst, iterations, seed)
+
+
+def _layout(n, src, dst, iterations, seed):
+    if n == 0:
+        return np.zeros((0, 2))
+    pos = spectral_layout(n, src, dst, iterations, seed)
+    if n <= FORCE_LIMIT:
+        pos = force_layout(pos, src, dst)
+    # rank-normalize each axis so the map fills the grid evenly instead of
+    # piling hubs in the middle
+    out = np.empty_like(pos)
+    for axis in range(2):
+        out[np.argsort(pos[:, axis], kind="stable"), axis] = (np.arange(n) + 0.5) / n
+    return out
+
+
+def load_or_compute(graph, world_path=None, iterations=200, seed=0):
+    # Coordinates from the cache next to world_path when it matches the graph,
+    # otherwise computed (and cached when world_path is given).
+    # Average-case time complexity: O(V + E) on a cache hit
+    names = list(graph.cities)
+    src, dst = _edges(graph, names)
+    key = graph_key(names, src, dst)
+    path = layout_path(world_path) if world_path is not None else None
+    if path is not None and path.exists():
+        try:
+            with np.load(path) as cached:
+                if (int(cached["version"]) == LAYOUT_VERSION and int(cached["key"]) == key
+                        and int(cached["seed"]) == seed):
+                    return names, cached["coords"]
+        except (OSError, ValueError, KeyError):
+            pass   # unreadable or stale cache: recompute
+    coords = _layout(len(names), src, dst, iterations, seed)
+    if path is not None:
+        tmp = path.with_name(path.name + ".tmp.npz")
+        try:
+            np.savez(tmp, version=LAYOUT_VERSION, key=key, seed=seed, coords=coords)
+            os.replace(tmp, path)
+        except OSError:
+            pass   # read-only location: the layout just is not cached
+    return names, coords
+
+
+class MapLayout:
+    # Cities snapped to a rows x cols world grid, one city per cell.
+    # cell_city is the inverse index (cell id -> city) and levels[k] maps each
+    # 2^k x 2^k block to its best-connected city.
+    def __init__(self, graph, names, coords, min_rows=1, min_cols=1, cells_per_city=3.0,
+                 aspect=2.0):
+        # Let N = number of cities
+        # Average-case time complexity: O(N log N)
+        # Worst-case time complexity: O(N log N + N·S²), S = spiral search radius
+        n = len(names)
+        cols = max(min_cols, math.ceil(math.sqrt(n * cells_per_city * aspect)))
+        rows = max(min_rows, math.ceil(n * cells_per_city / max(1, cols)))
+        self.rows, self.cols = rows, cols
+        degree = {name: len(graph.cities.get(name, ())) for name in names}
+        self.degree = degree
+
+        # keep a one-cell border like the fixed layout did
+        inner_r, inner_c = max(1, rows - 2), max(1, cols - 2)
+        want = [(min(rows - 1, 1 + int(y * inner_r)) if rows > 2 else int(y * rows),
+                 min(cols - 1, 1 + int(x * inner_c)) if cols > 2 else int(x * cols))
+                for x, y in coords.tolist()]
+        self.pos = {}
+        self.cell_city = {}
+        # best-connected cities pick their cells first
+        for i in sorted(range(n), key=lambda i: -degree[names[i]]):
+            r, c = self._free_cell(*want[i])
+            self.pos[names[i]] = (r, c)
+            self.cell_city[r * cols + c] = names[i]
+
+        self.levels = [self.cell_city]
+        level = 0
+        while (rows >> level) > 1 or (cols >> level) > 1:
+            level += 1
+            width = (cols >> level) + 1
+            blocks = {}
+            for name, (r, c) in self.pos.items():
+                cell = (r >> level) * width + (c >> level)
+                best = blocks.get(cell)
+                if best is None or degree[name] > degree[best]:
+                    blocks[cell] = name
+            self.levels.append(blocks)
+
+    def _free_cell(self, r, c):
+        # nearest unoccupied cell, searched in growing square rings
+        cols, rows, taken = self.cols, self.rows, self.cell_city
+        if r * cols + c not in taken:
+            return r, c
+        for d in range(1, max(rows, cols)):
+            for dr in range(-d, d + 1):
+                for dc in ((-d, d) if abs(dr) != d else range(-d, d + 1)):
+                    rr, cc = r + dr, c + dc
+                    if 0 <= rr < rows and 0 <= cc < cols and rr * cols + cc not in taken:
+                        return rr, cc
+        raise ValueError("layout grid is full")
+
+    def city_at(self, r, c, level=0):
+        # O(1) lookup of the city shown in world cell (r, c) at a zoom level
+        width = self.cols if level == 0 else (self.cols >> level) + 1
+        if r < 0 or not 0 <= c < width:
+            return None
+        return self.levels[level].get(r * width + c)
+
+    @classmethod
+    def for_world(cls, graph, world_path=None, min_rows=1, min_cols=1, **options):
+        names, coords = load_or_compute(graph, world_path)
+        return cls(graph, names, coords, min_rows, min_cols, **options)
+
+
+class Viewport:
+    # Window of rows x cols board cells onto a MapLayout at zoom level `level`
+    # (each board cell covers 2^level x 2^level world cells).
+    def __init__(self, layout, rows, cols):
+        # average and worst case time complexity: O(1)
+        self.layout = layout
+        self.rows, self.cols = rows, cols
+        self.level = 0
+        self.top = 0
+        self.left = 0
+
+    def _extent(self):
+        return (((self.layout.rows - 1) >> self.level) + 1,
+                ((self.layout.cols - 1) >> self.level) + 1)
+
+    def _clamp(self):
+        height, width = self._extent()
+        self.top = max(0, min(self.top, height - self.rows))
+        self.left = max(0, min(self.left, width - self.cols))
+
+    def scroll(self, dr, dc):
+        self.top += dr
+        self.left += dc
+        self._clamp()
+
+    def zoom(self, steps):
+        # positive steps zoom out; the center of the window stays put
+        cr = (self.top + self.rows // 2) << self.level
+        cc = (self.left + self.cols // 2) << self.level
+        self.level = max(0, min(len(self.layout.levels) - 1, self.level + steps))
+        self.center_on_world(cr, cc)
+
+    def center_on_world(self, r, c):
+        self.top = (r >> self.level) - self.rows // 2
+        self.left = (c >> self.level) - self.cols // 2
+        self._clamp()
+
+    def center_on(self, name):
+        self.center_on_world(*self.layout.pos[name])
+
+    def board_cell(self, name):
+        # Board (row, col) of a city if its block is on screen, else None. O(1)
+        r, c = self.layout.pos[name]
+        r, c = (r >> self.level) - self.top, (c >> self.level) - self.left
+        if 0 <= r < self.rows and 0 <= c < self.cols:
+            return r, c
+        return None
+
+    def visible(self, priority=()):
+        # {board cell: city} for everything on screen. Cities in `priority`
+        # (e.g. the player and their neighbors) replace a block's representative
+        # when zoomed out; earlier entries win.
+        # Let R x C = board size, P = len(priority)
+        # Average and worst case time complexity: O(R·C + P)
+        layout, level = self.layout, self.level
+        shown = {}
+        for br in range(self.rows):
+            for bc in range(self.cols):
+                name = layout.city_at(self.top + br, self.left + bc, level)
+                if name is not None:
+                    shown[(br, bc)] = name
+        if level:
+            for name in reversed(list(priority)):
+                cell = self.board_cell(name) if name in layout.pos else None
+                if cell is not None:
+                    shown[cell] = name
+        return shown
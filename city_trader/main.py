@@ -1,52 +1,83 @@
-import json
-from pathlib import Path
-from city_trader.graph import Graph
-from city_trader.city import City
 from city_trader.player import Player
 from city_trader.game import Game
-from city_trader.optimizer import suggest_best_move
-
-def show_price_table(cities):
-    # Pretty-print a table of goods per city.
-    # Average-case time complexity: O(C·G)
-    # Worst-case time complexity: O(C·G)
+from city_trader.optimizer import AdvisorCache
+from city_trader.planner import plan_route
+from city_trader.cargo import best_cargo
+from city_trader.prices import PriceView, FILTERS
+from city_trader.world import WORLD_PATH, load_world
+from city_trader import metrics
+
+try:
+    from city_trader.market import Market
+except ImportError:  # NumPy is optional; without it prices stay fixed
+    Market = None
+
+def show_price_table(cities, view=None, page=0, **options):
+    # Pretty-print one page of the goods-per-city table (see prices.PriceView
+    # for the filter and sort options).
+    # Let P = page size, G = number of goods shown
+    # Average-case time complexity: O(P·G), O(1) formatting when the page is cached
+    # Worst-case time complexity: O(C·G) after prices change with a margin sort
+    view = view or PriceView(cities)
+    lines, page, pages = view.lines(page, "table", **options)
     print("\n Current Market Prices:")
-    goods = set()
-    for city in cities.values():
-        goods.update(city.goods.keys())
-
-    goods = sorted(goods)
-    header = ["City"] + goods
-    rows = []
-    for name, city in sorted(cities.items()):
-        row = [name] + [f"${city.goods.get(g, '-')}" for g in goods]
-        rows.append(row)
-
-    # Column widths
-    col_widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
-
-    # Header
-    print(" | ".join(str(header[i]).ljust(col_widths[i]) for i in range(len(header))))
-    print("-" * (sum(col_widths) + 3 * (len(header) - 1)))
-
-    # Rows
-    for row in rows:
-        print(" | ".join(str(row[i]).ljust(col_widths[i]) for i in range(len(row))))
+    print("\n".join(lines))
+    return page, pages
+
+def browse_prices(view, player, graph):
+    # Interactive pager: choose a filter, a good and the sort order, then page
+    # through the table.
+    # Average and worst case time complexity: O(P·G) per page shown
+    filter = input(f"Filter ({'/'.join(FILTERS)}) [all]: ").strip().lower() or "all"
+    if filter not in FILTERS:
+        print("Unknown filter.")
+        return
+    good = input("Only this good (blank for all): ").strip().lower() or None
+    if good is not None and good not in view.goods:
+        print("Nobody trades that good.")
+        return
+    sort = "margin" if input("Sort by margin from here? (y/n) [n]: ").strip().lower() == "y" else "name"
+    page = 0
+    while True:
+        page, pages = show_price_table(view.cities, view, page, filter=filter, good=good,
+                                       sort=sort, here=player.location, fuel=player.fuel,
+                                       graph=graph)
+        if pages == 1:
+            return
+        step = input("n = next page, p = previous, anything else to stop: ").strip().lower()
+        if step == "n":
+            page += 1
+        elif step == "p":
+            page -= 1
+        else:
+            return
+
+def print_plan(plan):
+    # Let S = number of steps in the plan
+    # Average and worst case time complexity: O(S)
+    print(f"🗺️  Multi-stop plan (profit ≈ ${plan.profit}, fuel left {plan.final_fuel:g}):")
+    for i, line in enumerate(plan.lines(), 1):
+        print(f"  {i}. {line}")
+
+def print_cargo(cargo):
+    # Let G = number of goods in the mix
+    # Average and worst case time complexity: O(G)
+    print(f"📦 Best cargo mix ({cargo.units} units):")
+    for line in cargo.lines():
+        print(f"  • {line}")
 
 def main():
 
-    world_path = Path(__file__).parent / "data" / "world.json"
-    with world_path.open("r") as f:
-        world = json.load(f)
-
-    g = Graph()
-    for city1, city2, cost in world["roads"]:
-        g.add_road(city1, city2, cost)
-
-    cities = {name: City(name, goods) for name, goods in world["cities"].items()}
+    metrics.configure_from_env()
+    g, cities, report = load_world(WORLD_PATH)
+    for record, message in report.errors:
+        print(f"Warning: skipped world record {record}: {message}")
 
     player = Player("Paris")
-    game = Game(g, cities, player)
+    market = Market(cities) if Market else None
+    game = Game(g, cities, player, market)
+    prices = PriceView(cities, market)
+    advisor = AdvisorCache(g, cities, market)
 
     print("Welcome to City Trader!")
     print(f"Starting in {player.location} with ${player.money} and {player.fuel} fuel.")
@@ -61,6 +92,7 @@ def main():
         print("4. Check profit")
         print("5. Quit")
         print("6. Ask AI assistant (once)")
+        print("7. Browse prices")
         choice = input("> ")
 
         if choice == "1":
@@ -76,7 +108,7 @@ def main():
             print(game.travel(dest))
 
         elif choice == "2":
-            show_price_table(cities)
+            show_price_table(cities, prices)
             print(f"You are in {player.location}. Available goods: {cities[player.location].goods}")
             item = input("What item to buy? ").strip().lower()
 
@@ -100,7 +132,7 @@ def main():
             if not player.inventory:
                 print("You have nothing to sell.")
                 continue
-            show_price_table(cities)
+            show_price_table(cities, prices)
             print(f"You are in {player.location}. Your inventory: {player.inventory}")
             item = input("What item to sell? ").strip().lower()
 
@@ -133,8 +165,16 @@ def main():
                 print("You already used your AI assistant this game.")
                 continue
 
-            best_city, best_good, est_profit = suggest_best_move(g, cities, player.location, player.fuel)
+            best_city, best_good, est_profit = advisor.suggest(player.location, player.fuel)
+            plan = plan_route(g, cities, player.location, player.fuel, player.money,
+                              market=market)
+            cargo = best_cargo(g, cities, player.location, player.fuel, player.money,
+                               player.capacity, market=market)
             if not best_city:
+                if plan.steps:
+                    print_plan(plan)
+                    ai_used = True
+                    continue
                 print("You can still travel, but no trades look profitable right now.")
                 continue
 
@@ -142,21 +182,26 @@ def main():
             here = player.location
             price_here = cities[here].goods[best_good]
             price_there = cities[best_city].goods[best_good]
-            fuel_cost = g.cities[here][best_city]
+            fuel_cost, route = g.route(here, best_city)  # cheapest route, may be several roads
+            via = f" via {' → '.join(route[1:-1])}" if len(route) > 2 else ""
             per_unit = price_there - price_here
-            max_qty = player.money // price_here  # how many you could buy now
-            est_total = max(0, per_unit) * max_qty  # rough upper-bound (ignores fuel)
 
             print(
                 f"🤖 Suggestion:\n"
                 f"  • Buy {best_good} in {here} at ${price_here} each.\n"
-                f"  • Travel to {best_city} (fuel cost {fuel_cost}).\n"
+                f"  • Travel to {best_city}{via} (fuel cost {fuel_cost:g}).\n"
                 f"  • Sell there at ${price_there} each.\n"
-                f"  • Profit per unit ≈ ${per_unit}. If you spend all your cash now, "
-                f"you could buy ~{max_qty} and gross ≈ ${est_total} before travel cost."
+                f"  • Profit per unit ≈ ${per_unit}."
             )
+            if cargo:
+                print_cargo(cargo)
+            if plan.steps:
+                print_plan(plan)
             ai_used = True
 
+        elif choice == "7":
+            browse_prices(prices, player, g)
+
         else:
             print("Invalid choice.")
 
@@ -0,0 +1,293 @@
+# Dynamic market prices.
+#
+# Market replaces each City.goods table with a live view onto one shared
+# city x good NumPy array. Every trade moves its price along the good's
+# elasticity curve (buying pushes it up, selling pushes it down) and every
+# tick pulls all prices back toward their equilibrium in one vectorized step.
+# Prices are exposed as whole numbers, like the prices in world.json.
+#
+# A trade is charged along the curve, at the average of the price before and
+# after it, rounded up for buys and down for sells. Selling back what was just
+# bought in the same city returns the price to where it started for the same
+# average, so a round trip never makes money. Advisors price their suggestions
+# with the same rule: affordable() is the most a buy can take for some cash and
+# best_trade() the most profitable quantity to carry from one city to another.
+# Both accept a projected starting price (see drifted()) for trades made later.
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class Market:
+    def __init__(self, cities, elasticity=0.01, reversion=0.05, min_price=1, max_price=10 ** 9):
+        # elasticity: fractional price change per unit traded, a number or
+        #   a {good: value} table; reversion: fraction of the gap to equilibrium
+        #   closed per tick. Trades never move a price outside
+        #   [min_price, max_price].
+        # Let C = number of cities, G = number of goods
+        # Average and worst case time complexity: O(C·G)
+        self.names = list(cities)
+        self.city_index = {name: i for i, name in enumerate(self.names)}
+        self.goods = sorted({good for city in cities.values() for good in city.goods})
+        self.good_index = {good: j for j, good in enumerate(self.goods)}
+
+        self.equilibrium = np.full((len(self.names), len(self.goods)), np.nan)
+        for i, name in enumerate(self.names):
+            for good, price in cities[name].goods.items():
+                self.equilibrium[i, self.good_index[good]] = price
+        self.prices = self.equilibrium.copy()
+        self._gap = np.empty_like(self.prices)
+
+        if isinstance(elasticity, dict):
+            self.elasticity = np.array([elasticity.get(g, 0.0) for g in self.goods])
+        else:
+            self.elasticity = np.full(len(self.goods), float(elasticity))
+        self.reversion = reversion
+        self.min_price = min_price
+        self.max_price = max_price
+
+        self.version = 0        # bumped whenever any visible price may have changed
+        self.ticks = 0
+        self._displaced = False
+        self._undo = None       # open transaction, see begin()
+
+        for i, name in enumerate(self.names):
+            cities[name].goods = MarketGoods(self, i)
+
+    def price(self, city, good):
+        # Average and worst case time complexity: O(1)
+        p = self.prices[self.city_index[city], self.good_index[good]]
+        if p != p:
+            raise KeyError(good)
+        return max(self.min_price, int(round(p)))
+
+    def _cell(self, city, good):
+        # (i, j) of a traded price, or None if the city does not sell the good
+        i = self.city_index.get(city)
+        j = self.good_index.get(good)
+        if i is None or j is None or self.prices[i, j] != self.prices[i, j]:
+            return None
+        return i, j
+
+    def _moved(self, i, j, quantity):
+        # Average and worst case time complexity: O(1)
+        return self._curve(float(self.prices[i, j]), j, quantity)
+
+    def _curve(self, price, j, quantity):
+        # Price after trading quantity units from `price`, clamped to
+        # [min_price, max_price]. The exponent is clamped first, so huge trades
+        # cannot overflow.
+        # Average and worst case time complexity: O(1)
+        exponent = quantity * math.log1p(float(self.elasticity[j]))
+        ceiling = math.log(self.max_price / price) if price > 0 else 0.0
+        return max(self.min_price, min(self.max_price, price * math.exp(min(exponent, ceiling))))
+
+    def _value(self, price, j, quantity):
+        # Unrounded money for trading |quantity| units starting at `price`
+        return abs(quantity) * (price + self._curve(price, j, quantity)) / 2
+
+    def _start(self, city, good, price):
+        # (j, starting price) of a trade, or None if the city does not sell the good
+        cell = self._cell(city, good)
+        if cell is None:
+            return None
+        i, j = cell
+        return j, float(self.prices[i, j]) if price is None else price
+
+    def quote(self, city, good, quantity, price=None):
+        # Whole-dollar total for trading |quantity| units: what a buy
+        # (quantity > 0) pays or a sell (quantity < 0) receives. Starts at the
+        # current price, or at `price` to quote a later trade. None if the
+        # city does not sell the good.
+        # Average and worst case time complexity: O(1)
+        start = self._start(city, good, price)
+        if start is None:
+            return None
+        value = self._value(start[1], start[0], quantity)
+        return math.ceil(value) if quantity > 0 else math.floor(value)
+
+    def moved(self, city, good, quantity, price=None):
+        # Price after trading quantity units (from `price` if given).
+        # Average and worst case time complexity: O(1)
+        start = self._start(city, good, price)
+        return None if start is None else self._curve(start[1], start[0], quantity)
+
+    def drifted(self, city, good, ticks, price=None):
+        # Price after `ticks` more ticks (from `price` if given), computed the
+        # way tick() does, so quotes made from it match what the trade pays.
+        # Average and worst case time complexity: O(ticks)
+        cell = self._cell(city, good)
+        if cell is None:
+            return None
+        i, j = cell
+        price = float(self.prices[i, j]) if price is None else price
+        target = float(self.equilibrium[i, j])
+        keep = 1.0 - self.reversion
+        for _ in range(ticks if price != target else 0):
+            price = target + (price - target) * keep
+        return price
+
+    def affordable(self, city, good, money, limit=None, price=None):
+        # (qty, total): the most units, at most `limit`, that a buy can take
+        # for `money`, and what they cost. (0, 0) if the city does not sell it.
+        # Let Q = the quantity found
+        # Average and worst case time complexity: O(log Q)
+        start = self._start(city, good, price)
+        if start is None:
+            return 0, 0
+        j, price = start
+
+        def cost(q):
+            return math.ceil(self._value(price, j, q))
+
+        lo, hi = 0, 1
+        while (limit is None or hi <= limit) and cost(hi) <= money:
+            lo, hi = hi, hi * 2
+        if limit is not None:
+            hi = min(hi, limit + 1)
+        while hi - lo > 1:   # cost(lo) fits, cost(hi) does not (or hi > limit)
+            mid = (lo + hi) // 2
+            if cost(mid) <= money:
+                lo = mid
+            else:
+                hi = mid
+        return lo, cost(lo) if lo else 0
+
+    def best_trade(self, here, dest, good, money, limit=None, buy_price=None, sell_price=None):
+        # (qty, cost, proceeds) of the most profitable cargo of one good bought
+        # in `here` and sold in `dest`: buying more raises the price paid and
+        # selling more lowers the price earned, so past some quantity each
+        # extra unit loses money. (0, 0, 0) if either city does not trade it.
+        # Let Q = the affordable quantity
+        # Average and worst case time complexity: O(log Q)
+        buy = self._start(here, good, buy_price)
+        sell = self._start(dest, good, sell_price)
+        if buy is None or sell is None:
+            return 0, 0, 0
+        most, _ = self.affordable(here, good, money, limit, buy[1])
+        j, bp = buy
+        _, sp = sell
+
+        def gain(q):   # margin of the q-th unit
+            return (self._value(sp, j, -q) - self._value(sp, j, 1 - q)
+                    - self._value(bp, j, q) + self._value(bp, j, q - 1))
+
+        lo, hi = 0, most + 1
+        while hi - lo > 1:   # units up to lo gain money, unit hi does not
+            mid = (lo + hi) // 2
+            if gain(mid) > 0:
+                lo = mid
+            else:
+                hi = mid
+        if lo == 0:
+            return 0, 0, 0
+        return (lo, math.ceil(self._value(bp, j, lo)),
+                math.floor(self._value(sp, j, -lo)))
+
+    def apply_trade(self, city, good, quantity):
+        # quantity > 0 for a buy, < 0 for a sell.
+        # Average and worst case time complexity: O(1)
+        cell = self._cell(city, good)
+        if cell is None:
+            return
+        i, j = cell
+        undo = self._undo
+        if undo is not None and undo[0] is None:
+            undo[1].append((i, j, self.prices[i, j]))
+        self.prices[i, j] = self._moved(i, j, quantity)
+        self._displaced = True
+        self.version += 1
+
+    def tick(self, steps=1):
+        # Drift every price toward equilibrium by (1 - reversion) ** steps of its gap.
+        # Average and worst case time complexity: O(C·G), vectorized, no temporaries
+        self.ticks += steps
+        if not self._displaced:
+            return
+        undo = self._undo
+        if undo is not None and undo[0] is None:
+            undo[0] = self.prices.copy()   # a tick touches every price
+        keep = (1.0 - self.reversion) ** steps
+        np.subtract(self.prices, self.equilibrium, out=self._gap)
+        self._gap *= keep
+        np.add(self.equilibrium, self._gap, out=self.prices)
+        self.version += 1
+        # once every price is back at equilibrium, later ticks are free
+        if self.ticks % 16 == 0 and not (np.nanmax(np.abs(self._gap), initial=0.0) > 1e-6):
+            self.prices[...] = self.equilibrium
+            self._displaced = False
+
+    #  Transactions, used by Game.execute to make a batch all-or-nothing
+    def begin(self):
+        # average and worst case time complexity: O(1)
+        self._undo = [None, [], self.ticks, self._displaced, self.version]
+
+    def commit(self):
+        self._undo = None
+
+    def rollback(self):
+        # Average-case time complexity: O(T) for T trades, O(C·G) if a tick ran
+        full, cells, ticks, displaced, version = self._undo
+        self._undo = None
+        if full is not None:
+            self.prices[...] = full
+        for i, j, price in reversed(cells):
+            self.prices[i, j] = price
+        self.ticks, self._displaced = ticks, displaced
+        self.version = version + 1   # cached views may have seen the trial prices
+
+    def rounded(self):
+        # Whole-number price matrix (NaN where a city does not sell a good).
+        # Average and worst case time complexity: O(C·G)
+        return np.maximum(np.rint(self.prices), self.min_price)
+
+    def export(self):
+        # Exact market state for save games.
+        return {"prices": np.where(np.isnan(self.prices), None, self.prices).tolist(),
+                "ticks": self.ticks}
+
+    def restore(self, state):
+        prices = np.array(state["prices"], dtype=float)
+        self.prices[...] = prices
+        self.ticks = state.get("ticks", 0)
+        self._displaced = True
+        self.version += 1
+
+
+class MarketGoods(Mapping):
+    # Live goods table of one city (good -> current whole-number price).
+    def __init__(self, market, row):
+        self._market = market
+        self._row = row
+
+    def __getitem__(self, good):
+        # Average and worst case time complexity: O(1)
+        m = self._market
+        j = m.good_index.get(good)
+        if j is None:
+            raise KeyError(good)
+        p = m.prices[self._row, j]
+        if p != p:
+            raise KeyError(good)
+        return max(m.min_price, int(round(p)))
+
+    def __iter__(self):
+        # Average and worst case time complexity: O(G)
+        m = self._market
+        row = m.prices[self._row]
+        return (good for good, p in zip(m.goods, row.tolist()) if p == p)
+
+    def __len__(self):
+        return int(np.count_nonzero(~np.isnan(self._market.prices[self._row])))
+
+    def update(self, prices):
+        # Set current prices (equilibrium is unchanged).
+        m = self._market
+        for good, price in prices.items():
+            m.prices[self._row, m.good_index[good]] = price
+        m._displaced = True
+        m.version += 1
+
+    def __repr__(self):
+        return repr(dict(self))
@@ -0,0 +1,226 @@
+# Counters, timers and an opt-in sampling profiler.
+#
+# Instrumentation is off by default and every hook first checks the module
+# flag ENABLED, so a disabled hook costs one global lookup (plus one wrapper
+# call for @timed functions). Turn it on with enable() or by setting
+# CITY_TRADER_METRICS=<file.json | file.prom> before starting a front end;
+# CITY_TRADER_PROFILE=<file.folded> additionally samples the main thread and
+# writes flame-graph stacks (flamegraph.pl / speedscope "folded" format) on exit.
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+ENABLED = False
+
+# upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+
+class Timer:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        # average and worst case time complexity: O(1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        # average and worst case time complexity: O(log B), B = number of buckets
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+class Registry:
+    def __init__(self):
+        # average and worst case time complexity: O(1)
+        self.counters = {}
+        self.timers = {}
+        self._lock = threading.Lock()   # the server runs advisor calls in threads
+
+    def incr(self, name, n=1):
+        # average and worst case time complexity: O(1)
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        # average and worst case time complexity: O(1)
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = Timer()
+            timer.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def snapshot(self):
+        # Plain-dict copy, safe to json.dump.
+        # Let N = number of metrics
+        # Average and worst case time complexity: O(N)
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timers": {name: {"count": t.count, "total_seconds": t.total,
+                                  "mean_seconds": t.total / t.count if t.count else 0.0,
+                                  "max_seconds": t.max,
+                                  "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"],
+                                                      t.buckets))}
+                           for name, t in self.timers.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="city_trader"):
+        # Prometheus text exposition format: counters as *_total, timers as
+        # *_seconds histograms.
+        # Average and worst case time complexity: O(N·B)
+        snap = self.snapshot()
+        out = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            out.append(f"# TYPE {metric} counter")
+            out.append(f"{metric} {value}")
+        for name, t in sorted(snap["timers"].items()):
+            metric = f"{prefix}_{_metric_name(name)}_seconds"
+            out.append(f"# TYPE {metric} histogram")
+            running = 0
+            for le, n in t["buckets"].items():
+                running += n
+                out.append(f'{metric}_bucket{{le="{le}"}} {running}')
+            out.append(f"{metric}_sum {t['total_seconds']!r}")
+            out.append(f"{metric}_count {t['count']}")
+        return "\n".join(out) + "\n"
+
+    def dump(self, path):
+        # .prom / .txt -> Prometheus text, anything else -> JSON
+        text = self.to_prometheus() if str(path).endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _metric_name(name):
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+REGISTRY = Registry()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def incr(name, n=1):
+    if ENABLED:
+        REGISTRY.incr(name, n)
+
+
+def observe(name, seconds):
+    if ENABLED:
+        REGISTRY.observe(name, seconds)
+
+
+def timed(name):
+    # Decorator: count calls and time them as `name` while metrics are enabled.
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class Profiler:
+    # Samples one thread's Python stack every `interval` seconds from a
+    # background thread and aggregates identical stacks. dump() writes them in
+    # folded format ("outer;inner;leaf count" per line).
+    def __init__(self, interval=0.005, thread_id=None):
+        # average and worst case time complexity: O(1)
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="city-trader-profiler",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        # Let D = stack depth; each sample costs O(D)
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.stacks.items()))
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
+
+
+def configure_from_env(environ=None):
+    # Called by the front ends at start-up; a no-op unless the variables are set.
+    environ = os.environ if environ is None else environ
+    metrics_path = environ.get("CITY_TRADER_METRICS")
+    profile_path = environ.get("CITY_TRADER_PROFILE")
+    if metrics_path:
+        enable()
+        atexit.register(REGISTRY.dump, metrics_path)
+    if profile_path:
+        profiler = Profiler().start()
+
+        def finish():
+            profiler.stop()
+            profiler.dump(profile_path)
+        atexit.register(finish)
@@ -1,25 +1,40 @@
+import bisect
+import threading
+from collections import OrderedDict
 
+from city_trader import metrics
+from city_trader.graph import _cost_value
+
+
+@metrics.timed("optimizer.suggest_best_move")
 def suggest_best_move(graph, cities, current_city, fuel_left):
     # Let V = number of cities, E = number of roads, G = number of goods in the current city
-    # Average-case time complexity: O((V + E) log V + V·G)
+    # (V', E' = cities and roads within fuel_left)
+    # Average-case time complexity: O((V' + E') log V' + V'·G)
     # Worst-case time complexity: O((V + E) log V + V·G)
     #   Explanation:
-    #     - Dijkstra = O((V + E) log V)
-    #     - Nested loop: for each destination city, check up to G goods → O(V·G)
+    #     - Dijkstra stops at the fuel budget = O((V' + E') log V'),
+    #       O(V) when the source row is already cached
+    #     - Nested loop: for each reachable city, check up to G goods → O(V'·G)
     #     - All dictionary lookups inside loops are O(1)
     
+    # shortest fuel cost to every city within the fuel budget, visited in graph
+    # order so ties resolve the same way as a scan over the full row
+    reach = graph.within(current_city, fuel_left)
+    return _best_move(graph, cities, current_city, reach)
+
+
+def _best_move(graph, cities, current_city, reach):
+    # Average and worst case time complexity: O(V' log V' + V'·G)
     best_profit = 0
     best_city = None
     best_good = None
+    rank = graph.city_order()
 
-    # get shortest fuel cost to every city
-    dist, _ = graph.dijkstra(current_city)
-
-    for dest, fuel_cost in dist.items():
+    for dest in sorted(reach, key=rank.__getitem__):
+        fuel_cost = reach[dest]
         if dest == current_city:
             continue
-        if fuel_cost == float('inf') or fuel_cost > fuel_left:
-            continue
         if current_city not in cities or dest not in cities:
             continue
         for good, price_here in cities[current_city].goods.items():
@@ -31,3 +46,109 @@ def suggest_best_move(graph, cities, current_city, fuel_left):
                     best_good = good
 
     return best_city, best_good, best_profit
+
+
+def _fuel_span(graph, source, reach):
+    # [low, high): every fuel budget in this range reaches exactly the cities in
+    # `reach`, so suggest_best_move gives the same answer for all of them.
+    # low is the farthest reachable city, high the cheapest city just outside.
+    # Average and worst case time complexity: O(V' + E')
+    if not reach:
+        # below zero fuel nothing is reachable; unknown cities never reach anything
+        return -float('inf'), (0.0 if source in graph.cities else float('inf'))
+    high = float('inf')
+    for city, d in reach.items():
+        for other, cost in graph.cities.get(city, {}).items():
+            if other not in reach:
+                nd = d + _cost_value(cost)
+                if nd < high:
+                    high = nd
+    return max(reach.values()), high
+
+
+class AdvisorCache:
+    # Memoized suggest_best_move shared by every caller on one world.
+    #
+    # Answers are cached per (location, fuel bucket), where a bucket is the
+    # exact range of fuel that reaches the same set of cities, so a hit returns
+    # what a fresh call would. The whole cache is dropped when the graph
+    # version, the market version or the number of cities changes; call
+    # invalidate() after editing city prices by hand without a Market. Entries
+    # beyond max_entries are evicted least recently used first. All methods
+    # take one lock, so a single cache can serve a server's worker threads.
+    def __init__(self, graph, cities, market=None, max_entries=4096):
+        # average and worst case time complexity: O(1)
+        self.graph = graph
+        self.cities = cities
+        self.market = market
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (location, low) -> (high, answer)
+        self._lows = {}                 # location -> sorted lows of its cached buckets
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _current(self):
+        return (self.graph.version, len(self.cities),
+                self.market.version if self.market is not None else None)
+
+    def invalidate(self):
+        with self._lock:
+            self._drop()
+
+    def _drop(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._lows.clear()
+
+    def suggest(self, location, fuel):
+        # Same result as suggest_best_move(graph, cities, location, fuel).
+        # Let B = cached buckets for this location
+        # Average-case time complexity: O(log B) on a hit
+        # Worst-case time complexity: that of suggest_best_move plus O(V' + E' + B) on a miss
+        stamp = self._current()
+        with self._lock:
+            if stamp != self._stamp:
+                self._drop()
+                self._stamp = stamp
+            lows = self._lows.get(location)
+            if lows:
+                i = bisect.bisect_right(lows, fuel) - 1
+                if i >= 0:
+                    key = (location, lows[i])
+                    high, answer = self._entries[key]
+                    if fuel < high:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        if metrics.ENABLED:
+                            metrics.incr("advisor_cache.hits")
+                        return answer
+            self.misses += 1
+        if metrics.ENABLED:
+            metrics.incr("advisor_cache.misses")
+
+        # computed outside the lock so other threads are not held up
+        reach = self.graph.within(location, fuel)
+        answer = _best_move(self.graph, self.cities, location, reach)
+        low, high = _fuel_span(self.graph, location, reach)
+        with self._lock:
+            if stamp == self._stamp and (location, low) not in self._entries:
+                self._entries[(location, low)] = (high, answer)
+                bisect.insort(self._lows.setdefault(location, []), low)
+                while len(self._entries) > self.max_entries:
+                    (old, old_low), _ = self._entries.popitem(last=False)
+                    lows = self._lows[old]
+                    lows.remove(old_low)
+                    if not lows:
+                        del self._lows[old]
+                    self.evictions += 1
+        return answer
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations, "entries": len(self._entries)}
@@ -0,0 +1,213 @@
+import time
+
+from city_trader import metrics
+
+
+class Plan:
+    # A multi-stop itinerary. Each step is one of
+    #   ("buy", good, qty, cost)   ("travel", city, fuel)   ("sell", good, qty, proceeds)
+    # and can be executed in order with Game.buy / Game.travel / Game.sell.
+    def __init__(self, start, money, fuel, steps=(), final_money=None, final_fuel=None):
+        # average and worst case time complexity: O(1)
+        self.start = start
+        self.money = money
+        self.fuel = fuel
+        self.steps = list(steps)
+        self.final_money = money if final_money is None else final_money
+        self.final_fuel = fuel if final_fuel is None else final_fuel
+
+    @property
+    def profit(self):
+        return self.final_money - self.money
+
+    def lines(self):
+        # Let S = number of steps
+        # Average and worst case time complexity: O(S)
+        here = self.start
+        out = []
+        for step in self.steps:
+            if step[0] == "buy":
+                _, good, qty, cost = step
+                out.append(f"Buy {qty} {good} in {here} for ${cost}")
+            elif step[0] == "travel":
+                _, here, fuel = step
+                out.append(f"Travel to {here} (fuel {fuel})")
+            else:
+                _, good, qty, proceeds = step
+                out.append(f"Sell {qty} {good} in {here} for ${proceeds}")
+        return out
+
+    def __repr__(self):
+        return f"Plan(start={self.start}, steps={len(self.steps)}, profit={self.profit})"
+
+
+class _State:
+    # ticks: travel hops so far (one market tick each); prices: projected
+    # {(city, good): (price, tick)} of the market prices this plan has moved
+    __slots__ = ("location", "fuel", "money", "steps", "ticks", "prices")
+
+    def __init__(self, location, fuel, money, steps, ticks=0, prices=None):
+        self.location = location
+        self.fuel = fuel
+        self.money = money
+        self.steps = steps
+        self.ticks = ticks
+        self.prices = prices or {}
+
+
+@metrics.timed("planner.plan_route")
+def plan_route(graph, cities, start, fuel, money, max_legs=4, beam_width=64,
+               time_budget=0.25, fuel_value=0.5, market=None):
+    # Beam search over (location, fuel, money) states. One leg buys a single good,
+    # follows the cheapest road path to a destination and sells everything there,
+    # so cargo is always empty between legs. A leg may also just reposition.
+    # With a market, every trade is sized and quoted along its price curve from
+    # the price projected for that point of the plan (earlier trades of the plan,
+    # plus one tick per road travelled), so Game charges exactly what it says.
+    # Let V = number of cities, G = goods per city, B = beam width, L = legs
+    # (V', E' = cities and roads within the fuel left)
+    # Average-case time complexity: O(L·B·V'·G) plus one fuel-bounded Dijkstra
+    # per visited city, O((V' + E') log V') each
+    # Worst-case time complexity: O(L·B·V·G + V (V + E) log V)
+    # Anytime: when time_budget seconds run out the best plan found so far is
+    # returned; the clock is also checked while a state's moves are expanded.
+    deadline = time.perf_counter() + time_budget
+    best = Plan(start, money, fuel)
+    if start not in cities:
+        return best
+
+    moves_memo = {}
+    beam = [_State(start, fuel, money, ())]
+    # Pareto front per city of the states kept in a beam: a new state is dropped
+    # if another one at the same city has at least as much money and fuel.
+    # Children dropped by the beam cut never enter it, so they cannot block
+    # an equal state on a later leg.
+    fronts = {start: [(money, fuel)]}
+
+    def score(state):
+        return state.money + state.fuel * fuel_value
+
+    for _ in range(max_legs):
+        children = []
+        layer = {}      # fronts of this leg's children, before the cut
+        for state in beam:
+            if time.perf_counter() > deadline:
+                break
+            _, moves, prev = _moves(graph, cities, state.location, state.fuel, moves_memo)
+            for n, (dest, good, buy, sell, cost) in enumerate(moves):
+                if n & 255 == 255 and time.perf_counter() > deadline:
+                    break
+                if cost > state.fuel:
+                    continue
+                travel = None
+                prices = state.prices
+                if not good:
+                    qty = spent = earned = 0
+                elif market is None:
+                    qty = state.money // buy
+                    spent, earned = qty * buy, qty * sell
+                else:
+                    travel = _travel_steps(graph, prev, state.location, dest)
+                    arrive = state.ticks + len(travel)
+                    bp = _projected(market, prices, state.location, good, state.ticks)
+                    sp = _projected(market, prices, dest, good, arrive)
+                    qty, spent, earned = market.best_trade(state.location, dest, good,
+                                                           state.money, None, bp, sp)
+                    if qty > 0:
+                        prices = dict(prices)
+                        prices[(state.location, good)] = (
+                            market.moved(state.location, good, qty, bp), state.ticks)
+                        prices[(dest, good)] = (market.moved(dest, good, -qty, sp), arrive)
+                if good and qty <= 0:
+                    continue
+                new_money = state.money - spent + earned
+                new_fuel = state.fuel - cost
+                if (_dominated(fronts, dest, new_money, new_fuel)
+                        or _dominated(layer, dest, new_money, new_fuel)):
+                    continue
+                _add_to_front(layer, dest, new_money, new_fuel)
+                if travel is None:
+                    travel = _travel_steps(graph, prev, state.location, dest)
+                steps = state.steps
+                if good:
+                    steps += (("buy", good, qty, spent),)
+                steps += travel
+                if good:
+                    steps += (("sell", good, qty, earned),)
+                children.append(_State(dest, new_fuel, new_money, steps,
+                                       state.ticks + len(travel), prices))
+
+        if not children:
+            break
+        children.sort(key=score, reverse=True)
+        beam = children[:beam_width]
+        for state in beam:
+            _add_to_front(fronts, state.location, state.money, state.fuel)
+            if state.money > best.final_money:
+                best = Plan(start, money, fuel, state.steps, state.money, state.fuel)
+        if time.perf_counter() > deadline:
+            break
+
+    # trailing repositioning steps earn nothing, so they are never part of best
+    return best
+
+
+def _moves(graph, cities, location, budget, memo):
+    # Memoized (budget, candidate legs, predecessor map) for one city: profitable
+    # trades plus bare travel to every city within `budget` fuel. Recomputed only
+    # when a state arrives with more fuel than the memoized search covered.
+    # Average and worst case time complexity: O((V' + E') log V' + V'·G) on a
+    # miss, O(1) afterwards
+    cached = memo.get(location)
+    if cached is not None and cached[0] >= budget:
+        return cached
+    dist, prev = graph.dijkstra_within(location, budget)
+    rank = graph.city_order()
+    here = cities[location].goods
+    moves = []
+    for dest in sorted(dist, key=rank.__getitem__):
+        cost = dist[dest]
+        if dest == location or dest not in cities:
+            continue
+        there = cities[dest].goods
+        for good, price in here.items():
+            if good in there and there[good] > price > 0:
+                moves.append((dest, good, price, there[good], cost))
+        moves.append((dest, None, 0, 0, cost))
+    memo[location] = (budget, moves, prev)
+    return memo[location]
+
+
+def _projected(market, prices, city, good, ticks):
+    # Market price of good in city after `ticks` hops of the plan
+    # Average and worst case time complexity: O(ticks)
+    moved = prices.get((city, good))
+    if moved is None:
+        return market.drifted(city, good, ticks)
+    price, since = moved
+    return market.drifted(city, good, ticks - since, price)
+
+
+def _travel_steps(graph, prev, source, dest):
+    # Roads of the cheapest path source -> dest, read from `prev` of _moves
+    # Average and worst case time complexity: O(L), L = number of roads on the path
+    route = [dest]
+    while route[-1] != source:
+        route.append(prev[route[-1]])
+    route.reverse()
+    return tuple(("travel", b, graph.cities[a][b]) for a, b in zip(route, route[1:]))
+
+
+def _dominated(fronts, location, money, fuel):
+    # Average and worst case time complexity: O(F), F = size of the city's front
+    for m, f in fronts.get(location, ()):
+        if m >= money and f >= fuel:
+            return True
+    return False
+
+
+def _add_to_front(fronts, location, money, fuel):
+    # Average and worst case time complexity: O(F), F = size of the city's front
+    front = fronts.setdefault(location, [])
+    front[:] = [(m, f) for m, f in front if not (money >= m and fuel >= f)]
+    front.append((money, fuel))
@@ -1,11 +1,18 @@
 class Player:
-    def __init__(self, start_city, fuel=100, money=500):
+    def __init__(self, start_city, fuel=100, money=500, capacity=None):
         # average and worst case time complexity: O(1)
         self.location = start_city
         self.fuel = fuel
         self.money = money
+        self.capacity = capacity  # max units of cargo carried, None for unlimited
         self.inventory = {}
 
+    def cargo(self):
+        # Units currently carried.
+        # Let G = number of goods in the inventory
+        # average and worst case time complexity: O(G)
+        return sum(self.inventory.values())
+
     def __repr__(self):
         # average and worst case time complexity: O(1)
         return f"Player(location={self.location}, fuel={self.fuel}, money={self.money})"
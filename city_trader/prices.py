@@ -0,0 +1,164 @@
+FILTERS = ("all", "neighbors", "reachable")
+SORTS = ("name", "margin")
+
+
+class PriceView:
+    # Paginated, cached view of the price table shared by the console and the
+    # board UI. The goods header, city order and formatted rows are cached and
+    # dropped when prices change (market.version moves, or invalidate() is
+    # called for worlds without a market); only the requested page is formatted.
+    def __init__(self, cities, market=None, page_size=20):
+        # average and worst case time complexity: O(1)
+        self.cities = cities
+        self.market = market
+        self.page_size = page_size
+        self._version = None
+        self._goods = None
+        self._by_name = None
+        self._orders = {}     # (filter, good, sort, here, fuel, graph version) -> names
+        self._pages = {}      # (style, order key, page) -> rendered lines
+        self._generation = 0
+
+    def invalidate(self, goods=False):
+        # Call after editing city.goods by hand; goods=True when a good was added
+        # or removed somewhere, so the column list is rebuilt too.
+        self._generation += 1
+        if goods:
+            self._goods = None
+
+    def _check(self):
+        # Average-case time complexity: O(1) while prices are unchanged
+        version = (len(self.cities), self._generation,
+                   self.market.version if self.market is not None else None)
+        if version != self._version:
+            if self._version is None or version[0] != self._version[0]:
+                self._goods = None
+                self._by_name = None
+            self._version = version
+            self._orders.clear()
+            self._pages.clear()
+
+    @property
+    def goods(self):
+        # Let C = number of cities, G = distinct goods
+        # Average-case time complexity: O(1) cached, O(C·G) after the city set changes
+        self._check()
+        if self._goods is None:
+            if self.market is not None:
+                self._goods = sorted(self.market.goods)
+            else:
+                self._goods = sorted({g for city in self.cities.values() for g in city.goods})
+        return self._goods
+
+    def margin(self, name, here, good=None):
+        # Best resale margin of buying in `here` and selling in `name` (for one
+        # good, or the best good both sell). None if they trade nothing in common.
+        # Average and worst case time complexity: O(G)
+        there = self.cities[name].goods
+        local = self.cities[here].goods
+        goods = (good,) if good is not None else local
+        best = None
+        for g in goods:
+            if g in local and g in there:
+                m = there[g] - local[g]
+                if best is None or m > best:
+                    best = m
+        return best
+
+    def order(self, filter="all", good=None, sort="name", here=None, fuel=None, graph=None):
+        # City names shown for these options, cached until prices change.
+        # Let C = number of cities shown
+        # Average-case time complexity: O(1) cached, O(C log C + C·G) otherwise
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown filter {filter!r}; expected one of {', '.join(FILTERS)}")
+        if sort not in SORTS:
+            raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(SORTS)}")
+        if (filter != "all" or sort == "margin") and here not in self.cities:
+            raise ValueError("neighbors, reachable and margin need the current city")
+        self._check()
+        key = (filter, good, sort, here, fuel if filter == "reachable" else None,
+               getattr(graph, "version", None) if filter != "all" else None)
+        names = self._orders.get(key)
+        if names is not None:
+            return key, names
+
+        if self._by_name is None:
+            self._by_name = sorted(self.cities)
+        if filter == "all":
+            names = self._by_name
+        elif filter == "neighbors":
+            near = graph.cities.get(here, {})
+            names = [n for n in self._by_name if n in near and n in self.cities]
+        else:
+            dist, _ = graph.shortest_paths(here)
+            limit = float('inf') if fuel is None else fuel
+            names = [n for n in self._by_name if n != here and dist.get(n, float('inf')) <= limit]
+        if good is not None:
+            names = [n for n in names if good in self.cities[n].goods]
+        if sort == "margin":
+            scored = [(self.margin(n, here, good), n) for n in names]
+            scored.sort(key=lambda s: (s[0] is None, -(s[0] or 0), s[1]))
+            names = [n for _, n in scored]
+        self._orders[key] = names
+        return key, names
+
+    def pages(self, names):
+        return max(1, -(-len(names) // self.page_size))
+
+    def lines(self, page=0, style="table", filter="all", good=None, sort="name", here=None,
+              fuel=None, graph=None):
+        # Rendered page of the table. style "table" is the console layout
+        # (columns sized to the page), "board" the fixed-width board layout.
+        # Returns (lines, page, pages) with page clamped to the valid range.
+        # Let P = page size, G = goods shown
+        # Average-case time complexity: O(1) when cached, O(P·G) otherwise (plus order())
+        key, names = self.order(filter, good, sort, here, fuel, graph)
+        pages = self.pages(names)
+        page = max(0, min(page, pages - 1))
+        cache_key = (style, key, page)
+        cached = self._pages.get(cache_key)
+        if cached is not None:
+            return cached, page, pages
+
+        goods = [good] if good is not None else self.goods
+        shown = names[page * self.page_size:(page + 1) * self.page_size]
+        with_margin = sort == "margin"
+        if style == "table":
+            rendered = self._table(shown, goods, here if with_margin else None, good)
+        else:
+            rendered = self._board(shown, goods, here if with_margin else None, good)
+        if pages > 1:
+            rendered.append(f"Page {page + 1}/{pages} ({len(names)} cities)")
+        self._pages[cache_key] = rendered
+        return rendered, page, pages
+
+    def _table(self, names, goods, here, good):
+        header = ["City"] + goods + (["Margin"] if here else [])
+        rows = []
+        for name in names:
+            prices = self.cities[name].goods
+            row = [name] + [f"${prices.get(g, '-')}" for g in goods]
+            if here:
+                m = self.margin(name, here, good)
+                row.append("-" if m is None else f"{m:+}")
+            rows.append(row)
+        widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+        out = [" | ".join(str(header[i]).ljust(widths[i]) for i in range(len(header))),
+               "-" * (sum(widths) + 3 * (len(header) - 1))]
+        for row in rows:
+            out.append(" | ".join(str(row[i]).ljust(widths[i]) for i in range(len(row))))
+        return out
+
+    def _board(self, names, goods, here, good):
+        header = "City".ljust(14) + "".join(g[:10].rjust(10) for g in goods)
+        if here:
+            header += "Margin".rjust(10)
+        out = [header, "-" * len(header)]
+        for name in names:
+            prices = self.cities[name].goods
+            row = name.ljust(14) + "".join(str(prices.get(g, "-")).rjust(10) for g in goods)
+            if here:
+                m = self.margin(name, here, good)
+                row += ("-" if m is None else f"{m:+}").rjust(10)
+            out.append(row)
+        return out
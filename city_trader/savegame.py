@@ -0,0 +1,143 @@
+# Event-sourced save games.
+#
+# A save is two files next to each other:
+#   <name>.events  append-only log, one JSON array per state-changing action
+#                  (["travel", city], ["buy", good, qty], ["sell", good, qty],
+#                  ["execute", [command, ...]])
+#   <name>.state   the latest compact snapshot of the player and market prices,
+#                  plus the event count and log byte offset it covers
+# Loading reads the snapshot and replays only the events after it, so load time
+# depends on the snapshot interval, not on how long the game has run.
+import json
+import os
+from pathlib import Path
+
+from city_trader.player import Player
+from city_trader.game import Game
+
+# Game methods a log may replay, with their number of arguments
+_EVENTS = {"travel": 1, "buy": 2, "sell": 2, "execute": 1}
+
+
+class Journal:
+    # Buffers events and writes them to the log in batches; takes a snapshot
+    # every snapshot_every events.
+    def __init__(self, game, path, batch_size=4096, snapshot_every=50000, seq=0):
+        # average and worst case time complexity: O(1)
+        self.game = game
+        self.base = Path(path)
+        self.batch_size = batch_size
+        self.snapshot_every = snapshot_every
+        self.seq = seq               # events recorded so far, including buffered ones
+        self._buffer = []
+        self._log = open(self.base.with_suffix(".events"), "ab")
+        game.journal = self
+
+    def append(self, op, *args):
+        # average time complexity: O(1); a flush or snapshot every batch_size /
+        # snapshot_every events costs O(batch) / O(C·G)
+        self._buffer.append(json.dumps((op,) + args, separators=(",", ":")))
+        self.seq += 1
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        if self.snapshot_every and self.seq % self.snapshot_every == 0:
+            self.snapshot()
+
+    def flush(self):
+        # average and worst case time complexity: O(B), B = buffered events
+        if self._buffer:
+            self._log.write(("\n".join(self._buffer) + "\n").encode("utf-8"))
+            self._buffer.clear()
+        self._log.flush()
+
+    def snapshot(self):
+        # Average and worst case time complexity: O(C·G + I)
+        self.flush()
+        game = self.game
+        player = game.player
+        state = {
+            "seq": self.seq,
+            "log_offset": self._log.tell(),
+            "starting_money": game.starting_money,
+            "player": {"location": player.location, "fuel": player.fuel,
+                       "money": player.money, "capacity": player.capacity,
+                       "inventory": player.inventory},
+            "prices": {name: dict(city.goods) for name, city in game.cities.items()},
+        }
+        if game.market is not None:
+            state["market"] = game.market.export()
+        target = self.base.with_suffix(".state")
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(json.dumps(state, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, target)   # a crash mid-write keeps the previous snapshot
+
+    def close(self):
+        self.snapshot()
+        self._log.close()
+        if self.game.journal is self:
+            self.game.journal = None
+
+
+def save_game(game, path):
+    # Start journaling a game that has none yet; writes an initial snapshot.
+    # Average and worst case time complexity: O(C·G)
+    base = Path(path)
+    base.with_suffix(".events").write_bytes(b"")
+    journal = Journal(game, base)
+    journal.snapshot()
+    return journal
+
+
+def _event(line, where):
+    # (op, args) of one log record; ValueError unless it is a replayable event.
+    try:
+        event = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"bad event at {where}: {e}") from None
+    if (not isinstance(event, list) or not event or not isinstance(event[0], str)
+            or _EVENTS.get(event[0]) != len(event) - 1):
+        raise ValueError(f"bad event at {where}: {line[:80]!r}")
+    return event[0], event[1:]
+
+
+def load_game(path, graph, cities, resume=True, market=None):
+    # Rebuild a Game from the latest snapshot plus the log tail.
+    # Raises ValueError if the log holds anything but travel/buy/sell/execute events.
+    # Let T = events after the snapshot
+    # Average and worst case time complexity: O(C·G + T)
+    # With resume=True a Journal is reattached so new actions keep being saved.
+    # Pass the game's Market (built over the same cities) to restore exact prices.
+    base = Path(path)
+    state = json.loads(base.with_suffix(".state").read_text(encoding="utf-8"))
+    p = state["player"]
+    player = Player(p["location"], fuel=p["fuel"], money=p["money"],
+                    capacity=p.get("capacity"))
+    player.inventory = dict(p["inventory"])
+    if market is not None and "market" in state:
+        market.restore(state["market"])
+    else:
+        for name, prices in state["prices"].items():
+            goods = cities[name].goods
+            if hasattr(goods, "update") and dict(goods) != prices:
+                goods.update(prices)
+    game = Game(graph, cities, player, market)
+    game.starting_money = state["starting_money"]
+
+    seq = state["seq"]
+    log_path = base.with_suffix(".events")
+    end = offset = state["log_offset"]
+    with open(log_path, "rb") as log:
+        log.seek(offset)
+        for line in log:
+            if not line.endswith(b"\n"):
+                break   # torn write from a crash: ignore the partial record
+            op, args = _event(line, f"{log_path}, byte {end}")
+            getattr(game, op)(*args)
+            seq += 1
+            end += len(line)
+
+    if resume:
+        if end != log_path.stat().st_size:
+            os.truncate(log_path, end)
+        Journal(game, base, seq=seq)
+    return game
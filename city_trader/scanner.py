@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class PriceMatrix:
+    # Dense city x good price table used by the vectorized scanner.
+    # Missing goods are stored as NaN so they never produce a margin.
+    def __init__(self, cities):
+        # Let C = number of cities, G = number of distinct goods
+        # Average and worst case time complexity: O(C·G)
+        self.names = list(cities)
+        self.city_index = {name: i for i, name in enumerate(self.names)}
+        self.goods = sorted({good for city in cities.values() for good in city.goods})
+        self.good_index = {good: j for j, good in enumerate(self.goods)}
+        self.prices = np.full((len(self.names), len(self.goods)), np.nan)
+        for i, name in enumerate(self.names):
+            for good, price in cities[name].goods.items():
+                self.prices[i, self.good_index[good]] = price
+
+        # distance vectors per source city, valid for one graph version
+        self._dist_rows = {}
+        self._graph_version = None
+        self.market = None
+        self.version = None
+
+    @classmethod
+    def from_market(cls, market):
+        # Price matrix that follows a market.Market; refresh() re-reads it only
+        # when the market version has moved.
+        # Average and worst case time complexity: O(C·G)
+        matrix = cls({})
+        matrix.names = market.names
+        matrix.city_index = market.city_index
+        matrix.goods = market.goods
+        matrix.good_index = market.good_index
+        matrix.market = market
+        matrix.refresh()
+        return matrix
+
+    def refresh(self):
+        # Average-case time complexity: O(1) if the market has not changed, else O(C·G)
+        if self.market is not None and self.version != self.market.version:
+            self.prices = self.market.rounded()
+            self.version = self.market.version
+
+    def distance_vector(self, graph, source):
+        # Average-case time complexity: O(1) when cached, O(C) + Dijkstra otherwise
+        version = getattr(graph, "version", None)
+        if version != self._graph_version:
+            self._dist_rows.clear()
+            self._graph_version = version
+        row = self._dist_rows.get(source)
+        if row is None:
+            dist, _ = graph.shortest_paths(source)
+            inf = float('inf')
+            row = np.fromiter((dist.get(name, inf) for name in self.names),
+                              dtype=np.float64, count=len(self.names))
+            self._dist_rows[source] = row
+        return row
+
+
+def top_moves(graph, cities, current_city, fuel_left, k=5, matrix=None):
+    # Let C = number of cities, G = number of distinct goods
+    # Average-case time complexity: O(C·G) vectorized + O(k log k) ranking
+    # Worst-case time complexity: O(C·G) vectorized + O(T log T), T = tied candidates
+    # Returns up to k (city, good, margin) tuples, best first. Margins and the
+    # ordering of ties match suggest_best_move, so top_moves(...)[0] is its answer.
+    if current_city not in cities or k <= 0:
+        return []
+    if matrix is None:
+        matrix = PriceMatrix(cities)
+    matrix.refresh()
+
+    here = matrix.city_index[current_city]
+    dist = matrix.distance_vector(graph, current_city)
+
+    # margin[i, j] = price at city i - price here - half the fuel cost to reach i
+    margins = (matrix.prices - matrix.prices[here]) - dist[:, None] * 0.5
+    reachable = (dist <= fuel_left) & np.isfinite(dist)
+    reachable[here] = False
+    margins[~reachable] = np.nan
+
+    # NaN (unsold or unreachable) compares False, so this keeps only real profits
+    flat = margins.ravel()
+    candidates = np.flatnonzero(flat > 0)
+    if candidates.size == 0:
+        return []
+    if candidates.size > k:
+        values = flat[candidates]
+        cutoff = np.partition(values, values.size - k)[values.size - k]
+        candidates = candidates[values >= cutoff]
+
+    # suggest_best_move keeps the first strict maximum it meets while walking
+    # destinations in graph order and goods in the current city's order
+    graph_rank = graph.city_order()
+    here_rank = {good: r for r, good in enumerate(cities[current_city].goods)}
+    n_goods = len(matrix.goods)
+    rows, cols = np.divmod(candidates, n_goods)
+    city_rank = np.array([graph_rank.get(matrix.names[i], len(graph_rank)) for i in rows])
+    good_rank = np.array([here_rank.get(matrix.goods[j], len(here_rank)) for j in cols])
+    order = np.lexsort((good_rank, city_rank, -flat[candidates]))[:k]
+
+    return [(matrix.names[rows[o]], matrix.goods[cols[o]], float(flat[candidates[o]]))
+            for o in order]
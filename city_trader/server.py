@@ -0,0 +1,236 @@
+# Multi-session City Trader server speaking line-delimited JSON.
+#
+#   python -m city_trader.server --port 8765          (or --unix /tmp/trader.sock)
+#
+# Every request is one JSON object per line and gets exactly one response line
+# carrying the same "id":
+#   {"id": 1, "op": "new", "start": "Paris"}          -> {"id": 1, "ok": true, "session": "...", "state": {...}}
+#   {"id": 2, "op": "travel", "session": "...", "city": "Berlin"}
+#   {"id": 3, "op": "buy" | "sell", "session": "...", "good": "wine", "qty": 3}
+#   {"id": 4, "op": "state" | "advise" | "close", "session": "..."}
+#   {"id": 7, "op": "batch", "session": "...", "commands": [["buy", "wine", 3], ["travel", "Berlin"]]}
+#       -> {"id": 7, "ok": true, "applied": true, "codes": ["OK", "OK"], "state": {...}}
+#   {"id": 5, "op": "ping"}
+#   {"id": 6, "op": "metrics", "format": "json" | "prometheus"}
+# Failures answer {"id": ..., "ok": false, "error": "..."}.
+#
+# All sessions share one read-only Graph and city table; each has its own
+# Player, Game and lock. A connection may pipeline several requests (up to
+# max_in_flight, after which the server stops reading from it), sessions idle
+# for longer than idle_timeout are evicted, and advisor calls run in a thread
+# pool so they never block the event loop.
+import argparse
+import asyncio
+import json
+import secrets
+import time
+
+from city_trader.player import Player
+from city_trader.game import Game
+from city_trader.optimizer import AdvisorCache
+from city_trader.world import WORLD_PATH, load_world
+from city_trader import metrics
+
+
+class Session:
+    def __init__(self, game):
+        # average and worst case time complexity: O(1)
+        self.game = game
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+    def state(self):
+        player = self.game.player
+        return {"location": player.location, "fuel": player.fuel, "money": player.money,
+                "inventory": player.inventory, "profit": self.game.profit()}
+
+
+class TraderServer:
+    def __init__(self, graph, cities, max_sessions=100000, idle_timeout=600.0,
+                 max_in_flight=64, max_advice=32, fuel=100, money=500, advice_cache=4096):
+        # average and worst case time complexity: O(1)
+        self.graph = graph
+        self.cities = cities
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_in_flight = max_in_flight
+        self.fuel = fuel
+        self.money = money
+        self._advice = asyncio.Semaphore(max_advice)
+        self.advisor = AdvisorCache(graph, cities, max_entries=advice_cache)
+        self._servers = []
+        self._reaper = None
+        self.requests = 0
+
+    #  Lifecycle
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            server = await asyncio.start_unix_server(self._serve, path=unix_path)
+        else:
+            server = await asyncio.start_server(self._serve, host, port)
+        self._servers.append(server)
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._evict_idle())
+        return server
+
+    async def close(self):
+        if self._reaper:
+            self._reaper.cancel()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _evict_idle(self):
+        # Average and worst case time complexity per sweep: O(S), S = sessions
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            for sid in [sid for sid, s in self.sessions.items()
+                        if s.last_used < cutoff and not s.lock.locked()]:
+                del self.sessions[sid]
+
+    #  Connections
+    async def _serve(self, reader, writer):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                # backpressure: stop reading once this connection has too much in flight
+                await slots.acquire()
+                line = await reader.readline()
+                if not line:
+                    slots.release()
+                    break
+                task = asyncio.create_task(self._answer(line, writer, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, line, writer, slots):
+        try:
+            request = None
+            try:
+                request = json.loads(line)
+                response = await self.handle(request)
+            except ValueError as e:
+                response = {"ok": False, "error": f"bad request: {e}"}
+            except Exception as e:
+                # every request gets an answer, or its client would wait forever
+                response = {"ok": False, "error": f"request failed: {type(e).__name__}: {e}"}
+            response["id"] = request.get("id") if isinstance(request, dict) else None
+            writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            slots.release()
+
+    #  Requests
+    async def handle(self, request):
+        # average time complexity: O(1) for game ops, plus the advisor for "advise"
+        self.requests += 1
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "metrics":
+            if request.get("format") == "prometheus":
+                return {"ok": True, "metrics": metrics.REGISTRY.to_prometheus()}
+            return {"ok": True, "metrics": metrics.REGISTRY.snapshot(),
+                    "advisor_cache": self.advisor.stats()}
+        if op == "new":
+            return self._new_session(request)
+
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            return {"ok": False, "error": "unknown or expired session"}
+        session.last_used = time.monotonic()
+        async with session.lock:
+            game = session.game
+            if op == "state":
+                return {"ok": True, "state": session.state()}
+            if op == "travel":
+                message = game.travel(str(request.get("city", "")))
+            elif op in ("buy", "sell"):
+                good = str(request.get("good", ""))
+                qty = request.get("qty")
+                if type(qty) is not int or qty <= 0:
+                    return {"ok": False, "error": "qty must be a positive integer"}
+                message = getattr(game, op)(good, qty)
+            elif op == "batch":
+                commands = request.get("commands")
+                if not isinstance(commands, list) or not all(isinstance(c, list) for c in commands):
+                    return {"ok": False, "error": "commands must be a list of lists"}
+                applied, codes = game.execute(commands)
+                return {"ok": True, "applied": applied, "codes": [code.name for code in codes],
+                        "state": session.state()}
+            elif op == "advise":
+                return await self._advise(session)
+            elif op == "close":
+                self.sessions.pop(request["session"], None)
+                return {"ok": True, "state": session.state()}
+            else:
+                return {"ok": False, "error": f"unknown op {op!r}"}
+            return {"ok": True, "message": message, "state": session.state()}
+
+    def _new_session(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            return {"ok": False, "error": "server full, try again later"}
+        start = request.get("start") or next(iter(self.cities))
+        if start not in self.cities:
+            return {"ok": False, "error": f"unknown city {start!r}"}
+        player = Player(start, fuel=self.fuel, money=self.money)
+        session = Session(Game(self.graph, self.cities, player))
+        sid = secrets.token_hex(8)
+        self.sessions[sid] = session
+        return {"ok": True, "session": sid, "state": session.state()}
+
+    async def _advise(self, session):
+        # Runs the shared advisor cache in the default thread pool; at most
+        # max_advice at once. Sessions in the same city with similar fuel share answers.
+        player = session.game.player
+        loop = asyncio.get_running_loop()
+        async with self._advice:
+            city, good, margin = await loop.run_in_executor(
+                None, self.advisor.suggest, player.location, player.fuel)
+        return {"ok": True, "advice": {"city": city, "good": good, "margin": margin}}
+
+
+async def serve(world_path=WORLD_PATH, host="127.0.0.1", port=8765, unix_path=None, **options):
+    graph, cities, _ = load_world(world_path)
+    server = TraderServer(graph, cities, **options)
+    listener = await server.start(host, port, unix_path)
+    where = unix_path or f"{host}:{port}"
+    print(f"City Trader server listening on {where} ({len(cities)} cities)", flush=True)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the City Trader game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--world", default=str(WORLD_PATH))
+    parser.add_argument("--max-sessions", type=int, default=100000)
+    parser.add_argument("--idle-timeout", type=float, default=600.0)
+    args = parser.parse_args(argv)
+    metrics.configure_from_env()
+    try:
+        asyncio.run(serve(args.world, args.host, args.port, args.unix,
+                          max_sessions=args.max_sessions, idle_timeout=args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Headless batch simulation: plays many games with a policy across a process pool.
+# Run with: python -m city_trader.simulate --games 100000 --policy greedy
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from city_trader.player import Player
+from city_trader.game import Game
+from city_trader.optimizer import AdvisorCache
+from city_trader.world import WORLD_PATH, load_world
+
+# (graph, cities) shared by every game in this process. The parent fills it
+# before starting the pool, so forked workers inherit it copy-on-write.
+_WORLD = None
+# Advisor cache of this process, rebuilt when games move to another world
+_ADVISOR = None
+
+
+def _advisor(game):
+    global _ADVISOR
+    if _ADVISOR is None or _ADVISOR.graph is not game.graph or _ADVISOR.cities is not game.cities:
+        _ADVISOR = AdvisorCache(game.graph, game.cities, game.market)
+    return _ADVISOR
+
+
+def _max_buy(game, good):
+    # Most units of `good` the player can pay for here: along the market's price
+    # curve when there is one, else at the listed price.
+    player = game.player
+    if game.market is not None:
+        return game.market.affordable(player.location, good, player.money)[0]
+    price = game.cities[player.location].goods[good]
+    return player.money // price if price > 0 else 0
+
+
+#  Policies 
+# A policy factory returns a fresh callable per game. The callable gets
+# (game, rng) and returns ("travel", city), ("buy", good, qty),
+# ("sell", good, qty) or None to end the game.
+
+def random_policy():
+    def act(game, rng):
+        player = game.player
+        roll = rng.random()
+        if roll < 0.5:
+            options = [c for c, cost in game.graph.neighbors(player.location) if cost <= player.fuel]
+            return ("travel", rng.choice(options)) if options else None
+        goods = game.cities[player.location].goods
+        if roll < 0.75 and goods:
+            good = rng.choice(list(goods))
+            qty = _max_buy(game, good)
+            return ("buy", good, rng.randint(1, qty)) if qty > 0 else ("noop",)
+        held = [good for good, qty in player.inventory.items() if qty > 0]
+        if held:
+            good = rng.choice(held)
+            return ("sell", good, player.inventory[good])
+        return ("noop",)
+    return act
+
+
+def greedy_policy():
+    # Follow suggest_best_move: buy as much as cash allows, drive there, sell.
+    pending = []
+
+    def act(game, rng):
+        if pending:
+            return pending.pop(0)
+        player = game.player
+        here = player.location
+        city, good, _ = _advisor(game).suggest(here, player.fuel)
+        if not city:
+            return None
+        qty = _max_buy(game, good)
+        if qty <= 0:
+            return None
+        route = game.graph.path(here, city)
+        pending.extend(("travel", stop) for stop in route[1:])
+        pending.append(("sell", good, qty))
+        return ("buy", good, qty)
+    return act
+
+
+class ScriptedPolicy:
+    # Replays a fixed action list; a class (not a closure) so it pickles to workers.
+    def __init__(self, actions):
+        self.actions = list(actions)
+
+    def __call__(self):
+        queue = list(self.actions)
+
+        def act(game, rng):
+            return queue.pop(0) if queue else None
+        return act
+
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy}
+
+
+def play_game(graph, cities, policy, seed=0, start=None, fuel=100, money=500, max_steps=200):
+    # Let S = steps played, P = cost of one policy call
+    # Average and worst case time complexity: O(S·P)
+    rng = random.Random(seed)
+    if start is None:
+        start = rng.choice(list(cities))
+    player = Player(start, fuel=fuel, money=money)
+    game = Game(graph, cities, player)
+    act = policy()
+    steps = 0
+    while steps < max_steps:
+        action = act(game, rng)
+        if action is None:
+            break
+        kind = action[0]
+        if kind == "travel":
+            game.travel(action[1])
+        elif kind == "buy":
+            game.buy(action[1], action[2])
+        elif kind == "sell":
+            game.sell(action[1], action[2])
+        steps += 1
+    return game.profit(), steps, fuel - player.fuel
+
+
+class Stats:
+    # Running count/mean/stddev/min/max for profit, steps and fuel used.
+    # Small and picklable so workers can ship one per chunk.
+    FIELDS = ("profit", "steps", "fuel_used")
+
+    def __init__(self):
+        # average and worst case time complexity: O(1)
+        self.count = 0
+        self.total = [0.0] * 3
+        self.total_sq = [0.0] * 3
+        self.low = [math.inf] * 3
+        self.high = [-math.inf] * 3
+
+    def add(self, result):
+        # average and worst case time complexity: O(1)
+        self.count += 1
+        for i, value in enumerate(result):
+            self.total[i] += value
+            self.total_sq[i] += value * value
+            if value < self.low[i]:
+                self.low[i] = value
+            if value > self.high[i]:
+                self.high[i] = value
+
+    def merge(self, other):
+        # average and worst case time complexity: O(1)
+        self.count += other.count
+        for i in range(3):
+            self.total[i] += other.total[i]
+            self.total_sq[i] += other.total_sq[i]
+            self.low[i] = min(self.low[i], other.low[i])
+            self.high[i] = max(self.high[i], other.high[i])
+
+    def as_dict(self):
+        # average and worst case time complexity: O(1)
+        out = {"games": self.count}
+        for i, name in enumerate(self.FIELDS):
+            if not self.count:
+                break
+            mean = self.total[i] / self.count
+            var = max(0.0, self.total_sq[i] / self.count - mean * mean)
+            out[name] = {"mean": mean, "std": math.sqrt(var),
+                         "min": self.low[i], "max": self.high[i]}
+        return out
+
+
+def _init_worker(world_path):
+    # Only used when the pool cannot fork (e.g. spawn on Windows/macOS).
+    global _WORLD
+    if _WORLD is None:
+        _WORLD = load_world(world_path)[:2]
+
+
+def _run_chunk(policy, first_seed, count, options):
+    graph, cities = _WORLD
+    if isinstance(policy, str):
+        policy = POLICIES[policy]
+    stats = Stats()
+    for seed in range(first_seed, first_seed + count):
+        stats.add(play_game(graph, cities, policy, seed=seed, **options))
+    return stats
+
+
+def iter_batch(n_games, policy="greedy", workers=None, chunk_size=500,
+               world_path=WORLD_PATH, seed=0, **options):
+    # Yields the running Stats after every finished chunk.
+    # Let N = number of games, W = workers
+    # Average and worst case time complexity: O(N·S·P / W)
+    global _WORLD
+    _WORLD = load_world(world_path)[:2]
+    workers = workers or os.cpu_count() or 1
+    chunks = [(seed + i, min(chunk_size, n_games - i)) for i in range(0, n_games, chunk_size)]
+    stats = Stats()
+
+    if workers == 1:
+        for first, count in chunks:
+            stats.merge(_run_chunk(policy, first, count, options))
+            yield stats
+        return
+
+    method = "fork" if "fork" in mp.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method),
+                             initializer=_init_worker, initargs=(str(world_path),)) as pool:
+        futures = [pool.submit(_run_chunk, policy, first, count, options) for first, count in chunks]
+        for future in as_completed(futures):
+            stats.merge(future.result())
+            yield stats
+
+
+def run_batch(n_games, policy="greedy", **kwargs):
+    # Runs the whole batch and returns the final Stats.
+    stats = Stats()
+    for stats in iter_batch(n_games, policy, **kwargs):
+        pass
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run City Trader games headlessly.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--max-steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--world", default=str(WORLD_PATH))
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = Stats()
+    for stats in iter_batch(args.games, args.policy, workers=args.workers,
+                            chunk_size=args.chunk_size, world_path=args.world,
+                            seed=args.seed, max_steps=args.max_steps):
+        elapsed = time.perf_counter() - started
+        print(json.dumps({"games": stats.count, "elapsed": round(elapsed, 3),
+                          "games_per_min": round(stats.count / elapsed * 60)}), flush=True)
+    print(json.dumps(stats.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# Binary, memory-mapped world snapshots.
+#
+# compile_snapshot() turns a world file into one binary file: a header page,
+# a string table, the CSR road arrays of CompactGraph and a dense city x good
+# price matrix, every section starting on a page boundary. open_world() maps
+# that file read-only and builds a CompactGraph and City objects whose arrays
+# are memoryviews straight into the mapping, so nothing is parsed or copied
+# and processes opening the same snapshot share its physical pages.
+#
+# The header records the size, modification time and CRC-32 of the source
+# world file; a snapshot that no longer matches its source (or this format
+# version) is rebuilt. The source is only read and checksummed when its size
+# matches but its modification time does not. The load report (record counts
+# and skipped records) is stored too, so a fresh snapshot reports the same
+# errors as the load that compiled it.
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+
+from city_trader.city import City
+from city_trader.compact_graph import CompactGraph
+
+MAGIC = b"CTSNAP\0\0"
+FORMAT_VERSION = 2
+PAGE = 4096
+MISSING_INT = -2 ** 63   # "not sold here" in an int64 price matrix (NaN for float64)
+
+# magic, version, little-endian flag, source size, source crc32, source mtime
+# (ns), cities in graph, road entries, strings, market cities, goods,
+# cost typecode, price typecode, then (offset, length) for each section
+_HEADER = struct.Struct("<8sIIQIQQQQQQcc")
+_SECTIONS = ("strings", "string_offsets", "offsets", "targets", "costs",
+             "market", "goods", "prices", "report")
+_SECTION = struct.Struct("<QQ")
+
+
+def snapshot_path(source):
+    # world.json -> world.snap
+    return Path(source).with_suffix(".snap")
+
+
+def source_fingerprint(source):
+    # Average and worst case time complexity: O(file size)
+    data = Path(source).read_bytes()
+    return len(data), zlib.crc32(data)
+
+
+def compile_snapshot(source, target=None):
+    # Let V = cities, E = roads, C = market cities, G = goods
+    # Average and worst case time complexity: O(V + E log d + C·G)
+    # Returns the LoadReport of parsing the source world.
+    from city_trader.world import load_world
+
+    target = Path(target) if target else snapshot_path(source)
+    mtime = Path(source).stat().st_mtime_ns   # before reading: a later write changes it
+    size, crc = source_fingerprint(source)
+    graph, cities, report = load_world(source, snapshot=False)
+    cg = CompactGraph.from_graph(graph)
+
+    names = list(cg.names)
+    index = {name: i for i, name in enumerate(names)}
+    for name in cities:
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+    goods = sorted({good for city in cities.values() for good in city.goods})
+    strings = names + goods
+
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = array('Q', [0])
+    for b in encoded:
+        string_offsets.append(string_offsets[-1] + len(b))
+
+    market = array('i', [index[name] for name in cities])
+    good_ids = array('i', range(len(names), len(strings)))
+    values = [city.goods.get(good) for city in cities.values() for good in goods]
+    integral = all(v is None or float(v).is_integer() for v in values)
+    if integral:
+        prices = array('q', [MISSING_INT if v is None else int(v) for v in values])
+    else:
+        prices = array('d', [float('nan') if v is None else float(v) for v in values])
+
+    summary = {"records": report.records, "cities": report.cities, "roads": report.roads,
+               "errors": report.errors}
+
+    sections = [b"".join(encoded), string_offsets, cg.offsets, cg.targets, cg.costs,
+                market, good_ids, prices, json.dumps(summary).encode("utf-8")]
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, sys.byteorder == "little", size, crc, mtime,
+                          len(cg.names), len(cg.targets), len(strings), len(market),
+                          len(goods), cg.costs.typecode.encode(), prices.typecode.encode())
+
+    blobs = [s if isinstance(s, bytes) else s.tobytes() for s in sections]
+    table = []
+    offset = PAGE
+    for blob in blobs:
+        table.append((offset, len(blob)))
+        offset += _page_round(len(blob))
+
+    tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+    with tmp.open("wb") as f:
+        f.write(header + b"".join(_SECTION.pack(o, n) for o, n in table))
+        for (o, _), blob in zip(table, blobs):
+            f.seek(o)
+            f.write(blob)
+        f.truncate(offset)
+    os.replace(tmp, target)   # readers never see a half-written snapshot
+    return report
+
+
+def _page_round(n):
+    return -(-max(n, 1) // PAGE) * PAGE
+
+
+def read_header(path):
+    # Average and worst case time complexity: O(1)
+    with Path(path).open("rb") as f:
+        raw = f.read(_HEADER.size + _SECTION.size * len(_SECTIONS))
+    if len(raw) < _HEADER.size or not raw.startswith(MAGIC):
+        return None
+    fields = _HEADER.unpack_from(raw)
+    sections = [_SECTION.unpack_from(raw, _HEADER.size + i * _SECTION.size)
+                for i in range(len(_SECTIONS))]
+    return fields, dict(zip(_SECTIONS, sections))
+
+
+def is_fresh(source, target=None):
+    # True if the snapshot exists, has this format version and matches the source.
+    # Average-case time complexity: O(1) (two stats); O(file size) to checksum
+    # a source whose modification time changed but whose size did not
+    target = Path(target) if target else snapshot_path(source)
+    if not target.exists():
+        return False
+    header = read_header(target)
+    if header is None:
+        return False
+    fields, _ = header
+    _, version, little, size, crc, mtime = fields[:6]
+    if version != FORMAT_VERSION or bool(little) != (sys.byteorder == "little"):
+        return False
+    stat = Path(source).stat()
+    if stat.st_size != size:
+        return False
+    return stat.st_mtime_ns == mtime or source_fingerprint(source) == (size, crc)
+
+
+class Snapshot:
+    # An open, memory-mapped snapshot. graph and cities are views into it.
+    def __init__(self, path):
+        # Let S = number of strings
+        # Average and worst case time complexity: O(S) (names become str objects)
+        self.path = Path(path)
+        header = read_header(self.path)
+        if header is None:
+            raise ValueError(f"{self.path} is not a City Trader snapshot")
+        fields, sections = header
+        (_, version, _, _, _, _, n_graph, _, n_strings, n_market, n_goods,
+         cost_type, price_type) = fields
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has snapshot format {version}, expected {FORMAT_VERSION}")
+
+        with self.path.open("rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+
+        def section(name, typecode=None):
+            offset, length = sections[name]
+            mv = view[offset:offset + length]
+            return mv.cast(typecode) if typecode else mv
+
+        blob = section("strings")
+        bounds = section("string_offsets", 'Q')
+        strings = [str(blob[bounds[i]:bounds[i + 1]], "utf-8") for i in range(n_strings)]
+
+        self.graph = CompactGraph(strings[:n_graph], section("offsets", 'q'),
+                                  section("targets", 'i'), section("costs", cost_type.decode()))
+        goods = [strings[i] for i in section("goods", 'i')]
+        good_index = {good: j for j, good in enumerate(goods)}
+        prices = section("prices", price_type.decode())
+        self.cities = {}
+        for row, i in enumerate(section("market", 'i')):
+            name = strings[i]
+            goods_view = PriceRow(prices, row * n_goods, goods, good_index)
+            self.cities[name] = City(name, goods_view)
+        # {"records", "cities", "roads", "errors"} of the load that compiled it
+        self.report = json.loads(str(section("report"), "utf-8"))
+
+
+class PriceRow(Mapping):
+    # One city's goods table (good -> price) read from the shared price matrix.
+    def __init__(self, prices, start, goods, good_index):
+        self._prices = prices
+        self._start = start
+        self._goods = goods
+        self._index = good_index
+
+    def _value(self, j):
+        v = self._prices[self._start + j]
+        return None if v == MISSING_INT or v != v else v
+
+    def __getitem__(self, good):
+        # Average and worst case time complexity: O(1)
+        j = self._index.get(good)
+        v = None if j is None else self._value(j)
+        if v is None:
+            raise KeyError(good)
+        return v
+
+    def __iter__(self):
+        # Average and worst case time complexity: O(G)
+        return (good for j, good in enumerate(self._goods) if self._value(j) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def open_world(source, target=None):
+    # Map the snapshot for a world file, (re)compiling it first when it is missing
+    # or stale. Returns (graph, cities, report); when the snapshot was already up
+    # to date the report is the one stored in it.
+    from city_trader.world import LoadReport
+
+    target = Path(target) if target else snapshot_path(source)
+    report = None
+    if not is_fresh(source, target):
+        report = compile_snapshot(source, target)
+    snap = Snapshot(target)
+    if report is None:
+        report = LoadReport(source)
+        report.records = snap.report["records"]
+        report.cities = snap.report["cities"]
+        report.roads = snap.report["roads"]
+        report.errors = [tuple(error) for error in snap.report["errors"]]
+    return snap.graph, snap.cities, report
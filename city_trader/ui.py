@@ -1,54 +1,62 @@
-from game2dboard import Board
-from tkinter import simpledialog, Tk
-from pathlib import Path
-import json
 import math
 import random
-import os
 import sys
 
 from city_trader.graph import Graph
 from city_trader.city import City
 from city_trader.player import Player
 from city_trader.game import Game
-from city_trader.optimizer import suggest_best_move
+from city_trader.optimizer import AdvisorCache
+from city_trader.planner import plan_route
+from city_trader.cargo import best_cargo
+from city_trader.prices import PriceView, FILTERS
+from city_trader.world import WORLD_PATH, load_world
+from city_trader import metrics
 
-# loading the world data 
-world_path = Path(__file__).parent / "data" / "world.json"
-try:
-    world = json.loads(world_path.read_text(encoding="utf-8"))
-except Exception:
-    world = {"cities": {}, "roads": []}
+# game2dboard and tkinter are only imported once a board is actually built,
+# and NumPy (market, map layout) once a TraderApp needs it, so this module
+# can be imported headless and cheaply (tests, tools, benchmarks).
 
-g = Graph()
-for road in world.get("roads", []):
-    try:
-        a, b, cost = road
-        g.add_road(a, b, cost)
-    except Exception:
-        continue
+MIN_CELL = 16
+MAX_CELL = 96
+HISTORY_LINES = 40   # most recent actions listed by the H key
+PRICE_ROWS = 20      # cities per page of the price table
+
+CONTROLS = (
+    "Click a [>] city to travel.\n\n"
+    "Controls:\n"
+    "  P - Show prices (N/U next/previous page, F filter, G good, O sort)\n"
+    "  B - Buy items\n"
+    "  S - Sell items\n"
+    "  A - Ask AI for trade advice\n"
+    "  H - Show travel history\n"
+    "  Arrows - Scroll map, Z/X - Zoom in/out, C - Center on you\n"
+    "  I - View inventory\n"
+    "  ENTER - Back to map\n"
+    "  Q - Quit\n"
+)
 
-cities = {name: City(name, goods) for name, goods in world.get("cities", {}).items()}
-start_city = random.choice(list(cities.keys())) if cities else "Paris"
-player = Player(start_city, fuel=100, money=500)
-game = Game(g, cities, player)
 
 #  Grid sizing (decide rows/cols before Board)
-n = max(1, len(cities))
-# place cities in a compact grid determined by number of cities
-grid_side = math.ceil(math.sqrt(n))
-grid_rows = max(6, min(12, grid_side + 1))          # keep rows small but >=6
-grid_cols = max(10, min(28, grid_side * 2))         # wider grid for labels
-
-# reduce total cells if there are very few cities to make cells larger
-if n <= 4:
-    grid_rows = max(6, 6)
-    grid_cols = max(8, 8)
-elif n <= 9:
-    grid_rows = max(6, 7)
-    grid_cols = max(10, 10)
-
-# Layout helper (must exist before Board) 
+def grid_size(n_cities):
+    # Average and worst case time complexity: O(1)
+    n = max(1, n_cities)
+    # place cities in a compact grid determined by number of cities
+    grid_side = math.ceil(math.sqrt(n))
+    grid_rows = max(6, min(12, grid_side + 1))          # keep rows small but >=6
+    grid_cols = max(10, min(28, grid_side * 2))         # wider grid for labels
+
+    # reduce total cells if there are very few cities to make cells larger
+    if n <= 4:
+        grid_rows = max(6, 6)
+        grid_cols = max(8, 8)
+    elif n <= 9:
+        grid_rows = max(6, 7)
+        grid_cols = max(10, 10)
+    return grid_rows, grid_cols
+
+
+# Layout helper (must exist before Board)
 def compute_positions_fixed(graph: Graph, rows: int, cols: int):
     # Deterministic even grid placement: spreads N nodes across rows/cols so all are visible.S
     nodes = list(getattr(graph, "cities", {}).keys())
@@ -73,317 +81,487 @@ def compute_positions_fixed(graph: Graph, rows: int, cols: int):
         positions[name] = (min(rows - 2, max(1, r)), min(cols - 2, max(1, c)))
     return positions
 
-# Board (compute cell_size to maximize size but fit screen)
-board = Board(grid_rows, grid_cols)
-_original_cell_size = getattr(board, "cell_size", 35)
-_original_margin = getattr(board, "margin", 10)
 
-MIN_CELL = 16
-MAX_CELL = 96
+def _market(cities):
+    # Live market prices, or None (fixed prices) when NumPy is not installed.
+    try:
+        from city_trader.market import Market
+    except ImportError:
+        return None
+    return Market(cities)
 
-try:
-    _root_tmp = Tk()
-    sw, sh = _root_tmp.winfo_screenwidth(), _root_tmp.winfo_screenheight()
-    _root_tmp.destroy()
-    usable_w = max(300, sw - 160)
-    usable_h = max(240, sh - 200)
-    # compute largest cell that fits both directions
-    cell_w = usable_w // (board.ncols + 2)
-    cell_h = usable_h // (board.nrows + 4)
-    cell_size = max(MIN_CELL, min(MAX_CELL, min(cell_w, cell_h)))
-    board.cell_size = cell_size
-    board.margin = max(4, int(cell_size // 6))
-except Exception:
-    board.cell_size = _original_cell_size
-    board.margin = _original_margin
-
-board.title = "City Trader (Board Game)"
-board.create_output(background="white")
-board.output = board.print
-
-POS = compute_positions_fixed(g, board.nrows, board.ncols)
-
-# Game state
-_game_over = False
-
-# Helpers
-def _clear():
-    # Average and worst case time complexity : O(R · C)
-    for r in range(board.nrows):
-        for c in range(board.ncols):
-            board[r][c] = ""
-
-def neighbors(city):
-    # Average case time complexity: O(k)
-    # Worst case time complexity: O(k) (and k ≤ number of cities)
-    return set(g.cities.get(city, {}).keys())
-
-def neighbor_text(city):
-    # Average and worst case time complexity: O(k)
-    return ", ".join(f"{n} ({g.cities[city][n]} fuel)" for n in g.cities.get(city, {})) or "(none)"
-
-def get_input(prompt):
-    # Average and worst case time complexity: O(L)
+
+def _viewport(graph, world_path, rows, cols):
+    # Road-aware scrollable map, or None (fixed grid) when NumPy is not installed.
     try:
-        val = simpledialog.askstring("City Trader", prompt)
-        return val.strip() if val else None
-    except Exception:
+        from city_trader.layout import MapLayout, Viewport
+    except ImportError:
         return None
+    return Viewport(MapLayout.for_world(graph, world_path, rows, cols), rows, cols)
+
+
+def _tk_board(rows, cols):
+    # Real game2dboard window, sized to fit the screen using the board's own Tk root.
+    from game2dboard import Board
 
-def check_game_over():
-    # Let d = degree of the current city (number of neighbors)
-    # Average-case time complexity: O(d)
-    # Worst-case time complexity: O(d)
-    # Check if player can reach any connected city. If not, end game.
-    global _game_over
-    here = game.player.location
-    reach = neighbors(here)
-    can_travel = False
-    for city in reach:
-        fuel_cost = g.cities[here].get(city, float('inf'))
-        if fuel_cost <= game.player.fuel:
-            can_travel = True
-            break
-    if not can_travel:
-        _game_over = True
-        end_game()
-
-def end_game():
-    # Let H be the number of actions in history
-    # Average-case time complexity: O(H)
-    # Worst-case time complexity: O(H)
-    # Display game over screen with history and final profit.
-    _clear()
-    board.output("GAME OVER - Out of fuel!\n")
+    board = Board(rows, cols)
+    _original_cell_size = getattr(board, "cell_size", 35)
+    _original_margin = getattr(board, "margin", 10)
     try:
-        node = game.history.head
-        lines = ["Your Journey:"]
-        i = 1
-        while node:
-            lines.append(f"{i}. {node.action}: {node.details}")
-            node = node.next
-            i += 1
-        lines.append(f"\nFinal Profit: ${game.profit()}")
-        lines.append("Thanks for playing!")
-        board.output("\n".join(lines))
+        root = board._root
+        sw, sh = root.winfo_screenwidth(), root.winfo_screenheight()
+        usable_w = max(300, sw - 160)
+        usable_h = max(240, sh - 200)
+        # compute largest cell that fits both directions
+        cell_w = usable_w // (board.ncols + 2)
+        cell_h = usable_h // (board.nrows + 4)
+        cell_size = max(MIN_CELL, min(MAX_CELL, min(cell_w, cell_h)))
+        board.cell_size = cell_size
+        board.margin = max(4, int(cell_size // 6))
     except Exception:
-        board.output(f"Final Profit: ${game.profit()}\nThanks for playing!")
-
-#  Display 
-def draw_world(message=None):
-    # Let N be the number of cities
-    # Average-case time complexity: O(N)
-    # Worst-case time complexity: O(N)
-
-    if _game_over:
-        return
-    
-    _clear()
-    here = game.player.location
-    reach = neighbors(here)
-    for name, (r, c) in POS.items():
-        if name == here:
-            board[r][c] = f"[P]{name}"
-        elif name in reach:
-            board[r][c] = f"[>]{name}"
+        board.cell_size = _original_cell_size
+        board.margin = _original_margin
+    return board
+
+
+class TraderApp:
+    # The board game: one Game, one lazily built board, and the event handlers.
+    # board_factory(rows, cols) may supply any object with game2dboard's Board
+    # interface (nrows, ncols, board[r][c], create_output, print, show, stop).
+    # layout is "auto" (road-aware, scrollable map when NumPy is available) or
+    # "fixed" (the evenly spaced grid).
+    def __init__(self, world_path=WORLD_PATH, start_city=None, board_factory=None, world=None,
+                 layout="auto"):
+        # world may be an already built (graph, cities) pair instead of a file.
+        # Let R = number of world records
+        # Average and worst case time complexity: O(R)
+        load_report = None
+        if world is not None:
+            self.graph, self.cities = world
         else:
-            board[r][c] = f"[C]{name}"
-
-    info = (
-        f"\nYou are in {here}\n"
-        f"Money: ${game.player.money} | Fuel: {game.player.fuel}\n"
-        f"Connected cities: {neighbor_text(here)}\n"
-        "Click a [>] city to travel.\n\n"
-        "Controls:\n"
-        "  P - Show prices\n"
-        "  B - Buy items\n"
-        "  S - Sell items\n"
-        "  A - Ask AI for trade advice\n"
-        "  H - Show travel history\n"
-        "  I - View inventory\n"
-        "  ENTER - Back to map\n"
-        "  Q - Quit\n"
-    )
-    if message:
-        info += "\n" + message
-    board.output(info)
-
-#  Gameplay displays 
-def show_prices():
-    # Let C = number of cities, G = total unique goods
-    # Average-case time complexity: O(C·G)
-    # Worst-case time complexity: O(C·G)
-
-    goods = sorted({g for c in cities.values() for g in c.goods})
-    lines = ["\nMarket Prices:"]
-    header = "City".ljust(14) + "".join(g[:10].rjust(10) for g in goods)
-    lines.append(header)
-    lines.append("-" * len(header))
-    for name in sorted(cities):
-        row = name.ljust(14)
-        for good in goods:
-            val = str(cities[name].goods.get(good, "-")).rjust(10)
-            row += val
-        lines.append(row)
-    lines.append("\nPress ENTER to return to the main map.")
-    board.output("\n".join(lines))
-
-def show_history():
-    # Let H be the number of actions in history
-    # Average-case time complexity: O(H)
-    # Worst-case time complexity: O(H)
+            try:
+                self.graph, self.cities, load_report = load_world(world_path)
+            except (OSError, ValueError) as e:
+                print(f"Could not load world: {e}", file=sys.stderr)
+                self.graph, self.cities = Graph(), {}
+        if load_report:
+            for record, message in load_report.errors:
+                print(f"Skipped world record {record}: {message}", file=sys.stderr)
+
+        if start_city is None:
+            start_city = random.choice(list(self.cities.keys())) if self.cities else "Paris"
+        self.player = Player(start_city, fuel=100, money=500)
+        self.market = _market(self.cities)
+        self.game = Game(self.graph, self.cities, self.player, self.market)
+        self.prices = PriceView(self.cities, self.market, page_size=PRICE_ROWS)
+        self.advisor = AdvisorCache(self.graph, self.cities, self.market)
+        self.price_options = {"filter": "all", "good": None, "sort": "name"}
+        self.price_page = 0
+
+        self.rows, self.cols = grid_size(len(self.cities))
+        self._board_factory = board_factory or _tk_board
+        self._board = None
+        self._world_path = None if world is not None else world_path
+        self.layout_mode = layout     # becomes "fixed" without NumPy
+        self.view = None      # Viewport onto the map layout, None for the fixed grid
+        self.pos = {}
+        self.game_over = False
+        # render cache: what each board cell shows, which city owns each cell,
+        # the (location, neighbors, graph version) last drawn, and the info panel
+        self._cells = {}
+        self._owner = {}
+        self._drawn = None
+        self._info_key = None
+        self._info = ""
+
+    @property
+    def board(self):
+        # Built on first use. Average and worst case time complexity: O(R·C) once
+        if self._board is None:
+            board = self._board_factory(self.rows, self.cols)
+            board.title = "City Trader (Board Game)"
+            board.create_output(background="white")
+            board.output = board.print
+            if self.layout_mode == "auto" and self.graph.cities:
+                self.view = _viewport(self.graph, self._world_path, board.nrows, board.ncols)
+                if self.view is None:
+                    self.layout_mode = "fixed"
+            if self.view is not None:
+                self.view.center_on(self.player.location)
+                self.pos, self._owner = {}, {}    # filled by draw_world
+            else:
+                self.pos = compute_positions_fixed(self.graph, board.nrows, board.ncols)
+                # several cities can share a cell on crowded maps; the last one wins
+                self._owner = {pos: name for name, pos in self.pos.items()}
+            self._cells = {}
+            self._drawn = None
+            board.on_mouse_click = self.click_city
+            board.on_key_press = self.on_key
+            self._board = board
+        return self._board
+
+    def run(self):
+        # Start
+        self.draw_world("Welcome! Click a [>] city to travel or use keys below.")
+        self.board.show()
+
+    # Helpers
+    def _clear(self):
+        # Average and worst case time complexity : O(R · C)
+        board = self.board
+        for r in range(board.nrows):
+            for c in range(board.ncols):
+                board[r][c] = ""
+        self._cells.clear()
+        self._drawn = None
+
+    def neighbors(self, city):
+        # Average case time complexity: O(k)
+        # Worst case time complexity: O(k) (and k ≤ number of cities)
+        return set(self.graph.cities.get(city, {}).keys())
+
+    def neighbor_text(self, city):
+        # Average and worst case time complexity: O(k)
+        roads = self.graph.cities.get(city, {})
+        return ", ".join(f"{n} ({roads[n]} fuel)" for n in roads) or "(none)"
+
+    def get_input(self, prompt):
+        # Average and worst case time complexity: O(L)
+        try:
+            from tkinter import simpledialog
+            val = simpledialog.askstring("City Trader", prompt)
+            return val.strip() if val else None
+        except Exception:
+            return None
+
+    def check_game_over(self):
+        # Let d = degree of the current city (number of neighbors)
+        # Average-case time complexity: O(d)
+        # Worst-case time complexity: O(d)
+        # Check if player can reach any connected city. If not, end game.
+        here = self.player.location
+        roads = self.graph.cities.get(here, {})
+        can_travel = any(roads.get(city, float('inf')) <= self.player.fuel
+                         for city in self.neighbors(here))
+        if not can_travel:
+            self.game_over = True
+            self.end_game()
+
+    def end_game(self):
+        # Let H be the number of actions in history
+        # Average-case time complexity: O(H)
+        # Worst-case time complexity: O(H)
+        # Display game over screen with history and final profit.
+        self._clear()
+        self.board.output("GAME OVER - Out of fuel!\n")
+        try:
+            node = self.game.history.head
+            lines = ["Your Journey:"]
+            i = 1
+            while node:
+                lines.append(f"{i}. {node.action}: {node.details}")
+                node = node.next
+                i += 1
+            lines.append(f"\nFinal Profit: ${self.game.profit()}")
+            lines.append("Thanks for playing!")
+            self.board.output("\n".join(lines))
+        except Exception:
+            self.board.output(f"Final Profit: ${self.game.profit()}\nThanks for playing!")
+
+    #  Display
+    @metrics.timed("ui.draw_world")
+    def draw_world(self, message=None):
+        # Only cells whose label can have changed are rewritten: the old and new
+        # location and the cities entering or leaving the neighbor set. Scrolling,
+        # zooming, a zoomed-out map or a move off screen (which re-centers the
+        # window) re-reads the R x C visible cells instead.
+        # Let d = degree of the old and new location, N = number of cities
+        # Average-case time complexity: O(d) for a move within the window at zoom
+        # level 0, O(R·C + d) otherwise (R·C is bounded by the board, not by N)
+        # Worst-case time complexity: O(R·C + N) for the first draw or after a road change
+
+        if self.game_over:
+            return
 
-    try:
-        node = game.history.head
-        lines = ["\nYour Journey:"]
-        i = 1
-        while node:
-            lines.append(f"{i}. {node.action}: {node.details}")
-            node = node.next
-            i += 1
-        lines.append("\nPress ENTER to return.")
-        board.output("\n".join(lines))
-    except Exception:
-        board.output("No history available.")
-
-def show_inventory():
-    # Let I be the number of distinct items in the inventory
-    # Average-case time complexity: O(I)
-    # Worst-case time complexity: O(I)
-
-    inv = getattr(game.player, "inventory", {}) or {}
-    lines = ["\nYour Inventory:"]
-    if not inv:
-        lines.append("  (Empty)")
-    else:
-        for k, v in inv.items():
-            lines.append(f"  - {k}: {v}")
-    lines.append("\nPress ENTER to return.")
-    board.output("\n".join(lines))
-
-#  Interaction 
-def click_city(button, r, c):
-    # Let N be the number of cities, d be degree of current city
-    # Average-case time complexity: O(N + d)
-    # Worst-case time complexity: O(N + d)
-    #   (scan POS for clicked city, then possibly scan neighbors for fuel check)
-    global _game_over
-    if _game_over:
-        return
-    here = game.player.location
-    for name, pos in POS.items():
-        if pos == (r, c):
+        board = self.board
+        here = self.player.location
+        reach = self.neighbors(here)
+        version = getattr(self.graph, "version", None)
+        view = self.view
+        drawn = self._drawn
+        window = None
+        if view is not None:
+            moved = drawn is None or drawn[0] != here
+            if moved and here in view.layout.pos and view.board_cell(here) is None:
+                view.center_on(here)    # follow the player, but let them scroll away
+            window = (view.level, view.top, view.left)
+        cells = self._cells
+        if (drawn is None or drawn[2] != version or drawn[3] != window
+                or (view is not None and view.level)):
+            if drawn is None:
+                self._clear()
+            if view is not None:
+                self._owner = view.visible([here, *reach])
+                self.pos = {name: at for at, name in self._owner.items()}
+                for at in [at for at in cells if at not in self._owner]:
+                    r, c = at
+                    board[r][c] = ""
+                    del cells[at]
+            dirty = self.pos
+        else:
+            old_here, old_reach, _, _ = drawn
+            dirty = (old_reach ^ reach) | {old_here, here}
+        self._drawn = (here, reach, version, window)
+
+        owner, pos = self._owner, self.pos
+        for name in dirty:
+            at = pos.get(name)
+            if at is None or owner[at] != name:
+                continue
             if name == here:
-                board.output("You are already here.")
-                return
-            if name not in g.cities.get(here, {}):
-                board.output("You cannot travel there directly.")
-                return
-            res = game.travel(name)
-            draw_world(res)
-            
-            # Only end game if travel failed AND player can't go anywhere
-            if "Not enough fuel" in res:
-                reach = neighbors(game.player.location)
-                can_travel = any(
-                    g.cities[game.player.location].get(c, float('inf')) <= game.player.fuel
-                    for c in reach
-                )
-                if not can_travel:
-                    _game_over = True
-                    end_game()
+                label = f"[P]{name}"
+            elif name in reach:
+                label = f"[>]{name}"
+            else:
+                label = f"[C]{name}"
+            if cells.get(at) != label:
+                r, c = at
+                board[r][c] = label
+                cells[at] = label
+
+        board.output(self.info_panel() + ("\n" + message if message else ""))
+
+    def info_panel(self):
+        # Rebuilt only when location, money, fuel or the roads change.
+        # Average-case time complexity: O(1) when cached, O(d) otherwise
+        player = self.player
+        key = (player.location, player.money, player.fuel, getattr(self.graph, "version", None))
+        if key != self._info_key:
+            self._info_key = key
+            self._info = (
+                f"\nYou are in {player.location}\n"
+                f"Money: ${player.money} | Fuel: {player.fuel}\n"
+                f"Connected cities: {self.neighbor_text(player.location)}\n"
+                + CONTROLS
+            )
+        return self._info
+
+    #  Gameplay displays
+    def show_prices(self, page=None):
+        # One page of the shared price view with the current filter options.
+        # Let P = PRICE_ROWS, G = goods shown
+        # Average-case time complexity: O(P·G), O(1) formatting when cached
+        # Worst-case time complexity: O(C·G) after prices change with a margin sort
+        if page is not None:
+            self.price_page = page
+        options = self.price_options
+        try:
+            table, self.price_page, pages = self.prices.lines(
+                self.price_page, "board", here=self.player.location, fuel=self.player.fuel,
+                graph=self.graph, **options)
+        except ValueError as e:
+            self.board.output(f"Cannot show prices: {e}")
             return
+        shown = f"filter {options['filter']}, sorted by {options['sort']}"
+        if options["good"]:
+            shown += f", only {options['good']}"
+        lines = [f"\nMarket Prices ({shown}):"] + table
+        lines.append("\nN/U next/previous page, F filter, G good, O sort")
+        lines.append("Press ENTER to return to the main map.")
+        self.board.output("\n".join(lines))
 
-board.on_mouse_click = click_city
-
-def on_key(k):
-    # on_key itself is O(1) per press, ignoring the cost of called helpers.
-    # The heaviest call it triggers is suggest_best_move, which is:
-    #   O((V + E) log V + V·G)  (same as earlier annotation)
-
-    global _game_over
-    if _game_over:
-        return
-    
-    k = k.lower()
-    if k == "p":
-        show_prices()
-    elif k == "b":
-        here = game.player.location
-        goods = cities.get(here, City(here, {})).goods
-        if not goods:
-            board.output("This city sells nothing.")
-            return
-        item = get_input(f"Available goods: {list(goods.keys())}\nEnter item to buy:")
-        if not item or item.lower() not in goods:
-            board.output("Invalid item.")
+    def show_history(self):
+        # Average and worst case time complexity: O(HISTORY_LINES)
+
+        try:
+            lines = ["\nYour Journey:"]
+            if len(self.game.history) > HISTORY_LINES:
+                lines.append(f"(last {HISTORY_LINES} of {len(self.game.history)} actions)")
+            lines.extend(self.game.history.show(last=HISTORY_LINES))
+            lines.append("\nPress ENTER to return.")
+            self.board.output("\n".join(lines))
+        except Exception:
+            self.board.output("No history available.")
+
+    def show_inventory(self):
+        # Let I be the number of distinct items in the inventory
+        # Average-case time complexity: O(I)
+        # Worst-case time complexity: O(I)
+
+        inv = getattr(self.player, "inventory", {}) or {}
+        lines = ["\nYour Inventory:"]
+        if not inv:
+            lines.append("  (Empty)")
+        else:
+            for k, v in inv.items():
+                lines.append(f"  - {k}: {v}")
+        lines.append("\nPress ENTER to return.")
+        self.board.output("\n".join(lines))
+
+    #  Interaction
+    def click_city(self, button, r, c):
+        # Let d be degree of current city
+        # Average-case time complexity: O(d)
+        # Worst-case time complexity: O(d)
+        #   (cell -> city lookup, then possibly scan neighbors for fuel check)
+        if self.game_over:
             return
-        qty_txt = get_input("Quantity to buy:")
-        if not qty_txt or not qty_txt.isdigit() or int(qty_txt) <= 0:
-            board.output("Invalid quantity.")
+        here = self.player.location
+        name = self._owner.get((r, c))
+        if name is None:
             return
-        res = game.buy(item.lower(), int(qty_txt))
-        draw_world(res)
-    elif k == "s":
-        inv = getattr(game.player, "inventory", {}) or {}
-        if not inv:
-            board.output("You have nothing to sell.")
+        if name == here:
+            self.board.output("You are already here.")
             return
-        item = get_input(f"Your inventory: {inv}\nEnter item to sell:")
-        if not item or item.lower() not in inv or inv.get(item.lower(), 0) <= 0:
-            board.output("Invalid item.")
+        if name not in self.graph.cities.get(here, {}):
+            self.board.output("You cannot travel there directly.")
             return
-        qty_txt = get_input("Quantity to sell:")
-        if not qty_txt or not qty_txt.isdigit() or int(qty_txt) <= 0:
-            board.output("Invalid quantity.")
+        res = self.game.travel(name)
+        self.draw_world(res)
+
+        # Only end game if travel failed AND player can't go anywhere
+        if "Not enough fuel" in res:
+            self.check_game_over()
+
+    def on_key(self, k):
+        # on_key itself is O(1) per press, ignoring the cost of called helpers.
+        # The heaviest call it triggers is suggest_best_move, which is:
+        #   O((V + E) log V + V·G)  (same as earlier annotation)
+        if self.game_over:
             return
-        res = game.sell(item.lower(), int(qty_txt))
-        draw_world(res)
-    elif k == "a":
-        try:
+
+        game, cities, board = self.game, self.cities, self.board
+        k = k.lower()
+        if k in ("up", "down", "left", "right", "z", "x", "c") and self.view is not None:
+            view = self.view
+            if k == "z":
+                view.zoom(-1)
+            elif k == "x":
+                view.zoom(1)
+            elif k == "c":
+                view.center_on(self.player.location)
+            else:
+                # a third of the window per key press
+                dr = {"up": -1, "down": 1}.get(k, 0) * max(1, view.rows // 3)
+                dc = {"left": -1, "right": 1}.get(k, 0) * max(1, view.cols // 3)
+                view.scroll(dr, dc)
+            self.draw_world(f"Map zoom level {view.level}.")
+        elif k == "p":
+            self.show_prices(0)
+        elif k in ("n", "u"):
+            self.show_prices(self.price_page + (1 if k == "n" else -1))
+        elif k == "f":
+            options = self.price_options
+            options["filter"] = FILTERS[(FILTERS.index(options["filter"]) + 1) % len(FILTERS)]
+            self.show_prices(0)
+        elif k == "o":
+            options = self.price_options
+            options["sort"] = "margin" if options["sort"] == "name" else "name"
+            self.show_prices(0)
+        elif k == "g":
+            good = self.get_input("Show only this good (blank for all):")
+            good = good.lower() if good else None
+            if good is not None and good not in self.prices.goods:
+                board.output("Nobody trades that good.")
+                return
+            self.price_options["good"] = good
+            self.show_prices(0)
+        elif k == "b":
             here = game.player.location
-            best_city, best_good, best_profit = suggest_best_move(g, cities, here, game.player.fuel)
+            goods = cities.get(here, City(here, {})).goods
+            if not goods:
+                board.output("This city sells nothing.")
+                return
+            item = self.get_input(f"Available goods: {list(goods.keys())}\nEnter item to buy:")
+            if not item or item.lower() not in goods:
+                board.output("Invalid item.")
+                return
+            qty_txt = self.get_input("Quantity to buy:")
+            if not qty_txt or not qty_txt.isdigit() or int(qty_txt) <= 0:
+                board.output("Invalid quantity.")
+                return
+            res = game.buy(item.lower(), int(qty_txt))
+            self.draw_world(res)
+        elif k == "s":
+            inv = getattr(game.player, "inventory", {}) or {}
+            if not inv:
+                board.output("You have nothing to sell.")
+                return
+            item = self.get_input(f"Your inventory: {inv}\nEnter item to sell:")
+            if not item or item.lower() not in inv or inv.get(item.lower(), 0) <= 0:
+                board.output("Invalid item.")
+                return
+            qty_txt = self.get_input("Quantity to sell:")
+            if not qty_txt or not qty_txt.isdigit() or int(qty_txt) <= 0:
+                board.output("Invalid quantity.")
+                return
+            res = game.sell(item.lower(), int(qty_txt))
+            self.draw_world(res)
+        elif k == "a":
+            self.show_advice()
+        elif k == "h":
+            self.show_history()
+        elif k == "i":
+            self.show_inventory()
+        elif k == "\r":
+            self.draw_world("Returned to main map.")
+        elif k == "q":
+            self.game_over = True
+            try:
+                self.show_history()
+                board.output(f"Final profit: ${game.profit()}\nThanks for playing!")
+            except Exception:
+                board.output("Thanks for playing!")
+            finally:
+                try:
+                    board.stop()
+                except Exception:
+                    pass
+        else:
+            self.draw_world("Use valid key.")
+
+    def show_advice(self):
+        # Cost is dominated by suggest_best_move and plan_route (see optimizer/planner)
+        g, cities, board = self.graph, self.cities, self.board
+        try:
+            here = self.player.location
+            best_city, best_good, best_profit = self.advisor.suggest(here, self.player.fuel)
         except Exception as e:
             board.output(f"AI suggestion failed: {e}")
             return
+        plan = plan_route(g, cities, here, self.player.fuel, self.player.money,
+                          market=self.market)
+        plan_text = ""
+        cargo = best_cargo(g, cities, here, self.player.fuel, self.player.money,
+                           self.player.capacity, market=self.market)
+        if cargo:
+            plan_text += f"\nBest cargo mix ({cargo.units} units):\n" + "\n".join(
+                f"  - {line}" for line in cargo.lines())
+        if plan.steps:
+            plan_text += f"\nMulti-stop plan (profit ~${plan.profit}):\n" + "\n".join(
+                f"  {i}. {line}" for i, line in enumerate(plan.lines(), 1))
         if not best_city or not best_good:
-            draw_world("AI Suggestion: No profitable trades found.")
+            self.draw_world("AI Suggestion: No profitable trades found." + plan_text)
             return
         try:
             ph = cities.get(here).goods.get(best_good)
             pt = cities.get(best_city).goods.get(best_good)
-            fc = g.cities.get(here, {}).get(best_city)
-            if ph is None or pt is None or fc is None:
-                draw_world("AI Suggestion: incomplete data for suggested route.")
+            fc, route = g.route(here, best_city)
+            if ph is None or pt is None or fc == float('inf'):
+                self.draw_world("AI Suggestion: incomplete data for suggested route.")
                 return
-            msg = f"AI Suggestion: Buy {best_good} in {here} (${ph}), travel to {best_city} (fuel {fc}), sell for ${pt}."
+            via = f" via {', '.join(route[1:-1])}" if len(route) > 2 else ""
+            msg = f"AI Suggestion: Buy {best_good} in {here} (${ph}), travel to {best_city}{via} (fuel {fc:g}), sell for ${pt}."
         except Exception as e:
             board.output(f"AI post-process error: {e}")
             return
-        draw_world(msg)
-    elif k == "h":
-        show_history()
-    elif k == "i":
-        show_inventory()
-    elif k == "\r":
-        draw_world("Returned to main map.")
-    elif k == "q":
-        _game_over = True
-        try:
-            show_history()
-            board.output(f"Final profit: ${game.profit()}\nThanks for playing!")
-        except Exception:
-            board.output("Thanks for playing!")
-        finally:
-            try:
-                board.stop()
-            except Exception:
-                pass
-    else:
-        draw_world("Use valid key.")
+        self.draw_world(msg + plan_text)
+
+
+def main():
+    metrics.configure_from_env()
+    TraderApp().run()
 
-board.on_key_press = on_key
 
-# Start
-draw_world("Welcome! Click a [>] city to travel or use keys below.")
-board.show()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# Vectorized trading environments: N independent games stepped as NumPy arrays.
+#
+# VecEnv keeps every game's state in flat arrays (location id, fuel, money, an
+# N x G inventory matrix) next to a city x good price matrix shared by all
+# games, or one copy per game with per_env_prices=True. step() takes one action
+# per game as three integer arrays
+#
+#   kind   NOOP, TRAVEL, BUY or SELL
+#   arg    destination city id (TRAVEL) or good id (BUY, SELL)
+#   qty    units to trade (BUY, SELL)
+#
+# and applies all of them at once with the rules of Game.travel/buy/sell: a
+# command that Game would refuse leaves that game unchanged and reports the
+# matching game.Result code. Prices stay fixed while stepping (as in a Game
+# without a Market); edit env.prices between steps to change them.
+#
+# A game ends after `horizon` steps or when it can no longer afford any road
+# out of its city, and is reset in the same step to a new start city.
+#
+#   python -m city_trader.vecenv [envs] [steps]    cross-checks against Game
+import sys
+
+import numpy as np
+
+from city_trader.game import Game, Result
+from city_trader.player import Player
+
+NOOP, TRAVEL, BUY, SELL = 0, 1, 2, 3
+
+
+class VecEnv:
+    def __init__(self, graph, cities, n_envs, fuel=100, money=500, capacity=None,
+                 horizon=200, starts=None, per_env_prices=False, seed=0):
+        # starts: None for a random start city per game (drawn on every reset),
+        #   a city name, or an array of N city ids.
+        # Let C = number of cities, G = goods, E = roads
+        # Average and worst case time complexity: O(C·G + E log E + N)
+        self.names = list(cities)
+        self.city_id = {name: i for i, name in enumerate(self.names)}
+        self.goods = sorted({good for city in cities.values() for good in city.goods})
+        self.good_id = {good: j for j, good in enumerate(self.goods)}
+        n_cities = len(self.names)
+
+        table = np.full((n_cities, len(self.goods)), np.nan)
+        for i, name in enumerate(self.names):
+            for good, price in cities[name].goods.items():
+                table[i, self.good_id[good]] = price
+        self.prices = np.broadcast_to(table, (n_envs,) + table.shape).copy() \
+            if per_env_prices else table
+
+        # roads as sorted src * C + dst keys, so a (city, destination) lookup
+        # is one vectorized binary search
+        src, dst, cost = [], [], []
+        for name, roads in graph.cities.items():
+            i = self.city_id.get(name)
+            if i is None:
+                continue
+            for other, fuel_cost in roads.items():
+                j = self.city_id.get(other)
+                if j is not None:
+                    src.append(i)
+                    dst.append(j)
+                    cost.append(fuel_cost)
+        keys = np.array(src, dtype=np.int64) * n_cities + np.array(dst, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._costs = np.array(cost, dtype=np.float64)[order]
+        self._src = np.array(src, dtype=np.int64)[order]
+        self._dst = np.array(dst, dtype=np.int64)[order]
+        # cheapest road out of each city, inf for dead ends
+        self.min_cost = np.full(n_cities, np.inf)
+        np.minimum.at(self.min_cost, self._src, self._costs)
+        self._slots = None
+
+        self.n = n_envs
+        self.start_fuel = fuel
+        self.start_money = money
+        self.capacity = np.full(n_envs, np.iinfo(np.int64).max if capacity is None else capacity,
+                                dtype=np.int64)
+        self.horizon = horizon
+        self.rng = np.random.default_rng(seed)
+        if isinstance(starts, str):
+            starts = np.full(n_envs, self.city_id[starts], dtype=np.int64)
+        self.starts = None if starts is None else np.asarray(starts, dtype=np.int64)
+
+        self.location = np.zeros(n_envs, dtype=np.int64)
+        self.fuel = np.zeros(n_envs)
+        self.money = np.zeros(n_envs)
+        self.inventory = np.zeros((n_envs, len(self.goods)), dtype=np.int64)
+        self.cargo = np.zeros(n_envs, dtype=np.int64)
+        self.t = np.zeros(n_envs, dtype=np.int64)
+        self.episode_profit = np.zeros(n_envs)   # final profit of each game's last episode
+        self.episodes = 0
+        self.reset()
+
+    def reset(self, mask=None):
+        # Restart the games selected by a boolean mask (all by default).
+        # Average and worst case time complexity: O(N·G)
+        idx = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if self.starts is None:
+            self.location[idx] = self.rng.integers(len(self.names), size=len(idx))
+        else:
+            self.location[idx] = self.starts[idx]
+        self.fuel[idx] = self.start_fuel
+        self.money[idx] = self.start_money
+        self.inventory[idx] = 0
+        self.cargo[idx] = 0
+        self.t[idx] = 0
+
+    def _price(self, idx, good):
+        # Current price of `good` where games `idx` stand (NaN if not sold there)
+        if self.prices.ndim == 2:
+            return self.prices[self.location[idx], good]
+        return self.prices[idx, self.location[idx], good]
+
+    def _road(self, here, dest):
+        # -> (road exists, fuel cost) for each (here, dest) pair
+        # Average and worst case time complexity: O(K log E) for K pairs
+        if not len(self._keys):
+            return np.zeros(len(here), dtype=bool), np.full(len(here), np.inf)
+        key = here * len(self.names) + dest
+        pos = np.minimum(np.searchsorted(self._keys, key), len(self._keys) - 1)
+        found = self._keys[pos] == key
+        return found, np.where(found, self._costs[pos], np.inf)
+
+    def check(self, kind, arg, qty):
+        # Result code each action would get, without applying anything.
+        # Average and worst case time complexity: O(N log E)
+        return self._step(kind, arg, qty, apply=False)
+
+    def step(self, kind, arg, qty):
+        # Apply one action per game. Returns (codes, reward, done): the Result
+        # code of each action, the change in each game's money and which games
+        # ended (and were reset) this step. episode_profit holds the final
+        # profit of the games that ended.
+        # Average and worst case time complexity: O(N log E + D·G), D = games reset
+        money = self.money.copy()
+        codes = self._step(kind, arg, qty, apply=True)
+        reward = self.money - money
+        self.t += 1
+        done = (self.t >= self.horizon) | (self.min_cost[self.location] > self.fuel)
+        if done.any():
+            self.episode_profit[done] = self.money[done] - self.start_money
+            self.episodes += int(np.count_nonzero(done))
+            self.reset(done)
+        return codes, reward, done
+
+    def _step(self, kind, arg, qty, apply):
+        kind = np.asarray(kind, dtype=np.int64)
+        arg = np.asarray(arg, dtype=np.int64)
+        qty = np.asarray(qty, dtype=np.int64)
+        codes = np.full(self.n, int(Result.BAD_COMMAND), dtype=np.uint8)
+        codes[kind == NOOP] = Result.OK
+
+        idx = np.flatnonzero((kind == TRAVEL) & (arg >= 0) & (arg < len(self.names)))
+        if len(idx):
+            here, dest = self.location[idx], arg[idx]
+            found, cost = self._road(here, dest)
+            code = np.full(len(idx), int(Result.OK), dtype=np.uint8)
+            code[self.fuel[idx] < cost] = Result.NO_FUEL
+            code[~found] = Result.NO_ROAD
+            code[dest == here] = Result.SAME_CITY
+            codes[idx] = code
+            if apply:
+                ok = code == Result.OK
+                moved = idx[ok]
+                self.fuel[moved] -= cost[ok]
+                self.location[moved] = dest[ok]
+
+        idx = np.flatnonzero((kind == BUY) & (arg >= 0) & (arg < len(self.goods)))
+        if len(idx):
+            good, q = arg[idx], qty[idx]
+            price = self._price(idx, good)
+            total = price * q
+            code = np.full(len(idx), int(Result.OK), dtype=np.uint8)
+            code[self.cargo[idx] + q > self.capacity[idx]] = Result.NO_SPACE
+            code[total > self.money[idx]] = Result.NO_MONEY
+            code[np.isnan(price)] = Result.NOT_SOLD
+            code[q <= 0] = Result.BAD_QUANTITY
+            codes[idx] = code
+            if apply:
+                ok = code == Result.OK
+                bought, good, q = idx[ok], good[ok], q[ok]
+                self.money[bought] -= total[ok]
+                self.inventory[bought, good] += q
+                self.cargo[bought] += q
+
+        idx = np.flatnonzero((kind == SELL) & (arg >= 0) & (arg < len(self.goods)))
+        if len(idx):
+            good, q = arg[idx], qty[idx]
+            code = np.full(len(idx), int(Result.OK), dtype=np.uint8)
+            code[self.inventory[idx, good] < q] = Result.NOT_OWNED
+            code[q <= 0] = Result.BAD_QUANTITY
+            codes[idx] = code
+            if apply:
+                ok = code == Result.OK
+                sold, good, q = idx[ok], good[ok], q[ok]
+                price = np.nan_to_num(self._price(sold, good), nan=0.0)  # Game.sell: goods.get(item, 0)
+                self.money[sold] += price * q
+                self.inventory[sold, good] -= q
+                self.cargo[sold] -= q
+        return codes
+
+    #  Action masks
+    def neighbor_slots(self):
+        # (C, D) matrices of neighbor ids (-1 padding) and road costs (inf
+        # padding), D = largest number of roads out of a city. Built once.
+        # Average and worst case time complexity: O(C·D + E)
+        if self._slots is None:
+            n_cities = len(self.names)
+            starts = np.searchsorted(self._src, np.arange(n_cities))
+            rank = np.arange(len(self._src)) - starts[self._src]
+            width = int(rank.max()) + 1 if len(rank) else 1
+            ids = np.full((n_cities, width), -1, dtype=np.int64)
+            costs = np.full((n_cities, width), np.inf)
+            ids[self._src, rank] = self._dst
+            costs[self._src, rank] = self._costs
+            self._slots = ids, costs
+        return self._slots
+
+    def travel_mask(self):
+        # -> (ids, mask): (N, D) neighbor ids of every game's city and which of
+        # those roads it can afford.
+        # Average and worst case time complexity: O(N·D)
+        ids, costs = self.neighbor_slots()
+        return ids[self.location], costs[self.location] <= self.fuel[:, None]
+
+    def buy_mask(self):
+        # (N, G): goods sold here of which one more unit fits the cash and cargo hold
+        # Average and worst case time complexity: O(N·G)
+        prices = self.prices[self.location] if self.prices.ndim == 2 \
+            else self.prices[np.arange(self.n), self.location]
+        return (prices <= self.money[:, None]) & (self.cargo < self.capacity)[:, None]
+
+    def sell_mask(self):
+        # (N, G): goods held
+        return self.inventory > 0
+
+    def state(self, i):
+        # One game's state in the same shape as the server's session state
+        return {"location": self.names[self.location[i]], "fuel": float(self.fuel[i]),
+                "money": float(self.money[i]),
+                "inventory": {self.goods[j]: int(q) for j, q in enumerate(self.inventory[i]) if q},
+                "profit": float(self.money[i] - self.start_money)}
+
+
+#  Cross-validation against the scalar Game
+_MESSAGES = {
+    "You are already in this city.": Result.SAME_CITY,
+    "Invalid destination — no road from here.": Result.NO_ROAD,
+    "Not enough fuel to travel!": Result.NO_FUEL,
+    "This city doesn’t sell that item.": Result.NOT_SOLD,
+    "You don’t have enough money.": Result.NO_MONEY,
+    "Not enough cargo space.": Result.NO_SPACE,
+    "You don’t have enough items to sell.": Result.NOT_OWNED,
+}
+
+
+def _scalar_step(game, env, kind, arg, qty):
+    # The same action through Game; -> Result code
+    if kind == NOOP:
+        return Result.OK
+    if kind == TRAVEL:
+        message = game.travel(env.names[arg])
+    elif qty <= 0:
+        return Result.BAD_QUANTITY   # Game leaves quantity checks to its callers
+    else:
+        message = getattr(game, "buy" if kind == BUY else "sell")(env.goods[arg], qty)
+    return _MESSAGES.get(message, Result.OK)
+
+
+def cross_validate(graph, cities, n_envs=64, steps=2000, seed=0, capacity=None, **options):
+    # Drive a VecEnv and one Game per environment with the same random actions
+    # (legal and illegal) and assert codes, rewards, resets and every state
+    # field agree after each step. Returns the number of actions compared.
+    # Average and worst case time complexity: O(steps · N · (G + log E))
+    env = VecEnv(graph, cities, n_envs, capacity=capacity, seed=seed, **options)
+    rng = np.random.default_rng(seed + 1)
+
+    def new_game(i):
+        return Game(graph, cities, Player(env.names[env.location[i]], fuel=env.start_fuel,
+                                          money=env.start_money, capacity=capacity))
+
+    games = [new_game(i) for i in range(n_envs)]
+    played = [0] * n_envs
+    n_goods = len(env.goods)
+    for _ in range(steps):
+        kind = rng.integers(4, size=n_envs)
+        # mostly real neighbors and held goods, so actions often succeed
+        ids, _ = env.travel_mask()
+        pick = ids[np.arange(n_envs), rng.integers(ids.shape[1], size=n_envs)]
+        dest = np.where((pick >= 0) & (rng.random(n_envs) < 0.9), pick,
+                        rng.integers(len(env.names), size=n_envs))
+        good = rng.integers(n_goods, size=n_envs)
+        arg = np.where(kind == TRAVEL, dest, good)
+        qty = rng.integers(-1, 8, size=n_envs)
+
+        before = [game.player.money for game in games]
+        expected = [_scalar_step(games[i], env, kind[i], arg[i], qty[i]) for i in range(n_envs)]
+        codes, reward, done = env.step(kind, arg, qty)
+        assert codes.tolist() == [int(code) for code in expected], "result codes differ"
+        for i, game in enumerate(games):
+            player = game.player
+            assert reward[i] == player.money - before[i], f"env {i}: reward"
+            played[i] += 1
+            stranded = all(cost > player.fuel for _, cost in graph.neighbors(player.location))
+            assert bool(done[i]) == (stranded or played[i] >= env.horizon), f"env {i}: done"
+            if done[i]:
+                assert env.episode_profit[i] == game.profit(), f"env {i}: episode profit"
+                games[i] = new_game(i)
+                played[i] = 0
+                continue
+            assert env.names[env.location[i]] == player.location, f"env {i}: location"
+            assert env.fuel[i] == player.fuel and env.money[i] == player.money, f"env {i}: fuel/money"
+            held = {good: q for good, q in player.inventory.items() if q}
+            assert env.state(i)["inventory"] == held, f"env {i}: inventory"
+    return steps * n_envs
+
+
+def main(n_envs=64, steps=2000):
+    from city_trader.world import WORLD_PATH, load_world
+    from city_trader.generator import generate_world
+
+    g, cities, _ = load_world(WORLD_PATH)
+    checked = cross_validate(g, cities, n_envs, steps, horizon=50)
+    checked += cross_validate(g, cities, n_envs, steps, seed=1, capacity=10, per_env_prices=True)
+    g, cities = generate_world(500, "geometric", seed=2, goods_per_city=3)
+    checked += cross_validate(g, cities, n_envs, steps // 4, seed=2, horizon=30)
+    print(f"VecEnv matches Game on {checked} actions")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
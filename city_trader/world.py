@@ -0,0 +1,163 @@
+# World loading shared by main.py, ui.py and the headless tools.
+#
+# Two formats are understood:
+#   *.json   the original {"cities": {...}, "roads": [[a, b, cost], ...]} document
+#   *.jsonl  one record per line, read incrementally with bounded memory:
+#              {"city": "Paris", "goods": {"wheat": 35, ...}}
+#              {"road": ["Paris", "Berlin", 20]}
+import json
+from pathlib import Path
+
+from city_trader.graph import Graph
+from city_trader.city import City
+
+WORLD_PATH = Path(__file__).parent / "data" / "world.json"
+
+# with snapshot="auto", worlds at least this big are loaded from a binary snapshot
+SNAPSHOT_THRESHOLD = 1 << 20
+
+
+class LoadReport:
+    # What happened while loading: counts plus one (record number, message)
+    # entry for every record that was skipped.
+    def __init__(self, path):
+        # average and worst case time complexity: O(1)
+        self.path = path
+        self.records = 0
+        self.cities = 0
+        self.roads = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return (f"LoadReport({self.path}, records={self.records}, cities={self.cities}, "
+                f"roads={self.roads}, errors={len(self.errors)})")
+
+
+def iter_records(path):
+    # Yields (record number, kind, payload) with kind "city" or "road".
+    # Malformed records are yielded as ("error", message).
+    # Let R = number of records
+    # Average and worst case time complexity: O(R); memory O(1) for .jsonl
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield lineno, "error", f"invalid JSON: {e}"
+                    continue
+                if isinstance(record, dict) and "road" in record:
+                    yield lineno, "road", record["road"]
+                elif isinstance(record, dict) and "city" in record:
+                    yield lineno, "city", (record["city"], record.get("goods", {}))
+                else:
+                    yield lineno, "error", "expected a 'city' or 'road' record"
+        return
+
+    with path.open("r", encoding="utf-8") as f:
+        world = json.load(f)
+    n = 0
+    for name, goods in world.get("cities", {}).items():
+        n += 1
+        yield n, "city", (name, goods)
+    for road in world.get("roads", []):
+        n += 1
+        yield n, "road", road
+
+
+def _amount(value):
+    # A fuel cost or price as an int (float if fractional), or None unless it is
+    # a finite number >= 0. Numeric strings are accepted.
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not 0 <= number < float('inf'):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def load_world(path=WORLD_PATH, on_progress=None, progress_every=10000, on_error=None,
+               snapshot="auto"):
+    # Builds (graph, cities, report) record by record.
+    # on_progress(report) is called every progress_every records and at the end;
+    # on_error(record number, message) is called for every skipped record.
+    # snapshot=True (or "auto" for big files) maps a binary snapshot of the world
+    # instead, compiling it first if needed (see snapshot.py).
+    # Let R = number of records
+    # Average and worst case time complexity: O(R), O(cities) from a fresh snapshot
+    if snapshot == "auto":
+        snapshot = Path(path).stat().st_size >= SNAPSHOT_THRESHOLD
+    if snapshot:
+        loaded = _load_snapshot(path, on_progress, on_error)
+        if loaded:
+            return loaded
+
+    report = LoadReport(path)
+    g = Graph()
+    cities = {}
+
+    def fail(n, message):
+        report.errors.append((n, message))
+        if on_error:
+            on_error(n, message)
+
+    for n, kind, payload in iter_records(path):
+        report.records += 1
+        if kind == "error":
+            fail(n, payload)
+        elif kind == "road":
+            try:
+                a, b, cost = payload
+            except (TypeError, ValueError):
+                a = b = cost = None
+            cost = _amount(cost)
+            if not isinstance(a, str) or not isinstance(b, str) or cost is None:
+                fail(n, f"bad road {payload!r}: expected [city, city, fuel cost >= 0]")
+            else:
+                g.add_road(a, b, cost)
+                report.roads += 1
+        else:
+            name, goods = payload
+            prices = bad = None
+            if isinstance(name, str) and isinstance(goods, dict):
+                prices = {good: _amount(price) for good, price in goods.items()}
+                bad = [good for good, price in prices.items() if price is None]
+            if prices is None:
+                fail(n, f"bad city {name!r}: expected a name and a goods table")
+            elif bad:
+                fail(n, f"bad city {name!r}: price of {bad[0]!r} is not a number >= 0")
+            else:
+                cities[name] = City(name, prices)
+                report.cities += 1
+        if on_progress and report.records % progress_every == 0:
+            on_progress(report)
+
+    if on_progress:
+        on_progress(report)
+    return g, cities, report
+
+
+def _load_snapshot(path, on_progress, on_error):
+    # Returns None when no snapshot can be written or read (e.g. read-only data dir).
+    from city_trader.snapshot import open_world
+    try:
+        g, cities, report = open_world(path)
+    except (OSError, ValueError):
+        return None
+    if on_error:
+        for n, message in report.errors:
+            on_error(n, message)
+    if on_progress:
+        on_progress(report)
+    return g, cities, report